@@ -1,27 +1,23 @@
-import os
 import cv2
 import numpy as np
-import yaml
 import logging
 from typing import Optional, Dict, Any, Tuple, List
 
-from computer_vision.chessboard_detection import (
-    detect_chessboard_border,
-    cut_image_corners,
-    order_points,
-)
-from computer_vision.cube_detection import (
-    detect_cubes,
-)  # Your existing detect_cubes function
-from computer_vision.square_detection import detect_squares, warp_perspective
-
-
-def draw_annotations(image, squares, cubes, cube_positions_str):
-    columns = ["A", "B", "C", "D", "E", "F", "G", "H"]
-    for square in squares:
-        x, y, w, h = square["x"], square["y"], square["w"], square["h"]
-        row, col = square["row"], square["col"]
-        square_name = f"{columns[col]}{8 - row}"
+from chess_logic.vision_settings import VisionSettings, load_settings
+from computer_vision.change_detection import SquareChangeDetector
+from computer_vision.chessboard_detection import RegionMask
+from computer_vision.cube_detection import detect_cubes
+from computer_vision.debug_sink import DebugSink
+from computer_vision.occupancy import BoardOccupancy, compute_square_fractions
+from computer_vision.square_detection import detect_squares, get_board_grid
+from utils.profiling import StageProfiler
+
+# Structuring element of the obstacle mask clean-up
+OBSTACLE_KERNEL = np.ones((3, 3), np.uint8)
+
+
+def draw_annotations(image, grid, cubes, cube_positions_str):
+    for _, _, square_name, (x, y, w, h) in grid.rects():
         cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 1)
         cv2.putText(
             image,
@@ -53,98 +49,147 @@ def draw_annotations(image, squares, cubes, cube_positions_str):
     return image
 
 
-def map_cube_to_square(cube, squares):
-    cube_x, cube_y, cube_w, cube_h = cube["x"], cube["y"], cube["w"], cube["h"]
-    cube_center = (cube_x + cube_w / 2, cube_y + cube_h / 2)
+def map_cubes_to_squares(cubes, grid) -> Dict[str, List[str]]:
+    """
+    Maps all detected cubes to square labels in one vectorized lookup.
+    """
+    if not cubes:
+        return {}
+    boxes = [(cube["x"], cube["y"], cube["w"], cube["h"]) for cube in cubes]
+    rows, cols, valid = grid.locate_boxes(boxes)
 
-    for square in squares:
-        x, y, w, h = square["x"], square["y"], square["w"], square["h"]
-        if x <= cube_center[0] <= x + w and y <= cube_center[1] <= y + h:
-            return square["row"], square["col"]
-    return None, None
+    cube_positions: Dict[str, List[str]] = {}
+    for cube, row, col, is_valid in zip(cubes, rows, cols, valid):
+        if is_valid:
+            square_label = str(grid.labels[row, col])
+            cube_positions.setdefault(square_label, []).append(cube["color"])
+    return cube_positions
 
 
 class ChessCubeProcessor:
+    # Saturation added by preprocess_image before the cubes are classified
+    SATURATION_INCREASE = 50
+
     def __init__(
         self,
         config_path: str = None,
         debug: bool = False,
         chessboard_points: Optional[List[Tuple[int, int]]] = None,
         obstacle_detection_points: Optional[List[Tuple[int, int]]] = None,
+        settings: Optional[VisionSettings] = None,
     ):
-
-        # Determine the path to the configuration file
-        if config_path is None:
-            # Use a relative path to the 'resources/config/settings.yaml' file
-            config_path = os.path.join(
-                os.path.dirname(__file__), "..", "resources", "config", "settings.yaml"
-            )
-        else:
-            # If config_path is not absolute, make it relative to this file
-            if not os.path.isabs(config_path):
-                config_path = os.path.join(os.path.dirname(__file__), config_path)
-
-        # Resolve the absolute path
-        config_path = os.path.abspath(config_path)
-
-        # Load the configuration
-        self.config = self.load_config(config_path)
+        """
+        :param config_path: Settings file, used if no settings are given.
+        :param debug: Enables the debug image output.
+        :param chessboard_points: Overrides the chessboard points of the settings.
+        :param obstacle_detection_points: Overrides the obstacle points of the settings.
+        :param settings: Shared, already validated settings.
+        """
+        # Load (or share) the validated configuration
+        if settings is None:
+            settings = load_settings(config_path)
+        self._point_overrides = (chessboard_points, obstacle_detection_points)
         self.debug = debug
         self.setup_logging()
         logging.info("ChessCubeProcessor initialized.")
 
-        # Initialize points lists
-        if chessboard_points is None:
-            # Default chessboard points from config
-            self.chessboard_points = [
-                tuple(point)
-                for point in self.config.get(
-                    "chessboard_points",
-                    [(709, 286), (1171, 276), (1327, 830), (632, 855)],
-                )
-            ]
-        else:
-            self.chessboard_points = chessboard_points
-
-        if obstacle_detection_points is None:
-            # Default obstacle detection points from config
-            self.obstacle_detection_points = [
-                tuple(point)
-                for point in self.config.get(
-                    "obstacle_detection_points",
-                    [(600, 250), (1250, 250), (1250, 900), (600, 900)],
-                )
-            ]
-        else:
-            self.obstacle_detection_points = obstacle_detection_points
-
-        # Debug logs for points
-        logging.debug(f"Chessboard Points: {self.chessboard_points}")
-        logging.debug(f"Obstacle Detection Points: {self.obstacle_detection_points}")
-
-        # Validate obstacle_detection_points
-        if len(self.obstacle_detection_points) != 4:
-            logging.error(
-                f"Obstacle detection requires exactly 4 points, but got {len(self.obstacle_detection_points)}."
-            )
-            raise ValueError(
-                "You must provide exactly 4 points to define the quadrilateral for obstacle detection."
-            )
-
         # Initialize obstacle detection attributes
         self.reference_gray = None
+        self.reference_settings: Optional[VisionSettings] = None
         self.obstacle_initialized = False
-        self.DIFF_THRESHOLD = self.config.get("line_deviation_threshold", 20)
         self.PERCENT_THRESHOLD = 0.02
-        self.UPDATE_INTERVAL = self.config.get("initialization_frames", 30)
+        self.UPDATE_INTERVAL = settings.get("initialization_frames", 30)
         self.frame_count = 0
 
-    @staticmethod
-    def load_config(config_path: str) -> Dict[str, Any]:
-        with open(config_path, "r") as file:
-            config = yaml.safe_load(file)
-        logging.debug(f"Configuration loaded from {config_path}.")
-        return config
+        # Frame-to-frame change of the obstacle region, used to detect a settled scene
+        self.previous_gray = None
+        self.last_motion_ratio = 0.0
+
+        # Debug images are encoded and written by a background thread
+        self.debug_sink = DebugSink.from_config(settings)
+
+        # Per-stage timing of process_image and detect_obstacle
+        profiling_config = settings.get("profiling", {})
+        self.profiler = StageProfiler(
+            enabled=profiling_config.get("enabled", False),
+            window=profiling_config.get("window", 512),
+            log_records=profiling_config.get("log_records", False),
+        )
+
+        self.last_occupancy: Optional[BoardOccupancy] = None
+        # (row, col, cube) of the last contour detection, row/col are -1 off the board
+        self._cube_cache: Optional[List[Tuple[int, int, Dict[str, Any]]]] = None
+        self.frames_since_refresh = 0
+        # Boolean (rows, cols) map of the squares that changed in the last frame
+        self.last_change_map = None
+        self.last_changed_squares: Optional[set] = None
+
+        self.apply_settings(settings)
+
+    def apply_settings(self, settings: VisionSettings):
+        """
+        Switches to new settings, e.g. after a hot reload. Everything derived from them is
+        built first and then swapped in, and every processed frame reads one settings
+        snapshot, so a frame never mixes old and new values.
+        """
+        settings = settings.with_points(*self._point_overrides)
+
+        # Incremental mode: only squares that changed since the last processed frame are
+        # classified again, the others keep their cached result
+        incremental_config = settings.get("incremental", {})
+        change_detector = None
+        if incremental_config.get("enabled", False):
+            change_detector = SquareChangeDetector(
+                pixel_threshold=incremental_config.get("pixel_threshold", 25),
+                min_changed_fraction=incremental_config.get(
+                    "min_changed_fraction", 0.02
+                ),
+                scale=incremental_config.get("scale", 0.25),
+            )
+
+        self.settings = settings
+        self.change_detector: Optional[SquareChangeDetector] = change_detector
+        self.full_refresh_frames = incremental_config.get("full_refresh_frames", 30)
+        self.profiler.enabled = settings.get("profiling", {}).get(
+            "enabled", self.profiler.enabled
+        )
+        # Cached detections may stem from other color ranges or geometry
+        self.last_occupancy = None
+        self._cube_cache = None
+
+        logging.debug(f"Chessboard Points: {settings.chessboard_points}")
+        logging.debug(
+            f"Obstacle Detection Points: {settings.obstacle_detection_points}"
+        )
+
+    # Config-derived values, read from the current settings snapshot
+    @property
+    def config(self) -> VisionSettings:
+        return self.settings
+
+    @property
+    def chessboard_points(self) -> List[Tuple[int, int]]:
+        return self.settings.chessboard_points
+
+    @property
+    def obstacle_detection_points(self) -> List[Tuple[int, int]]:
+        return self.settings.obstacle_detection_points
+
+    @property
+    def color_classifier(self):
+        return self.settings.color_classifier
+
+    @property
+    def detection_mode(self) -> str:
+        return self.settings.detection_mode
+
+    @property
+    def DIFF_THRESHOLD(self) -> int:
+        return self.settings.line_deviation_threshold
+
+    @property
+    def OBSTACLE_PYRAMID_LEVELS(self) -> int:
+        return self.settings.obstacle_pyramid_levels
 
     @staticmethod
     def rotate_image(image: Any, angle: int) -> Any:
@@ -161,6 +206,59 @@ class ChessCubeProcessor:
             rotated = cv2.warpAffine(image, M, (w, h))
             return rotated
 
+    def get_region(
+        self, name: str, settings: Optional[VisionSettings] = None
+    ) -> RegionMask:
+        """
+        Returns the precompiled mask of the "chessboard" or "obstacle" points. The
+        chessboard region is padded so bilinear sampling at its border stays inside the
+        crop.
+        """
+        settings = settings or self.settings
+        if name == "chessboard":
+            return settings.chessboard_region
+        elif name == "obstacle":
+            return settings.obstacle_region
+        raise ValueError(f"Unknown region: {name}")
+
+    def get_warp_maps(
+        self, settings: Optional[VisionSettings] = None
+    ) -> Tuple[Any, Any, Tuple[int, int]]:
+        """
+        Returns the precomputed remap table that warps the chessboard to a top-down view
+        and applies the configured rotation in one pass. The table reads from the
+        chessboard region crop.
+        """
+        return (settings or self.settings).warp_maps
+
+    def warp_board(self, image: Any, settings: Optional[VisionSettings] = None) -> Any:
+        """
+        Warps and rotates the chessboard area of a camera frame using the cached remap table.
+        Only the chessboard region of the frame is read.
+        """
+        settings = settings or self.settings
+        map1, map2, _ = settings.warp_maps
+        roi = settings.chessboard_region.crop(image)
+        return cv2.remap(roi, map1, map2, cv2.INTER_LINEAR)
+
+    def obstacle_gray(
+        self, image: Any, settings: Optional[VisionSettings] = None
+    ) -> Any:
+        """
+        Returns the blurred grayscale obstacle region with the area outside the
+        quadrilateral set to white, downscaled by OBSTACLE_PYRAMID_LEVELS pyramid steps.
+        """
+        settings = settings or self.settings
+        region = settings.obstacle_region
+        gray = cv2.cvtColor(region.crop(image), cv2.COLOR_BGR2GRAY)
+        region.fill_outside(gray)
+        if settings.obstacle_pyramid_levels <= 0:
+            return cv2.GaussianBlur(gray, (5, 5), 0)
+        # pyrDown already low-pass filters, no extra blur needed
+        for _ in range(settings.obstacle_pyramid_levels):
+            gray = cv2.pyrDown(gray)
+        return gray
+
     def setup_logging(self):
         logging.basicConfig(
             level=logging.DEBUG if self.debug else logging.INFO,
@@ -175,37 +273,69 @@ class ChessCubeProcessor:
         logging.info(f"Debug mode set to {self.debug}.")
 
     def initialize_obstacle_detection(self, image: Any):
-        masked_image = cut_image_corners(
-            image, self.obstacle_detection_points, debug=self.debug
-        )
-        reference_gray = cv2.cvtColor(masked_image, cv2.COLOR_BGR2GRAY)
-        reference_gray = cv2.GaussianBlur(reference_gray, (5, 5), 0)
-        self.reference_gray = reference_gray
+        settings = self.settings
+        self.reference_gray = self.obstacle_gray(image, settings)
+        self.reference_settings = settings
         self.obstacle_initialized = True
         logging.info("Obstacle detection initialized with reference frame.")
 
     def detect_obstacle(self, image: Any) -> bool:
+        with self.profiler.stage("detect_obstacle"):
+            return self._detect_obstacle(image)
+
+    def _detect_obstacle(self, image: Any) -> bool:
         if not self.obstacle_initialized:
             logging.error("Obstacle detection not initialized.")
             return False
 
-        masked_image = cut_image_corners(
-            image, self.obstacle_detection_points, debug=self.debug
-        )
-        current_gray = cv2.cvtColor(masked_image, cv2.COLOR_BGR2GRAY)
-        current_gray = cv2.GaussianBlur(current_gray, (5, 5), 0)
+        profiler = self.profiler
+        settings = self.settings
+        diff_threshold = settings.line_deviation_threshold
+        with profiler.stage("obstacle_gray"):
+            current_gray = self.obstacle_gray(image, settings)
+        reference = self.reference_settings
+        if reference is not settings:
+            self.reference_settings = settings
+            if (
+                reference.obstacle_detection_points
+                != settings.obstacle_detection_points
+                or reference.obstacle_pyramid_levels != settings.obstacle_pyramid_levels
+            ):
+                # Reloaded settings with another obstacle region: start over from here
+                self.reference_gray = current_gray
+                self.previous_gray = None
+                return False
+
+        # Change relative to the previous check (full-frame fraction, like change_ratio)
+        region = settings.obstacle_region
+        scale = (region.w * region.h) / current_gray.size
+        total_pixels = image.shape[0] * image.shape[1]
+        with profiler.stage("obstacle_motion"):
+            if (
+                self.previous_gray is not None
+                and self.previous_gray.shape == current_gray.shape
+            ):
+                motion = cv2.absdiff(self.previous_gray, current_gray)
+                _, motion = cv2.threshold(
+                    motion, diff_threshold, 255, cv2.THRESH_BINARY
+                )
+                self.last_motion_ratio = cv2.countNonZero(motion) * scale / total_pixels
+            self.previous_gray = current_gray
 
-        frame_diff = cv2.absdiff(self.reference_gray, current_gray)
-        _, thresh = cv2.threshold(
-            frame_diff, self.DIFF_THRESHOLD, 255, cv2.THRESH_BINARY
-        )
+        with profiler.stage("obstacle_diff"):
+            frame_diff = cv2.absdiff(self.reference_gray, current_gray)
+            _, thresh = cv2.threshold(
+                frame_diff, diff_threshold, 255, cv2.THRESH_BINARY
+            )
 
-        kernel = np.ones((3, 3), np.uint8)
-        thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations=2)
-        thresh = cv2.dilate(thresh, kernel, iterations=1)
+        with profiler.stage("obstacle_morphology"):
+            thresh = cv2.morphologyEx(
+                thresh, cv2.MORPH_OPEN, OBSTACLE_KERNEL, iterations=2
+            )
+            thresh = cv2.dilate(thresh, OBSTACLE_KERNEL, iterations=1)
 
-        changed_pixels = np.sum(thresh > 0)
-        total_pixels = thresh.size
+        # The threshold is relative to the full frame; pixels outside the region never change
+        changed_pixels = cv2.countNonZero(thresh) * scale
         change_ratio = changed_pixels / total_pixels
 
         if change_ratio > self.PERCENT_THRESHOLD:
@@ -219,6 +349,185 @@ class ChessCubeProcessor:
 
         return False
 
+    def detect_occupancy(
+        self,
+        preprocessed_image: Any,
+        grid: Any,
+        settings: Optional[VisionSettings] = None,
+    ) -> BoardOccupancy:
+        """
+        Computes the per-square occupancy/color tensor of a preprocessed warped image.
+        Squares are decided by the fraction of cube-colored pixels, so cubes straddling
+        a line are still assigned to the square holding most of them.
+        """
+        settings = settings or self.settings
+        margin, min_fraction = self.occupancy_parameters(grid, settings)
+        labels = settings.color_classifier.classify(preprocessed_image)
+        class_names = settings.color_classifier.class_names
+        fractions = compute_square_fractions(labels, grid, len(class_names), margin)
+        return BoardOccupancy(fractions, class_names, min_fraction)
+
+    def occupancy_parameters(
+        self, grid: Any, settings: Optional[VisionSettings] = None
+    ) -> Tuple[float, float]:
+        """
+        Returns the square border margin and the minimum cube fraction of a square.
+        """
+        settings = settings or self.settings
+        occupancy_config = settings.get("occupancy", {})
+        margin = occupancy_config.get("margin", 0.1)
+        min_fraction = occupancy_config.get("min_fraction")
+        if min_fraction is None:
+            # Same minimum cube size as the contour based detection
+            inner_area = grid.square_w * grid.square_h * (1 - 2 * margin) ** 2
+            min_fraction = settings["thresholds"]["cube_area_min"] / inner_area
+        return margin, min_fraction
+
+    def detect_square_changes(
+        self,
+        warped_image: Any,
+        chessboard_size: Tuple[int, int],
+        settings: Optional[VisionSettings] = None,
+    ) -> Optional[Any]:
+        """
+        Compares the warped board with the last processed one and updates
+        last_change_map. Returns the (rows, cols) map of squares to classify again, or
+        None if the whole board has to be processed (incremental mode off, nothing
+        cached yet or a periodic full refresh is due).
+        """
+        settings = settings or self.settings
+        change_detector = self.change_detector
+        if change_detector is None:
+            return None
+
+        change_fractions = change_detector.update(warped_image, chessboard_size)
+        if change_fractions is None:
+            self.last_change_map = None
+        else:
+            self.last_change_map = change_detector.changed(change_fractions)
+
+        self.frames_since_refresh += 1
+        cached = (
+            self.last_occupancy
+            if settings.detection_mode == "blocks"
+            else self._cube_cache
+        )
+        if (
+            self.last_change_map is None
+            or cached is None
+            or self.frames_since_refresh >= self.full_refresh_frames
+        ):
+            return None
+        return self.last_change_map
+
+    def update_occupancy(
+        self,
+        warped_image: Any,
+        grid: Any,
+        changed: Any,
+        settings: Optional[VisionSettings] = None,
+    ) -> BoardOccupancy:
+        """
+        Recomputes the class fractions of the changed squares only and carries the
+        fractions of the other squares over from last_occupancy.
+        """
+        settings = settings or self.settings
+        margin, min_fraction = self.occupancy_parameters(grid, settings)
+        class_names = settings.color_classifier.class_names
+        fractions = self.last_occupancy.fractions.copy()
+        index = grid.square_index(margin)
+
+        for row, col in zip(*np.nonzero(changed)):
+            x, y, w, h = grid.rect(row, col)
+            square = (slice(y, y + h), slice(x, x + w))
+            crop = self.preprocess_image(warped_image[square], self.SATURATION_INCREASE)
+            labels = settings.color_classifier.classify(crop)
+            inside = index[square] == row * grid.cols + col
+            counts = np.bincount(labels[inside], minlength=len(class_names))
+            fractions[row, col] = counts / max(counts.sum(), 1)
+
+        return BoardOccupancy(fractions, class_names, min_fraction)
+
+    def update_cubes(
+        self,
+        warped_image: Any,
+        grid: Any,
+        changed: Any,
+        settings: Optional[VisionSettings] = None,
+    ) -> List[Tuple[int, int, Dict[str, Any]]]:
+        """
+        Detects cubes again around the changed squares only and keeps the cached cubes
+        that do not overlap any of them. Every changed square is searched with a square
+        of context on each side, so cubes that overlap it are found completely, even
+        when their center lies in an unchanged neighbour.
+        """
+        settings = settings or self.settings
+        entries = [
+            entry
+            for entry in self._cube_cache
+            if self._first_changed_square(grid, changed, entry[2]) is None
+        ]
+
+        for row, col in zip(*np.nonzero(changed)):
+            x, y, w, h = grid.rect(row, col)
+            x0, y0 = max(x - w, 0), max(y - h, 0)
+            x1 = min(x + 2 * w, grid.width)
+            y1 = min(y + 2 * h, grid.height)
+            crop = self.preprocess_image(
+                warped_image[y0:y1, x0:x1], self.SATURATION_INCREASE
+            )
+            cubes = detect_cubes(crop, settings, classifier=settings.color_classifier)
+            for cube in cubes:
+                cube["x"] += x0
+                cube["y"] += y0
+            # A cube overlapping several changed squares is found around each of them
+            cubes = [
+                cube
+                for cube in cubes
+                if self._first_changed_square(grid, changed, cube) == (row, col)
+            ]
+            rows, cols, _ = grid.locate_boxes(
+                [(c["x"], c["y"], c["w"], c["h"]) for c in cubes]
+            )
+            entries.extend(zip(rows.tolist(), cols.tolist(), cubes))
+        return entries
+
+    @staticmethod
+    def _first_changed_square(
+        grid: Any, changed: Any, cube: Dict[str, Any]
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Returns the first changed square in row-major order that the bounding box of a
+        cube overlaps, or None if it overlaps no changed square.
+        """
+        left, right = cube["x"], cube["x"] + cube["w"] - 1
+        top, bottom = cube["y"], cube["y"] + cube["h"] - 1
+        # First and one past the last column and row the box spans
+        col0, col1 = np.clip(
+            np.searchsorted(grid.x_edges, [left, right], side="right") - 1,
+            0,
+            grid.cols - 1,
+        ) + (0, 1)
+        row0, row1 = np.clip(
+            np.searchsorted(grid.y_edges, [top, bottom], side="right") - 1,
+            0,
+            grid.rows - 1,
+        ) + (0, 1)
+        hits = np.argwhere(changed[row0:row1, col0:col1])
+        if len(hits) == 0:
+            return None
+        return int(row0 + hits[0][0]), int(col0 + hits[0][1])
+
+    def changed_squares(self, grid: Any) -> Optional[set]:
+        """
+        Returns the labels of the squares that changed in the last processed frame, or
+        None if the change is unknown (incremental mode off or no previous frame).
+        """
+        if self.last_change_map is None:
+            return None
+        rows, cols = np.nonzero(self.last_change_map)
+        return {str(grid.labels[row, col]) for row, col in zip(rows, cols)}
+
     # New method to preprocess the image (increase saturation)
     @staticmethod
     def preprocess_image(image: Any, increase_value: int = 50) -> Any:
@@ -236,17 +545,154 @@ class ChessCubeProcessor:
         saturated_image = cv2.cvtColor(hsv_enhanced, cv2.COLOR_HSV2BGR)
         return saturated_image
 
+    def _detect_full(
+        self,
+        warped_image: Any,
+        image_name: str,
+        chessboard_size: Tuple[int, int],
+        current_debug: bool,
+        sink: Optional[DebugSink],
+        settings: VisionSettings,
+    ) -> Optional[Tuple[List[Dict[str, Any]], Any, Dict[str, List[str]]]]:
+        """
+        Detects the cubes on the whole warped board and refreshes the incremental cache.
+        Returns (cubes, grid, cube_positions) or None if nothing was detected.
+        """
+        profiler = self.profiler
+
+        # Preprocess the image (increase saturation)
+        with profiler.stage("preprocess"):
+            preprocessed_image = self.preprocess_image(
+                warped_image, increase_value=self.SATURATION_INCREASE
+            )
+
+        # Queue the preprocessed image used for cube detection
+        if sink is not None:
+            sink.submit(
+                "preprocessed_images",
+                f"preprocessed_{image_name}",
+                preprocessed_image,
+            )
+
+        # Get the (cached) square grid of the warped image
+        with profiler.stage("squares"):
+            grid = detect_squares(
+                warped_image.copy() if current_debug else warped_image,
+                debug=current_debug,
+                chessboard_size=chessboard_size,
+                sink=sink,
+                image_name=image_name,
+            )
+
+        if grid is None or len(grid) != chessboard_size[0] * chessboard_size[1]:
+            logging.error(f"Squares not properly detected in {image_name}.")
+            return None
+
+        logging.info(f"Number of squares detected: {len(grid)}")
+        self.frames_since_refresh = 0
+
+        if settings.detection_mode == "blocks":
+            # Per-square class fractions instead of contours
+            with profiler.stage("occupancy"):
+                occupancy = self.detect_occupancy(preprocessed_image, grid, settings)
+            self.last_occupancy = occupancy
+            cubes = []
+            with profiler.stage("mapping"):
+                cube_positions = {
+                    k: [v] for k, v in occupancy.to_positions(grid).items()
+                }
+        else:
+            # Detect cubes with the precompiled color classifier
+            with profiler.stage("detect_cubes"):
+                cubes = detect_cubes(
+                    preprocessed_image.copy() if current_debug else preprocessed_image,
+                    settings,
+                    debug=current_debug,
+                    classifier=settings.color_classifier,
+                    profiler=profiler,
+                    sink=sink,
+                    image_name=image_name,
+                )
+
+            # Map cubes to squares
+            with profiler.stage("mapping"):
+                rows, cols, _ = grid.locate_boxes(
+                    [(c["x"], c["y"], c["w"], c["h"]) for c in cubes]
+                )
+                self._cube_cache = list(zip(rows.tolist(), cols.tolist(), cubes))
+                cube_positions = map_cubes_to_squares(cubes, grid)
+
+        if not cube_positions:
+            logging.info(f"No cubes detected in {image_name}.")
+            return None
+        return cubes, grid, cube_positions
+
+    def _detect_incremental(
+        self,
+        warped_image: Any,
+        image_name: str,
+        chessboard_size: Tuple[int, int],
+        changed: Any,
+        settings: VisionSettings,
+    ) -> Optional[Tuple[List[Dict[str, Any]], Any, Dict[str, List[str]]]]:
+        """
+        Classifies only the changed squares and reuses the cached result for the others.
+        Returns (cubes, grid, cube_positions) or None if nothing was detected.
+        """
+        profiler = self.profiler
+        height, width = warped_image.shape[:2]
+        grid = get_board_grid((width, height), chessboard_size)
+        logging.debug(
+            f"Incremental update of {int(changed.sum())} changed squares in {image_name}."
+        )
+
+        if settings.detection_mode == "blocks":
+            with profiler.stage("occupancy"):
+                occupancy = self.update_occupancy(warped_image, grid, changed, settings)
+            self.last_occupancy = occupancy
+            cubes = []
+            with profiler.stage("mapping"):
+                cube_positions = {
+                    k: [v] for k, v in occupancy.to_positions(grid).items()
+                }
+        else:
+            with profiler.stage("detect_cubes"):
+                self._cube_cache = self.update_cubes(
+                    warped_image, grid, changed, settings
+                )
+            cubes = [cube for _, _, cube in self._cube_cache]
+            with profiler.stage("mapping"):
+                cube_positions = map_cubes_to_squares(cubes, grid)
+
+        if not cube_positions:
+            logging.info(f"No cubes detected in {image_name}.")
+            return None
+        return cubes, grid, cube_positions
+
     def process_image(
         self,
         image: Any,
         image_name: str,
         debug: Optional[bool] = None,
         skip_border_detection: bool = False,
+    ) -> Tuple[bool, Optional[Dict[str, str]]]:
+        with self.profiler.stage("process_image"):
+            return self._process_image(image, image_name, debug, skip_border_detection)
+
+    def _process_image(
+        self,
+        image: Any,
+        image_name: str,
+        debug: Optional[bool],
+        skip_border_detection: bool,
     ) -> Tuple[bool, Optional[Dict[str, str]]]:
         if debug is not None:
             current_debug = debug
         else:
             current_debug = self.debug
+        profiler = self.profiler
+        # One settings snapshot per frame, see apply_settings
+        settings = self.settings
 
         try:
             if image is None:
@@ -257,117 +703,57 @@ class ChessCubeProcessor:
                 # Obstacle detection code here if needed
                 pass  # Assuming you handle this as per your requirements
 
-            # Use the chessboard points from the configuration
-            chessboard_points = np.array(self.chessboard_points, dtype="float32")
-            ordered_points = order_points(chessboard_points)
+            # Warp perspective to a top-down view and rotate in a single remap pass
+            with profiler.stage("warp"):
+                warped_image = self.warp_board(image, settings)
 
-            # Warp perspective to get a top-down view
-            warped_size = tuple(self.config.get("warped_size", [800, 800]))
-            warped_image, _ = warp_perspective(image, ordered_points, size=warped_size)
+            sink = self.debug_sink if current_debug else None
+            if sink is not None:
+                sink.submit("debug_images", f"warped_{image_name}", warped_image)
 
-            if current_debug:
-                cv2.imshow("Warped Image", warped_image)
-                cv2.waitKey(0)
-                cv2.destroyAllWindows()
-
-            # Rotate the warped image if necessary
-            rotation_angle = self.config.get("rotation_angle", -90)
-            if rotation_angle != 0:
-                warped_image = self.rotate_image(warped_image, rotation_angle)
-                if current_debug:
-                    cv2.imshow("Rotated Warped Image", warped_image)
-                    cv2.waitKey(0)
-                    cv2.destroyAllWindows()
-
-            # Preprocess the image (increase saturation)
-            preprocessed_image = self.preprocess_image(warped_image, increase_value=50)
-            if current_debug:
-                cv2.imshow("Preprocessed Image", preprocessed_image)
-                cv2.waitKey(0)
-                cv2.destroyAllWindows()
+            chessboard_size = settings.chessboard_size
 
-            # Conditionally save the preprocessed image used for cube detection
-            if current_debug:
-                # Save the preprocessed image used for cube detection
-                preprocessed_image_dir = os.path.join("preprocessed_images")
-                os.makedirs(preprocessed_image_dir, exist_ok=True)
-                preprocessed_image_path = os.path.join(
-                    preprocessed_image_dir, f"preprocessed_{image_name}"
+            # Squares that changed since the last processed frame (None: all of them)
+            with profiler.stage("change_detection"):
+                changed = self.detect_square_changes(
+                    warped_image, chessboard_size, settings
                 )
-                cv2.imwrite(preprocessed_image_path, preprocessed_image)
-                logging.info(f"Preprocessed image saved as {preprocessed_image_path}")
-
-            # Detect cubes on the preprocessed image
-            # Optionally save the image used for color detection
+            height, width = warped_image.shape[:2]
+            self.last_changed_squares = self.changed_squares(
+                get_board_grid((width, height), chessboard_size)
+            )
             if current_debug:
-                color_detection_image_path = os.path.join(
-                    "debug_images", "color_detection_image.jpg"
+                changed = None
+
+            if changed is None:
+                result = self._detect_full(
+                    warped_image,
+                    image_name,
+                    chessboard_size,
+                    current_debug,
+                    sink,
+                    settings,
                 )
-                os.makedirs(os.path.dirname(color_detection_image_path), exist_ok=True)
-                cv2.imwrite(color_detection_image_path, preprocessed_image)
-                logging.info(
-                    f"Image used for color detection saved as {color_detection_image_path}"
+            else:
+                result = self._detect_incremental(
+                    warped_image, image_name, chessboard_size, changed, settings
                 )
-
-            # Use your existing detect_cubes function
-            cubes = detect_cubes(
-                preprocessed_image.copy(), self.config, debug=current_debug
-            )
-
-            if not cubes:
-                logging.info(f"No cubes detected in {image_name}.")
+            if result is None:
                 return False, None
-
-            # Detect squares on the warped image
-            chessboard_size = tuple(self.config.get("chessboard_size", [8, 8]))
-            squares = detect_squares(
-                warped_image.copy(),
-                debug=current_debug,
-                chessboard_size=chessboard_size,
-            )
-
-            if (
-                squares is None
-                or len(squares) != chessboard_size[0] * chessboard_size[1]
-            ):
-                logging.error(f"Squares not properly detected in {image_name}.")
-                return False, None
-
-            logging.info(f"Number of squares detected: {len(squares)}")
-
-            # Map cubes to squares
-            cube_positions = {}
-            for cube in cubes:
-                row, col = map_cube_to_square(cube, squares)
-                if row is not None and col is not None:
-                    columns = ["A", "B", "C", "D", "E", "F", "G", "H"]
-                    square_label = f"{columns[col]}{8 - row}"
-                    if square_label not in cube_positions:
-                        cube_positions[square_label] = []
-                    cube_positions[square_label].append(cube["color"])
+            cubes, grid, cube_positions = result
 
             # Convert list of colors to a single string if multiple cubes are present
             cube_positions_str = {k: ", ".join(v) for k, v in cube_positions.items()}
 
             logging.info(f"Cubes on {image_name}: {cube_positions_str}")
 
-            # Draw annotations on the warped image
-            annotated = draw_annotations(
-                warped_image.copy(), squares, cubes, cube_positions_str
-            )
-
-            if current_debug:
-                cv2.imshow("Final Annotated Image", annotated)
-                cv2.waitKey(0)
-                cv2.destroyAllWindows()
-
-            # Optionally, save the annotated image
-            if current_debug:
-                annotated_dir = os.path.join("annotated_images")
-                os.makedirs(annotated_dir, exist_ok=True)
-                annotated_path = os.path.join(annotated_dir, f"annotated_{image_name}")
-                cv2.imwrite(annotated_path, annotated)
-                logging.info(f"Annotated image saved to {annotated_path}")
+            # Draw annotations on the warped image, only needed for the debug output
+            if sink is not None:
+                with profiler.stage("annotate"):
+                    annotated = draw_annotations(
+                        warped_image.copy(), grid, cubes, cube_positions_str
+                    )
+                sink.submit("annotated_images", f"annotated_{image_name}", annotated)
 
             return False, cube_positions_str
 
@@ -376,4 +762,5 @@ class ChessCubeProcessor:
             return False, None
 
     def cleanup(self):
+        self.debug_sink.close()
         cv2.destroyAllWindows()
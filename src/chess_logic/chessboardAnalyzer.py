@@ -1,19 +1,31 @@
-import os
+import asyncio
 import cv2
 import logging
 import time
 import threading
-from typing import Optional, Dict, Any, Tuple, List
-
-import yaml
+from collections import deque
+from typing import Optional, Dict, Any, Deque, Tuple
 
 from chess_logic.chess_cube_processor import ChessCubeProcessor
+from chess_logic.vision_settings import SettingsWatcher, VisionSettings, load_settings
 from computer_vision.compare_move import compare_cube_positions_new_and_missing
+from computer_vision.frame_grabber import FrameGrabber
+from computer_vision.frame_source import CameraSource, FrameSource
+from computer_vision.temporal_filter import BoardStateFilter
+from computer_vision.warmup import WarmupMonitor
+
+# Seconds to wait for a fresh frame from the frame grabber
+FRAME_TIMEOUT = 2.0
 
 
 class ChessCubeAnalyzer(threading.Thread):
     def __init__(
-        self, config_path: str = None, debug: bool = False, camera_index: int = 1
+        self,
+        config_path: str = None,
+        debug: bool = False,
+        camera_index: int = 1,
+        frame_source: Optional[FrameSource] = None,
+        settings: Optional[VisionSettings] = None,
     ):
         super().__init__()
         self.daemon = True  # Allows thread to be killed when main thread exits
@@ -21,145 +33,409 @@ class ChessCubeAnalyzer(threading.Thread):
         self.debug = debug
         self.logger = logging.getLogger(self.__class__.__name__)
 
-        # Determine the path to the configuration file
-        if config_path is None:
-            config_path = os.path.join(
-                os.path.dirname(__file__), "..", "resources", "config", "settings.yaml"
-            )
-        else:
-            if not os.path.isabs(config_path):
-                config_path = os.path.join(os.path.dirname(__file__), config_path)
-
-        config_path = os.path.abspath(config_path)
-        self.logger.debug(f"Using config path: {config_path}")  # For debugging purposes
-
-        # Load configuration
-        self.config = self.load_config(config_path)
-
-        # Define quadrilateral points from config
-        self.chessboard_points = [
-            tuple(point) for point in self.config.get("chessboard_points", [])
-        ]
-        self.obstacle_detection_points = [
-            tuple(point) for point in self.config.get("obstacle_detection_points", [])
-        ]
+        # Load (or share) the validated configuration
+        if settings is None:
+            settings = load_settings(config_path)
+        self.settings = settings
+        self.logger.debug(f"Using config path: {settings.path}")
 
         # Initialize ChessCubeProcessor
-        self.processor = ChessCubeProcessor(
-            config_path=config_path,
-            debug=debug,
-            chessboard_points=self.chessboard_points,
-            obstacle_detection_points=self.obstacle_detection_points,
-        )
+        self.processor = ChessCubeProcessor(debug=debug, settings=settings)
 
-        # Initialize webcam
-        self.camera_index = self.config.get("camera_id", camera_index)
-        self.cap = cv2.VideoCapture(self.camera_index)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.config.get("camera_width", 1920))
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config.get("camera_height", 1080))
+        # Initialize webcam unless another frame source (e.g. a replay) is given
+        if frame_source is None:
+            self.camera_index = (
+                settings.camera_id if settings.camera_id is not None else camera_index
+            )
+            frame_source = CameraSource(
+                self.camera_index,
+                width=settings.camera_width,
+                height=settings.camera_height,
+            )
+        self.cap = frame_source
 
         if not self.cap.isOpened():
-            self.logger.error(
-                f"Error: Could not open webcam with index {self.camera_index}."
-            )
-            raise IOError(f"Cannot open webcam with index {self.camera_index}.")
+            self.logger.error(f"Error: Could not open {self.cap}.")
+            raise IOError(f"Cannot open {self.cap}.")
 
-        self.logger.info("Webcam opened successfully.")
+        self.logger.info(f"Opened {self.cap} successfully.")
 
-        # Initialize camera (warm-up for 5 seconds)
-        self.initialize_camera()
+        # Single capture thread; all consumers read from its ring buffer
+        self.frame_grabber = FrameGrabber(
+            self.cap, buffer_size=settings.frame_buffer_size
+        )
+        self.frame_grabber.start()
+
+        # Initialize camera (warm-up until exposure and white balance settle)
+        if self.cap.needs_warmup:
+            self.initialize_camera()
 
         # Initialize obstacle detection
-        ret, frame = self.cap.read()
-        if not ret:
+        frame = self.frame_grabber.next_frame(timeout=FRAME_TIMEOUT)
+        if frame is None:
             self.logger.error("Error: Failed to capture initial image from webcam.")
             raise IOError("Cannot capture initial image from webcam.")
-        self.processor.initialize_obstacle_detection(frame)
+        self.processor.initialize_obstacle_detection(frame.image)
 
         # Initialize positions
         self.initial_positions: Dict[str, str] = {}
         self.updated_positions: Dict[str, str] = {}
+        # Squares whose image changed since the initial capture (None: unknown, e.g.
+        # incremental detection disabled), see track_changed_squares
+        self.changed_squares: Optional[set] = None
 
         # Lock for thread-safe position updates
         self.lock = threading.Lock()
 
+        # Reloaded settings waiting to be swapped in between two processed frames
+        self._pending_settings: Optional[VisionSettings] = None
+
         # Event to signal thread to stop
         self.stop_event = threading.Event()
 
         # Initialize obstacle flag
         self.obstacle_present = False  # <--- Added flag
 
+        self.obstacle_latencies: Deque[float] = deque(maxlen=256)
+        self.obstacle_check_times: Deque[float] = deque(maxlen=256)
+
+        # Scene settling: a disturbance (obstacle or motion) followed by stable checks
+        self.settle_condition = threading.Condition()
+        self.scene_disturbed = False
+        self.stable_checks = 0
+
+        self.apply_settings(settings)
+
         # Start the obstacle detection thread
         self.obstacle_thread = threading.Thread(
             target=self.run_obstacle_detection, daemon=True
         )
         self.obstacle_thread.start()
 
-    @staticmethod
-    def load_config(config_path: str) -> Dict[str, Any]:
-        with open(config_path, "r") as file:
-            config = yaml.safe_load(file)
-        logging.getLogger("ChessCubeAnalyzer").debug(
-            f"Configuration loaded from {config_path}."
+        # Apply edits of the settings file without reopening the camera
+        reload_config = settings.get("settings_reload", {})
+        self.settings_watcher: Optional[SettingsWatcher] = None
+        if reload_config.get("enabled", False) and settings.path:
+            self.settings_watcher = SettingsWatcher(
+                settings,
+                self.reload_settings,
+                interval=reload_config.get("interval", 1.0),
+            )
+            self.settings_watcher.start()
+
+    @property
+    def config(self) -> VisionSettings:
+        return self.settings
+
+    def apply_settings(self, settings: VisionSettings):
+        """
+        Derives the obstacle, settle and voting parameters from the settings.
+        """
+        self.settings = settings
+
+        # Obstacle detection rate; keep the reference update period independent of it
+        obstacle_config = settings.get("obstacle_detection", {})
+        self.obstacle_rate_hz = settings.obstacle_rate_hz
+        reference_update_seconds = obstacle_config.get(
+            "reference_update_seconds", settings.get("initialization_frames", 30)
+        )
+        self.processor.UPDATE_INTERVAL = max(
+            1, round(reference_update_seconds * self.obstacle_rate_hz)
+        )
+
+        # Scene settling: a disturbance (obstacle or motion) followed by stable checks
+        settle_config = settings.get("settle", {})
+        self.settle_stable_checks = settle_config.get("stable_checks", 5)
+        self.settle_motion_threshold = settle_config.get("motion_threshold", 0.002)
+        self.settle_timeout = settle_config.get("timeout", 10.0)
+
+        # Multi-frame voting of the board state used by initial() and update()
+        temporal_config = settings.get("temporal_filter", {})
+        self.state_filter = BoardStateFilter(
+            window=temporal_config.get("window", 3),
+            min_agreement=temporal_config.get("min_agreement", 0.66),
         )
-        return config
+        self.temporal_max_frames = temporal_config.get("max_frames", 9)
 
-    def initialize_camera(self):
+    def reload_settings(self, settings: VisionSettings):
         """
-        Warm up the camera for 5 seconds to allow auto-exposure, white balance, and other settings to stabilize.
+        Queues reloaded settings; called on the settings watcher thread. They are swapped
+        in before the next frame is processed (see apply_pending_settings), so no frame
+        is processed while the state it uses is replaced. The camera keeps running;
+        camera settings only take effect after a restart.
         """
-        self.logger.info("Initializing camera. Waiting for 5 seconds...")
-        start_time = time.time()
+        camera_keys = (
+            "camera_id",
+            "camera_width",
+            "camera_height",
+            "frame_buffer_size",
+        )
+        if any(
+            getattr(self.settings, key) != getattr(settings, key) for key in camera_keys
+        ):
+            self.logger.warning("Camera settings changed; restart to apply them.")
+        with self.lock:
+            self._pending_settings = settings
 
-        while time.time() - start_time < 5:
-            ret, frame = self.cap.read()
-            if not ret:
+    def apply_pending_settings(self) -> bool:
+        """
+        Switches the processor and the analyzer to queued settings, if any. Only called
+        by the thread processing frames, between two frames. The obstacle thread takes a
+        new reference frame itself once the obstacle region changed.
+        """
+        with self.lock:
+            settings, self._pending_settings = self._pending_settings, None
+        if settings is None:
+            return False
+        self.processor.apply_settings(settings)
+        self.apply_settings(settings)
+        self.logger.info("Reloaded settings applied.")
+        return True
+
+    def initialize_camera(self) -> float:
+        """
+        Warm up the camera until auto-exposure and white balance have settled, i.e. the
+        frame brightness and color balance stopped changing (see WarmupMonitor), bounded
+        by camera_warmup.min_seconds and camera_warmup.max_seconds.
+        Returns the warm-up duration in seconds.
+        """
+        warmup_config = self.settings.get("camera_warmup", {})
+        min_seconds = warmup_config.get("min_seconds", 0.5)
+        max_seconds = warmup_config.get("max_seconds", 5.0)
+        monitor = WarmupMonitor.from_config(self.settings)
+        self.logger.info(
+            f"Initializing camera. Waiting up to {max_seconds} seconds to settle..."
+        )
+        start_time = time.monotonic()
+
+        converged = False
+        last_seq = 0
+        while time.monotonic() - start_time < max_seconds:
+            frame = self.frame_grabber.wait_for_frame(last_seq, timeout=1.0)
+            if frame is None:
                 self.logger.warning(
                     "Failed to read frame during camera initialization."
                 )
                 continue
+            last_seq = frame.seq
+
+            converged = monitor.update(frame.image)
+            if converged and time.monotonic() - start_time >= min_seconds:
+                break
 
             # Optionally, show the frame to observe progress (can be disabled)
             if self.processor.debug:
-                cv2.imshow("Initializing Camera", frame)
+                cv2.imshow("Initializing Camera", frame.image)
                 if cv2.waitKey(1) & 0xFF == ord(
                     "q"
                 ):  # Allow exiting during initialization
                     self.logger.info("Exiting camera initialization.")
                     break
 
-        cv2.destroyAllWindows()  # Close the initialization window
-        self.logger.info("Camera initialization completed.")
+        if self.processor.debug:
+            cv2.destroyAllWindows()  # Close the initialization window
+        elapsed = time.monotonic() - start_time
+        if converged:
+            self.logger.info(
+                f"Camera settled after {elapsed:.2f} s ({last_seq} frames): "
+                f"{monitor.summary()}"
+            )
+        else:
+            self.logger.warning(
+                f"Camera did not settle within {elapsed:.2f} s: {monitor.summary()}"
+            )
+        return elapsed
 
     def run_obstacle_detection(self):
         self.logger.info("Starting obstacle detection thread.")
+        last_seq = 0
         try:
             while not self.stop_event.is_set():
                 start_time = time.time()
 
-                ret, frame = self.cap.read()
-                if not ret:
-                    self.logger.error("Error: Failed to capture image from webcam.")
+                # Always check the newest frame, never a buffered one
+                frame = self.frame_grabber.wait_for_frame(last_seq, timeout=1.0)
+                if frame is None:
+                    if self.frame_grabber.finished:
+                        self.logger.info("Frame source finished.")
+                        break
+                    self.logger.error("Error: No new frame from webcam.")
                     continue
+                last_seq = frame.seq
 
                 # Check for obstacle
-                obstacle_present = self.processor.detect_obstacle(frame)
+                obstacle_present = self.processor.detect_obstacle(frame.image)
                 with self.lock:
+                    if obstacle_present != self.obstacle_present:
+                        if obstacle_present:
+                            self.logger.warning("Obstacle detected.")
+                        else:
+                            self.logger.info("No obstacle detected.")
                     self.obstacle_present = obstacle_present  # <--- Update the flag
 
-                if obstacle_present:
-                    self.logger.warning("Obstacle detected.")
-                else:
-                    self.logger.info("No obstacle detected.")
+                # Track how long the scene has been stable for wait_for_settled_scene
+                moving = self.processor.last_motion_ratio > self.settle_motion_threshold
+                with self.settle_condition:
+                    if obstacle_present or moving:
+                        self.scene_disturbed = True
+                        self.stable_checks = 0
+                    else:
+                        self.stable_checks += 1
+                    self.settle_condition.notify_all()
 
-                # Calculate elapsed time and sleep for the remaining time to make it 1 second
+                # Record latency and sleep for the remainder of the check period
+                self.obstacle_latencies.append(time.time() - frame.timestamp)
                 elapsed_time = time.time() - start_time
-                sleep_time = max(0, 1.0 - elapsed_time)
-                time.sleep(sleep_time)
+                self.obstacle_check_times.append(start_time)
+                sleep_time = max(0, 1.0 / self.obstacle_rate_hz - elapsed_time)
+                self.stop_event.wait(sleep_time)
 
         except Exception as e:
             self.logger.error(f"Exception in obstacle detection thread: {e}")
 
+    def get_obstacle_stats(self) -> Dict[str, Any]:
+        """
+        Returns the measured obstacle detection rate and per-check latency (frame capture
+        to detection result) over the most recent checks.
+        """
+        latencies = sorted(self.obstacle_latencies)
+        check_times = list(self.obstacle_check_times)
+
+        rate_hz = 0.0
+        if len(check_times) > 1 and check_times[-1] > check_times[0]:
+            rate_hz = (len(check_times) - 1) / (check_times[-1] - check_times[0])
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+        return {
+            "target_rate_hz": self.obstacle_rate_hz,
+            "rate_hz": rate_hz,
+            "checks": len(latencies),
+            "pyramid_levels": self.processor.OBSTACLE_PYRAMID_LEVELS,
+            "latency_ms": {
+                "mean": (sum(latencies) / len(latencies) * 1000) if latencies else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": latencies[-1] * 1000 if latencies else 0.0,
+            },
+        }
+
+    def set_profiling(self, enabled: bool):
+        """
+        Turns per-stage timing of the vision pipeline on or off at runtime.
+        """
+        self.processor.profiler.enabled = enabled
+
+    def get_vision_stats(self) -> Dict[str, Dict]:
+        """
+        Returns per-stage latency statistics of process_image and detect_obstacle
+        (count, mean, p50/p90/p99, max and a histogram, all in milliseconds). Empty
+        unless profiling is enabled in the settings or through set_profiling().
+        """
+        return self.processor.profiler.stats()
+
+    def wait_for_settled_scene(
+        self, timeout: Optional[float] = None, stable_checks: Optional[int] = None
+    ) -> bool:
+        """
+        Blocks until the scene was disturbed (a hand entered or the board moved) and has
+        since been stable for stable_checks obstacle checks. Consumes the disturbance.
+        Returns False on timeout.
+        """
+        required = stable_checks or self.settle_stable_checks
+        with self.settle_condition:
+            settled = self.settle_condition.wait_for(
+                lambda: (self.scene_disturbed and self.stable_checks >= required)
+                or self.stop_event.is_set(),
+                timeout,
+            )
+            if settled and not self.stop_event.is_set():
+                self.scene_disturbed = False
+                return True
+            return False
+
+    def wait_for_move(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Waits for the player to finish a move and returns the result of compareMove().
+        Captures as soon as the scene has settled; after timeout (default from
+        settle.timeout) it captures anyway, so a missed disturbance is never fatal.
+        """
+        if timeout is None:
+            timeout = self.settle_timeout
+        if self.wait_for_settled_scene(timeout):
+            self.logger.info("Scene settled, capturing board.")
+        self.update()
+        return self.compareMove()
+
+    async def wait_for_move_async(
+        self, timeout: Optional[float] = None
+    ) -> Optional[str]:
+        """
+        Awaitable version of wait_for_move.
+        """
+        return await asyncio.to_thread(self.wait_for_move, timeout)
+
+    def capture_stable_positions(
+        self, prefix: str
+    ) -> Tuple[str, Optional[Dict[str, str]]]:
+        """
+        Processes new frames until the per-square vote over the last temporal_filter.window
+        frames is stable, so a single glare or shadow frame cannot produce a phantom move.
+
+        Returns (status, positions) where status is "stable", "obstacle detected",
+        "no frame" or "unstable" (no stable state within temporal_filter.max_frames).
+        """
+        self.state_filter.reset()
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        # Only use frames captured after this call to avoid stale frames
+        last_seq = self.frame_grabber.sequence
+
+        for _ in range(self.temporal_max_frames):
+            with self.lock:
+                if self.obstacle_present:
+                    return "obstacle detected", None
+
+            frame = self.frame_grabber.wait_for_frame(last_seq, timeout=FRAME_TIMEOUT)
+            if frame is None:
+                return "no frame", None
+            last_seq = frame.seq
+            # Votes under the previous settings are dropped with the old filter
+            self.apply_pending_settings()
+
+            # Process outside the lock so the obstacle thread is never blocked
+            image_name = f"{prefix}_frame_{timestamp}_{frame.seq}.jpg"
+            obstacle_detected, positions = self.processor.process_image(
+                frame.image, image_name
+            )
+            if obstacle_detected:
+                return "obstacle detected", None
+            self.track_changed_squares(self.processor.last_changed_squares)
+
+            self.state_filter.update(positions)
+            stable_positions = self.state_filter.stable_state()
+            if stable_positions is not None:
+                return "stable", stable_positions
+
+        self.logger.debug(
+            f"Unstable board state estimate: {self.state_filter.estimate()}"
+        )
+        return "unstable", None
+
+    def track_changed_squares(self, squares: Optional[set]):
+        """
+        Adds the squares that changed in the last processed frame to changed_squares.
+        An unknown change (None) makes the whole board count as changed until the next
+        initial capture.
+        """
+        with self.lock:
+            if squares is None:
+                self.changed_squares = None
+            elif self.changed_squares is not None:
+                self.changed_squares |= squares
+
     def initial(self) -> Optional[str]:
         """
         Capture and store the initial cube positions.
@@ -171,34 +447,34 @@ class ChessCubeAnalyzer(threading.Thread):
                 )
                 return "obstacle detected"
 
-        with self.lock:
-            ret, frame = self.cap.read()
-            if not ret:
-                self.logger.error(
-                    "Error: Failed to capture image from webcam during initial capture."
-                )
-                return None
-
-            timestamp = time.strftime("%Y%m%d-%H%M%S")
-            image_name = f"initial_frame_{timestamp}.jpg"
+        status, initial_positions = self.capture_stable_positions("initial")
+        if status == "obstacle detected":
+            self.logger.warning("Obstacle detected during initial capture.")
+            return "obstacle detected"
 
-            obstacle_detected, initial_positions = self.processor.process_image(
-                frame, image_name
+        if status == "no frame":
+            self.logger.error(
+                "Error: Failed to capture image from webcam during initial capture."
             )
-            if obstacle_detected:
-                self.logger.warning("Obstacle detected during initial capture.")
-                return "obstacle detected"
+            return None
 
-            if initial_positions is None:
-                self.logger.info(
-                    f"No cubes detected in {image_name} during initial capture."
-                )
-                return "No cubes detected during initial capture."
+        if status == "unstable":
+            self.logger.warning("Board state not stable during initial capture.")
+            return "board state unstable during initial capture."
 
+        if not initial_positions:
+            self.logger.info("No cubes detected during initial capture.")
+            return "No cubes detected during initial capture."
+
+        with self.lock:
             self.initial_positions = initial_positions
-            self.logger.info("Initial cube positions captured and stored.")
+            self.changed_squares = set()
+        # Disturbances before the new baseline must not trigger a move
+        with self.settle_condition:
+            self.scene_disturbed = False
+        self.logger.info("Initial cube positions captured and stored.")
 
-            return "initial capture completed"
+        return "initial capture completed"
 
     def update(self) -> Optional[str]:
         """
@@ -209,34 +485,30 @@ class ChessCubeAnalyzer(threading.Thread):
                 self.logger.warning("Cannot perform update capture: Obstacle detected.")
                 return "obstacle detected"
 
-        with self.lock:
-            ret, frame = self.cap.read()
-            if not ret:
-                self.logger.error(
-                    "Error: Failed to capture image from webcam during update."
-                )
-                return None
-
-            timestamp = time.strftime("%Y%m%d-%H%M%S")
-            image_name = f"update_frame_{timestamp}.jpg"
+        status, updated_positions = self.capture_stable_positions("update")
+        if status == "obstacle detected":
+            self.logger.warning("Obstacle detected during update capture.")
+            return "obstacle detected"
 
-            obstacle_detected, updated_positions = self.processor.process_image(
-                frame, image_name
+        if status == "no frame":
+            self.logger.error(
+                "Error: Failed to capture image from webcam during update."
             )
-            if obstacle_detected:
-                self.logger.warning("Obstacle detected during update capture.")
-                return "obstacle detected"
+            return None
 
-            if updated_positions is None:
-                self.logger.info(
-                    f"No cubes detected in {image_name} during update capture."
-                )
-                return "No cubes detected during update capture."
+        if status == "unstable":
+            self.logger.warning("Board state not stable during update capture.")
+            return "board state unstable during update capture."
+
+        if not updated_positions:
+            self.logger.info("No cubes detected during update capture.")
+            return "No cubes detected during update capture."
 
+        with self.lock:
             self.updated_positions = updated_positions
-            self.logger.info("Updated cube positions captured and stored.")
+        self.logger.info("Updated cube positions captured and stored.")
 
-            return "update capture completed"
+        return "update capture completed"
 
     def compareMove(self) -> Optional[str]:
         """
@@ -260,8 +532,34 @@ class ChessCubeAnalyzer(threading.Thread):
                 )
                 return "updated positions not set"
 
+            updated_positions = self.updated_positions
+            if self.changed_squares is not None:
+                # Squares whose image did not change keep their initial state, so a
+                # classification flip there cannot produce a phantom move
+                ignored = {
+                    square
+                    for square in set(self.initial_positions) | set(updated_positions)
+                    if square not in self.changed_squares
+                    and self.initial_positions.get(square)
+                    != updated_positions.get(square)
+                }
+                if ignored:
+                    self.logger.debug(
+                        f"Ignoring state changes on unchanged squares: {ignored}"
+                    )
+                updated_positions = {
+                    square: color
+                    for square, color in updated_positions.items()
+                    if square in self.changed_squares
+                }
+                updated_positions.update(
+                    (square, color)
+                    for square, color in self.initial_positions.items()
+                    if square not in self.changed_squares
+                )
+
             movements = compare_cube_positions_new_and_missing(
-                self.initial_positions, self.updated_positions
+                self.initial_positions, updated_positions
             )
 
             movement_strings = []
@@ -304,8 +602,9 @@ class ChessCubeAnalyzer(threading.Thread):
                 print(movement_description)
 
             # Reset initial_positions to updated_positions for future comparisons
-            self.initial_positions = self.updated_positions.copy()
+            self.initial_positions = updated_positions.copy()
             self.updated_positions = {}
+            self.changed_squares = set()
 
             self.logger.info("Cube positions updated after comparison.")
 
@@ -331,10 +630,14 @@ class ChessCubeAnalyzer(threading.Thread):
         Clean up resources before shutting down.
         """
         self.logger.info("Stopping ChessCubeAnalyzer thread.")
+        if self.settings_watcher is not None:
+            self.settings_watcher.stop(timeout=FRAME_TIMEOUT)
         self.stop_event.set()
         self.obstacle_thread.join()  # Wait for the obstacle detection thread to finish
-        self.join()  # Wait for the main thread to finish
-        self.logger.info("Releasing webcam and cleaning up resources.")
+        if self.is_alive():
+            self.join()  # Wait for the main thread to finish
+        self.logger.info(f"Releasing {self.cap} and cleaning up resources.")
+        self.frame_grabber.stop(timeout=FRAME_TIMEOUT)
         self.cap.release()
         self.processor.cleanup()
         cv2.destroyAllWindows()
@@ -1,16 +1,20 @@
 import threading
 
 import chess
+from loguru import logger
 from chess_logic.speaker import Speaker
+from chess_logic.speech_queue import HIGH
 import chess.pgn
 import chess.svg
 from chess_logic.openings import openings
 import random
+from chess_logic.keyword_spotting import SpotterFinished
 from chess_logic.voice_recognizer import VoiceRecognizer
 from chess_logic.chessboardAnalyzer import ChessCubeAnalyzer
-import time
 from robot.controller import RobotController
 from robot.emotions import Emotions
+from robot.robot_state import MotionTimeout
+from utils.startup import ParallelStartup
 
 
 class Game:
@@ -23,22 +27,48 @@ class Game:
         "P": "Pawn",
     }
 
+    WRONG_MOVE = "That's not the correct move. Wait, I will reset it for you."
+    TRY_AGAIN = "Try again or ask for help."
+    HELP_PROMPT = "Say 'help' and I will give you the solution"
+    PIECE_MISSED = "I could not grab the piece. Please move it from {} to {} for me."
+    NOT_REQUESTED_MOVE = "That is not the move I asked for. Please move {} to {}."
+
     def __init__(self):
-        self.robot = RobotController()
+        # Robot poses, camera warm-up and microphone setup run concurrently
+        startup = ParallelStartup()
+        startup.add("robot", RobotController, cleanup=lambda robot: robot.close())
+        startup.add(
+            "voice_recognizer",
+            VoiceRecognizer,
+            cleanup=lambda recognizer: recognizer.close(),
+        )
+        # Uses src/resources/config/settings.yaml regardless of the working directory
+        startup.add(
+            "chessboard_analyzer",
+            lambda: ChessCubeAnalyzer(debug=False),
+            cleanup=lambda analyzer: analyzer.cleanup(),
+        )
+
         self.board = chess.Board()
         self.speaker = Speaker()
         self.opening_line = random.choice(openings)
-        self.voice_recognizer = VoiceRecognizer()
         self.is_listening_for_help = False
-        self.chessboard_analyzer = ChessCubeAnalyzer(
-            config_path=r"../resources/config/settings.yaml", debug=False
-        )
+        # Synthesize everything the game will say while the subsystems start
+        self.speaker.prewarm(self.phrases_to_prewarm())
+
+        # Readiness barrier: the game starts once every subsystem is up
+        subsystems = startup.wait()
+        self.robot = subsystems["robot"]
+        self.voice_recognizer = subsystems["voice_recognizer"]
+        self.chessboard_analyzer = subsystems["chessboard_analyzer"]
+        self.startup_report = startup.report()
+        logger.info(startup.format_report())
 
     def update_board(self, move):
         try:
             chess_move = chess.Move.from_uci(move)
             if chess_move in self.board.legal_moves:
-                self.speaker.speak(self.expand_san(self.board.san(chess_move)))
+                self.speaker.say(self.expand_san(self.board.san(chess_move)))
                 self.board.push(chess_move)
             else:
                 print("Illegaler Zug!")
@@ -48,6 +78,23 @@ class Game:
             return False
         return True
 
+    def phrases_to_prewarm(self):
+        """
+        Returns the fixed prompts, the hints of the opening line and the announcements
+        of its moves.
+        """
+        phrases = [self.WRONG_MOVE, self.TRY_AGAIN, self.HELP_PROMPT]
+        phrases += VoiceRecognizer.PROMPTS
+        phrases += self.opening_line.hints
+        board = chess.Board()
+        for uci_move in self.opening_line.moves_uci:
+            move = chess.Move.from_uci(uci_move)
+            if move not in board.legal_moves:
+                break
+            phrases.append(self.expand_san(board.san(move)))
+            board.push(move)
+        return phrases
+
     def save_board_as_svg(self, filename="chess_board.svg"):
         with open(filename, "w") as f:
             f.write(chess.svg.board(board=self.board))
@@ -112,14 +159,12 @@ class Game:
                     print("Das ist nicht der richtige Zug. Versuche es erneut.")
                     self.is_listening_for_help = False
                     t1.join()
-                    self.speaker.speak(
-                        "That's not the correct move. Wait, I will reset it for you."
-                    )
+                    # Spoken while the robot puts the piece back
+                    self.speaker.say(self.WRONG_MOVE)
                     from_square = user_input[2:].upper()
                     to_square = user_input[:2].upper()
-                    self.robot.move_piece(from_square, to_square)
-                    self.chessboard_analyzer.initial()
-                    self.speaker.speak("Try again or ask for help.")
+                    self.robot_move(from_square, to_square)
+                    self.speaker.say(self.TRY_AGAIN)
         else:
             # Automatischer Zug für Schwarz
             black_move = self.opening_line.moves_uci[
@@ -128,21 +173,53 @@ class Game:
             print(f"Schwarzer Zug: {black_move}")
             from_square = black_move[:2].upper()
             to_square = black_move[2:].upper()
-            self.robot.move_piece(from_square, to_square)
-            self.chessboard_analyzer.initial()
+            self.robot_move(from_square, to_square)
             return black_move
 
+    def robot_move(self, from_square, to_square):
+        """
+        Moves a piece with the robot. If the gripper reports that it missed the piece,
+        or the arm did not finish a motion, the player is asked to move it and the
+        camera waits until the board shows that move.
+        """
+        try:
+            moved = self.robot.move_piece(from_square, to_square)
+        except MotionTimeout as e:
+            logger.error(f"Robot move from {from_square} to {to_square} failed: {e}")
+            moved = False
+        if not moved:
+            self.chessboard_analyzer.initial()
+            self.speaker.speak(
+                self.PIECE_MISSED.format(from_square.lower(), to_square.lower())
+            )
+            requested = f"{from_square}{to_square}".lower()
+            # Compared with the capture above, so a wrong move can still be corrected
+            while (movement := self.analyze_player_move_from_camera()) != requested:
+                logger.warning(f"Player moved {movement} instead of {requested}")
+                self.speaker.speak(
+                    self.NOT_REQUESTED_MOVE.format(
+                        from_square.lower(), to_square.lower()
+                    )
+                )
+        self.chessboard_analyzer.initial()
+
     def listen_for_start(self):
         if self.voice_recognizer.listen_for_start(self.speaker):
             self.play()
 
     def listen_for_help(self):
-        self.speaker.speak("Say 'help' and I will give you the solution")
+        self.speaker.speak(self.HELP_PROMPT)
         while self.is_listening_for_help:
-            if self.voice_recognizer.listen_for_help(self.speaker):
+            try:
+                heard = self.voice_recognizer.listen_for_help(self.speaker)
+            except SpotterFinished as e:
+                logger.error(f"No longer listening for help: {e}")
+                break
+            if heard:
                 hint = self.opening_line.get_hint()
                 print(hint)
-                self.speaker.speak(hint)
+                # Blocking, so the microphone does not pick the hint up
+                self.speaker.say(hint, priority=HIGH).result()
 
         print("Exiting thread")
 
@@ -150,9 +227,8 @@ class Game:
         has_moved = False
 
         while not has_moved:
-            time.sleep(5)
-            self.chessboard_analyzer.update()
-            movement = self.chessboard_analyzer.compareMove()
+            # Returns as soon as the hand has left and the board is stable again
+            movement = self.chessboard_analyzer.wait_for_move()
 
             if movement == "obstacle detected":
                 print("Obstacle detected. Cannot compare moves.")
@@ -200,3 +276,4 @@ class Game:
             self.opening_line.increment_move_index()  # Fortschritt in der Eröffnungslinie
 
         self.print_result()
+        self.speaker.shutdown(timeout=10)
@@ -0,0 +1,658 @@
+import functools
+import os
+import queue
+import tempfile
+import threading
+import time
+import wave
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+DEFAULT_TEMPLATES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "resources", "keywords"
+)
+
+
+class KeywordEvent:
+    """A recognized command, or unrecognized speech if keyword is None."""
+
+    __slots__ = ("keyword", "confidence", "time", "duration", "latency")
+
+    def __init__(self, keyword, confidence, time, duration, latency):
+        self.keyword = keyword
+        self.confidence = confidence
+        # time.monotonic() at the end of the utterance
+        self.time = time
+        self.duration = duration
+        # From the end of the utterance to the event
+        self.latency = latency
+
+    def __repr__(self):
+        return (
+            f"KeywordEvent({self.keyword!r}, confidence={self.confidence:.2f}, "
+            f"duration={self.duration:.2f}s, latency={self.latency * 1000:.0f}ms)"
+        )
+
+
+class MicrophoneSource:
+    """Persistent 16-bit mono microphone stream, read in fixed-size frames."""
+
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        frame_ms: int = FRAME_MS,
+        device_index: Optional[int] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.device_index = device_index
+        self._audio = None
+        self._stream = None
+
+    def open(self):
+        # Imported here so that recorded input works without audio hardware libraries
+        import pyaudio
+
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=self.device_index,
+            frames_per_buffer=self.frame_samples,
+        )
+
+    def read(self) -> Optional[np.ndarray]:
+        data = self._stream.read(self.frame_samples, exception_on_overflow=False)
+        return np.frombuffer(data, dtype=np.int16)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+
+
+class WavSource:
+    """Reads a recorded WAV file in microphone-sized frames, instead of a microphone."""
+
+    def __init__(
+        self,
+        path: str,
+        realtime: bool = False,
+        sample_rate: int = SAMPLE_RATE,
+        frame_ms: int = FRAME_MS,
+    ):
+        """
+        :param path: 16-bit PCM WAV file; stereo is mixed down and other sample rates
+                     are resampled.
+        :param realtime: Deliver frames at the recording's pace instead of at once.
+        """
+        self.path = path
+        self.realtime = realtime
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.frame_seconds = frame_ms / 1000
+        self._samples: Optional[np.ndarray] = None
+        self._position = 0
+        self._next_time = 0.0
+
+    def open(self):
+        self._samples = read_wav(self.path, self.sample_rate)
+        self._position = 0
+        self._next_time = time.monotonic()
+
+    def read(self) -> Optional[np.ndarray]:
+        if self._position >= len(self._samples):
+            return None
+        end = self._position + self.frame_samples
+        frame = self._samples[slice(self._position, end)]
+        self._position += self.frame_samples
+        if len(frame) < self.frame_samples:
+            frame = np.pad(frame, (0, self.frame_samples - len(frame)))
+        if self.realtime:
+            self._next_time += self.frame_seconds
+            time.sleep(max(0.0, self._next_time - time.monotonic()))
+        return frame
+
+    def close(self):
+        self._samples = None
+
+
+def read_wav(path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Returns the samples of a 16-bit PCM WAV file as mono int16 at sample_rate."""
+    with wave.open(path, "rb") as file:
+        if file.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        channels = file.getnchannels()
+        rate = file.getframerate()
+        samples = np.frombuffer(file.readframes(file.getnframes()), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    if rate != sample_rate and len(samples):
+        positions = np.arange(0, len(samples), rate / sample_rate)
+        samples = np.interp(positions, np.arange(len(samples)), samples)
+        samples = samples.astype(np.int16)
+    return samples
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int = SAMPLE_RATE):
+    with wave.open(path, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(sample_rate)
+        file.writeframes(samples.astype(np.int16).tobytes())
+
+
+class EnergyVAD:
+    """
+    Energy-based voice activity detection.
+
+    The background level is tracked as a running average of the RMS of non-speech
+    frames. Speech starts after start_frames consecutive frames louder than start_ratio
+    times that level and ends after hangover_ms of quieter frames; the frames before the
+    start (pre_roll_ms) are included so that soft onsets are not cut off.
+    """
+
+    def __init__(
+        self,
+        frame_ms: int = FRAME_MS,
+        start_ratio: float = 3.0,
+        min_rms: float = 200.0,
+        start_frames: int = 3,
+        hangover_ms: int = 300,
+        pre_roll_ms: int = 200,
+        max_segment_ms: int = 2500,
+        noise_adaptation: float = 0.05,
+    ):
+        self.start_ratio = start_ratio
+        self.min_rms = min_rms
+        self.start_frames = start_frames
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.max_frames = max_segment_ms // frame_ms
+        self.noise_adaptation = noise_adaptation
+        self._pre_roll: Deque[np.ndarray] = deque(
+            maxlen=max(1, pre_roll_ms // frame_ms)
+        )
+        self.noise_rms: Optional[float] = None
+        self._segment: List[np.ndarray] = []
+        self._loud_frames = 0
+        self._quiet_frames = 0
+
+    def reset(self):
+        self._pre_roll.clear()
+        self._segment = []
+        self._loud_frames = 0
+        self._quiet_frames = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return bool(self._segment)
+
+    def process(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """Adds a frame and returns the samples of an utterance once it has ended."""
+        rms = float(np.sqrt(np.mean(frame.astype(np.float32) ** 2)))
+        if self.noise_rms is None:
+            self.noise_rms = rms
+        loud = rms > max(self.min_rms, self.noise_rms * self.start_ratio)
+
+        if self._segment:
+            self._segment.append(frame)
+            self._quiet_frames = 0 if loud else self._quiet_frames + 1
+            if (
+                self._quiet_frames >= self.hangover_frames
+                or len(self._segment) >= self.max_frames
+            ):
+                segment = np.concatenate(self._segment)
+                self.reset()
+                return segment
+            return None
+
+        self._pre_roll.append(frame)
+        if loud:
+            self._loud_frames += 1
+            if self._loud_frames >= self.start_frames:
+                self._segment = list(self._pre_roll)
+                self._pre_roll.clear()
+                self._quiet_frames = 0
+        else:
+            self._loud_frames = 0
+            self.noise_rms += self.noise_adaptation * (rms - self.noise_rms)
+        return None
+
+
+@functools.lru_cache(maxsize=4)
+def _mel_filterbank(sample_rate: int, n_fft: int, n_mels: int) -> np.ndarray:
+    def to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    mels = np.linspace(to_mel(0), to_mel(sample_rate / 2), n_mels + 2)
+    bins = np.floor((n_fft + 1) * to_hz(mels) / sample_rate).astype(int)
+    filterbank = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+    for m in range(1, n_mels + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        for k in range(left, center):
+            filterbank[m - 1, k] = (k - left) / max(center - left, 1)
+        for k in range(center, right):
+            filterbank[m - 1, k] = (right - k) / max(right - center, 1)
+    return filterbank
+
+
+@functools.lru_cache(maxsize=4)
+def _dct_matrix(n_mels: int, n_ceps: int) -> np.ndarray:
+    n = np.arange(n_mels)
+    k = np.arange(n_ceps)[:, None]
+    return np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)).astype(np.float32)
+
+
+def mfcc(
+    samples: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    n_mels: int = 26,
+    n_ceps: int = 13,
+    window_ms: int = 25,
+    step_ms: int = 10,
+    n_fft: int = 512,
+) -> np.ndarray:
+    """Returns the mean-normalized MFCCs of an utterance, one row per 10 ms step."""
+    signal = samples.astype(np.float32) / 32768.0
+    signal = np.append(signal[:1], signal[1:] - 0.97 * signal[:-1])
+    window = sample_rate * window_ms // 1000
+    step = sample_rate * step_ms // 1000
+    if len(signal) < window:
+        signal = np.pad(signal, (0, window - len(signal)))
+    count = 1 + (len(signal) - window) // step
+    indices = np.arange(window)[None, :] + step * np.arange(count)[:, None]
+    frames = signal[indices] * np.hamming(window).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, n_fft)) ** 2 / n_fft
+    energies = np.log(power @ _mel_filterbank(sample_rate, n_fft, n_mels).T + 1e-10)
+    # c0 only measures loudness
+    features = energies @ _dct_matrix(n_mels, n_ceps)[1:].T
+    return features - features.mean(axis=0)
+
+
+def trim_silence(
+    samples: np.ndarray, sample_rate: int = SAMPLE_RATE, ratio: float = 0.1
+) -> np.ndarray:
+    """
+    Removes the quiet start and end of an utterance (10 ms blocks below ratio times the
+    loudest block), i.e. the pre-roll and hangover added by the voice activity detection.
+    """
+    block = sample_rate // 100
+    count = len(samples) // block
+    if count == 0:
+        return samples
+    blocks = samples[: count * block].astype(np.float32).reshape(count, block)
+    rms = np.sqrt(np.mean(blocks**2, axis=1))
+    loud = np.flatnonzero(rms >= ratio * rms.max())
+    return samples[slice(loud[0] * block, (loud[-1] + 1) * block)]
+
+
+def dtw_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """Dynamic time warping distance of two feature sequences, per step of the path."""
+    cost = np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2))
+    rows, cols = cost.shape
+    previous = np.full(cols + 1, np.inf)
+    previous[0] = 0.0
+    for i in range(rows):
+        # Diagonal and vertical predecessors at once, horizontal ones in the scan
+        vertical = np.minimum(previous[1:], previous[:-1]) + cost[i]
+        current = np.empty(cols + 1)
+        current[0] = np.inf
+        for j in range(cols):
+            current[j + 1] = min(vertical[j], current[j] + cost[i, j])
+        previous = current
+    return float(previous[cols] / (rows + cols))
+
+
+class TemplateKeywordDetector:
+    """
+    Offline keyword detector matching utterances against recorded examples.
+
+    Each keyword has one or more template recordings; an utterance is compared to all of
+    them by dynamic time warping over MFCC features and assigned to the closest keyword
+    if its distance is below threshold.
+    """
+
+    def __init__(
+        self,
+        templates: Dict[str, List[np.ndarray]],
+        sample_rate: int = SAMPLE_RATE,
+        threshold: float = 12.0,
+    ):
+        """
+        :param templates: Template recordings (int16 samples) per keyword.
+        :param threshold: Maximum DTW distance of a match.
+        """
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.templates = {
+            keyword: [
+                mfcc(trim_silence(samples, sample_rate), sample_rate)
+                for samples in recordings
+            ]
+            for keyword, recordings in templates.items()
+            if recordings
+        }
+        if not self.templates:
+            raise ValueError("No keyword templates")
+
+    @classmethod
+    def from_directory(
+        cls, directory: str, keywords: Iterable[str], **kwargs
+    ) -> "TemplateKeywordDetector":
+        """Loads <directory>/<keyword>/*.wav for each keyword."""
+        templates = {}
+        for keyword in keywords:
+            keyword_dir = os.path.join(directory, keyword)
+            if not os.path.isdir(keyword_dir):
+                continue
+            templates[keyword] = [
+                read_wav(os.path.join(keyword_dir, name))
+                for name in sorted(os.listdir(keyword_dir))
+                if name.endswith(".wav")
+            ]
+        return cls(templates, **kwargs)
+
+    @property
+    def keywords(self) -> List[str]:
+        return list(self.templates)
+
+    def detect(
+        self, samples: np.ndarray, sample_rate: int
+    ) -> Optional[Tuple[str, float]]:
+        """Returns (keyword, confidence between 0 and 1) or None."""
+        features = mfcc(trim_silence(samples, sample_rate), sample_rate)
+        best_keyword, best_distance = None, np.inf
+        for keyword, templates in self.templates.items():
+            for template in templates:
+                # Templates of a very different length cannot be the same word
+                if not 0.5 <= len(features) / len(template) <= 2.0:
+                    continue
+                distance = dtw_distance(features, template)
+                if distance < best_distance:
+                    best_keyword, best_distance = keyword, distance
+        if best_distance >= self.threshold:
+            return None
+        return best_keyword, 1.0 - best_distance / self.threshold
+
+
+class SphinxKeywordDetector:
+    """
+    Offline keyword detector using the keyword search of CMU PocketSphinx 5, with the
+    US English model that ships with the pocketsphinx package.
+    """
+
+    def __init__(
+        self,
+        keywords: Iterable[str],
+        sensitivity: float = 0.8,
+        sample_rate: int = SAMPLE_RATE,
+    ):
+        """
+        :param sensitivity: 0 (fewest false alarms) to 1 (fewest misses).
+        """
+        from pocketsphinx import Decoder
+
+        self.keywords = list(keywords)
+        self.sample_rate = sample_rate
+        # The keyword search reads its phrases and detection thresholds from a file
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".kws", delete=False
+        ) as keyword_file:
+            for keyword in self.keywords:
+                keyword_file.write(f"{keyword} /1e{100 * sensitivity - 110:.0f}/\n")
+        try:
+            self.decoder = Decoder(
+                samprate=sample_rate, kws=keyword_file.name, loglevel="FATAL"
+            )
+        finally:
+            os.remove(keyword_file.name)
+
+    def detect(
+        self, samples: np.ndarray, sample_rate: int
+    ) -> Optional[Tuple[str, float]]:
+        if sample_rate != self.sample_rate:
+            raise ValueError(
+                f"Expected {self.sample_rate} Hz audio, got {sample_rate} Hz"
+            )
+        self.decoder.start_utt()
+        self.decoder.process_raw(samples.tobytes(), full_utt=True)
+        self.decoder.end_utt()
+        hypothesis = self.decoder.hyp()
+        if hypothesis is None:
+            return None
+        words = hypothesis.hypstr.lower().split()
+        for keyword in self.keywords:
+            if keyword in words:
+                return keyword, 1.0
+        return None
+
+
+class SpotterFinished(RuntimeError):
+    """Raised when waiting on a spotter whose audio source has ended."""
+
+
+class KeywordSpotter(threading.Thread):
+    """
+    Listens continuously for spoken commands on a background thread.
+
+    Frames from one persistent audio source pass through voice activity detection;
+    every finished utterance is given to the keyword detector and the result is
+    published to the subscribers as a KeywordEvent. Audio is ignored while is_muted()
+    returns True (and shortly afterwards), so the robot's own speech is not recognized.
+    """
+
+    def __init__(
+        self,
+        source,
+        detector,
+        vad: Optional[EnergyVAD] = None,
+        is_muted: Optional[Callable[[], bool]] = None,
+        mute_tail: float = 0.3,
+    ):
+        """
+        :param source: MicrophoneSource, WavSource or any object with open/read/close
+                       delivering int16 frames; read() returns None at the end.
+        :param detector: Object with detect(samples, sample_rate) returning
+                         (keyword, confidence) or None.
+        :param is_muted: Returns True while audio must be ignored.
+        :param mute_tail: Seconds audio is still ignored after is_muted() turns False.
+        """
+        super().__init__(name="KeywordSpotter", daemon=True)
+        self.source = source
+        self.detector = detector
+        self.vad = vad or EnergyVAD()
+        self.is_muted = is_muted
+        self.mute_tail = mute_tail
+        self._subscribers: List[Callable[[KeywordEvent], None]] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.finished = threading.Event()
+        self.error: Optional[Exception] = None
+        self.segments = 0
+        self.detections = 0
+        self.errors = 0
+
+    def subscribe(self, callback: Callable[[KeywordEvent], None]):
+        """Calls callback on the spotter thread for every event."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[KeywordEvent], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def wait_for(
+        self,
+        keywords: Optional[Iterable[str]] = None,
+        timeout: Optional[float] = None,
+        unrecognized: bool = False,
+    ) -> Optional[KeywordEvent]:
+        """
+        Blocks until one of the keywords (any keyword if None) is heard and returns its
+        event, or None on timeout. With unrecognized=True, speech that matched no keyword
+        is returned as well.
+
+        :raises SpotterFinished: If the audio source has ended or the spotter failed.
+        """
+        wanted = None if keywords is None else set(keywords)
+        events: "queue.Queue[Optional[KeywordEvent]]" = queue.Queue()
+
+        def on_event(event: KeywordEvent):
+            if event.keyword is None:
+                if unrecognized:
+                    events.put(event)
+            elif wanted is None or event.keyword in wanted:
+                events.put(event)
+
+        self.subscribe(on_event)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while not self.finished.is_set():
+                remaining = 0.1
+                if deadline is not None:
+                    remaining = min(remaining, deadline - time.monotonic())
+                    if remaining <= 0:
+                        return None
+                try:
+                    return events.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+            # Events published just before the source ended
+            if not events.empty():
+                return events.get_nowait()
+            raise SpotterFinished(
+                f"Keyword spotting has stopped: {self.error or 'end of audio'}"
+            )
+        finally:
+            self.unsubscribe(on_event)
+
+    def _publish(self, event: KeywordEvent):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Keyword subscriber failed: {e}")
+
+    def run(self):
+        sample_rate = self.source.sample_rate
+        muted_until = 0.0
+        try:
+            self.source.open()
+            while not self._stop_event.is_set():
+                frame = self.source.read()
+                if frame is None:
+                    break
+                now = time.monotonic()
+                if self.is_muted is not None and self.is_muted():
+                    muted_until = now + self.mute_tail
+                if now < muted_until:
+                    self.vad.reset()
+                    continue
+                segment = self.vad.process(frame)
+                if segment is not None:
+                    self._recognize(segment, sample_rate, now)
+        except Exception as e:
+            logger.error(f"Keyword spotting stopped: {e}")
+            self.error = e
+        finally:
+            self.source.close()
+            self.finished.set()
+
+    def _recognize(self, segment: np.ndarray, sample_rate: int, ended: float):
+        self.segments += 1
+        try:
+            result = self.detector.detect(segment, sample_rate)
+        except Exception as e:
+            # Only this utterance is lost, the spotter keeps listening
+            logger.error(f"Keyword detection failed: {e}")
+            self.errors += 1
+            result = None
+        keyword, confidence = result if result is not None else (None, 0.0)
+        event = KeywordEvent(
+            keyword,
+            confidence,
+            ended,
+            len(segment) / sample_rate,
+            time.monotonic() - ended,
+        )
+        if keyword is not None:
+            self.detections += 1
+            logger.info(f"Command recognized: {event}")
+        else:
+            logger.debug(f"Speech without command: {event}")
+        self._publish(event)
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+def create_detector(keywords: Iterable[str]):
+    """
+    Creates the detector selected by KWS_DETECTOR: "template" (recordings in
+    KWS_TEMPLATES_DIR), "sphinx", or "auto" (templates if any exist, else sphinx).
+
+    :raises RuntimeError: If the selected detector cannot run, so voice input fails at
+                          startup instead of on the first utterance.
+    """
+    keywords = list(keywords)
+    kind = os.getenv("KWS_DETECTOR", "auto").lower()
+    templates_dir = os.getenv("KWS_TEMPLATES_DIR", DEFAULT_TEMPLATES_DIR)
+    has_templates = any(
+        os.path.isdir(os.path.join(templates_dir, keyword)) for keyword in keywords
+    )
+    if kind == "template" or (kind == "auto" and has_templates):
+        return TemplateKeywordDetector.from_directory(
+            templates_dir,
+            keywords,
+            threshold=float(os.getenv("KWS_TEMPLATE_THRESHOLD", "12.0")),
+        )
+    if kind not in ("sphinx", "auto"):
+        raise ValueError(f"Unknown KWS_DETECTOR: {kind}")
+    try:
+        detector = SphinxKeywordDetector(keywords)
+        # Runs the decoder once, as the first utterance would
+        detector.detect(np.zeros(SAMPLE_RATE // 10, dtype=np.int16), SAMPLE_RATE)
+    except Exception as e:
+        raise RuntimeError(
+            f"PocketSphinx keyword spotting is unavailable ({e}); install it with "
+            f"poetry install or record keyword templates into {templates_dir}"
+        ) from e
+    return detector
+
+
+def create_spotter(
+    keywords: Iterable[str], is_muted: Optional[Callable[[], bool]] = None
+) -> KeywordSpotter:
+    """
+    Creates a keyword spotter listening to the microphone (KWS_DEVICE_INDEX), or to the
+    WAV file in KWS_WAV instead.
+    """
+    wav_path = os.getenv("KWS_WAV")
+    if wav_path:
+        source = WavSource(wav_path, realtime=True)
+    else:
+        device_index = os.getenv("KWS_DEVICE_INDEX")
+        source = MicrophoneSource(
+            device_index=int(device_index) if device_index else None
+        )
+    return KeywordSpotter(source, create_detector(keywords), is_muted=is_muted)
@@ -1,8 +1,10 @@
-import io
-import time
+import threading
 import os
-from gtts import gTTS
-import pygame
+from concurrent.futures import Future
+from typing import Iterable
+
+from chess_logic.speech_queue import NORMAL, QUEUE, SpeechQueue, split_sentences
+from chess_logic.tts_cache import TTSCache
 
 
 class Speaker:
@@ -10,25 +12,81 @@ class Speaker:
     tld = "com"
     slow = False
 
+    # Synthesized phrases are kept on disk, so repeated phrases need no network access
+    cache = None
+    # Background worker that owns the audio device and plays phrases in order
+    queue = None
+    _lock = threading.Lock()
+
     @staticmethod
-    def speak(text):
-        # Generate speech
-        tts = gTTS(text=text, lang=Speaker.language, tld=Speaker.tld, slow=Speaker.slow)
+    def get_cache():
+        # Created on first use so that TTS_CACHE_DIR/TTS_CACHE_MB from .env apply.
+        # Synthesis threads call this for every phrase, so the lock is only taken
+        # while the cache does not exist yet.
+        if Speaker.cache is not None:
+            return Speaker.cache
+        with Speaker._lock:
+            if Speaker.cache is None:
+                Speaker.cache = TTSCache(
+                    os.getenv("TTS_CACHE_DIR", os.path.join(".cache", "tts")),
+                    max_bytes=int(float(os.getenv("TTS_CACHE_MB", "100")) * 2**20),
+                )
+            return Speaker.cache
 
-        # Save to a BytesIO stream instead of a file
-        audio_stream = io.BytesIO()
-        tts.write_to_fp(audio_stream)
-        audio_stream.seek(0)
+    @staticmethod
+    def get_queue():
+        with Speaker._lock:
+            if Speaker.queue is None or not Speaker.queue.is_alive():
+                Speaker.queue = SpeechQueue(Speaker.synthesize)
+                Speaker.queue.start()
+            return Speaker.queue
 
-        # Initialize pygame mixer
-        pygame.mixer.init()
+    @staticmethod
+    def synthesize(text):
+        """Returns the MP3 audio of a phrase, from the cache if possible."""
+        return Speaker.get_cache().synthesize(
+            text, Speaker.language, Speaker.tld, Speaker.slow
+        )
 
-        # Load the audio stream into pygame
-        pygame.mixer.music.load(audio_stream, "mp3")
+    @staticmethod
+    def prewarm(texts: Iterable[str]):
+        """Synthesizes the given phrases in the background so they play instantly."""
+        # Phrases are synthesized and cached sentence by sentence when spoken
+        chunks = [chunk for text in texts for chunk in split_sentences(text)]
+        return Speaker.get_cache().prewarm(
+            chunks, Speaker.language, Speaker.tld, Speaker.slow
+        )
 
-        # Play the audio
-        pygame.mixer.music.play()
+    @staticmethod
+    def say(text, priority=NORMAL, policy=QUEUE) -> Future:
+        """
+        Queues a phrase without waiting for it. The returned future resolves to True
+        once it was spoken, or to False if it was dropped or interrupted.
+        See SpeechQueue.say for the priorities and policies.
+        """
+        return Speaker.get_queue().say(text, priority=priority, policy=policy)
 
-        # Wait until the audio is finished
-        while pygame.mixer.music.get_busy():
-            time.sleep(1)
+    @staticmethod
+    def is_speaking():
+        """True while a phrase is playing or waiting, e.g. to mute the microphone."""
+        queue = Speaker.queue
+        return queue is not None and queue.busy
+
+    @staticmethod
+    def speak(text):
+        """Speaks a phrase and waits until it has been played."""
+        return Speaker.say(text).result()
+
+    @staticmethod
+    def shutdown(timeout=None):
+        """Waits up to timeout seconds for queued phrases, then stops the worker."""
+        with Speaker._lock:
+            queue = Speaker.queue
+        if queue is None:
+            return
+        # Not waited on under the lock: synthesizing the queued phrases may need it
+        queue.wait_idle(timeout)
+        queue.stop(timeout=1.0)
+        with Speaker._lock:
+            if Speaker.queue is queue:
+                Speaker.queue = None
@@ -0,0 +1,236 @@
+import heapq
+import io
+import itertools
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Tuple
+
+import pygame
+from loguru import logger
+
+# Priorities, lower values are spoken first
+HIGH = 0
+NORMAL = 1
+LOW = 2
+
+# Policies of SpeechQueue.say
+QUEUE = "queue"  # wait for the turn given by the priority
+INTERRUPT = "interrupt"  # stop the current utterance and speak next
+DROP_IF_BUSY = "drop_if_busy"  # only speak if nothing is playing or waiting
+
+# Interval at which playback is checked for its end or an interruption
+PLAYBACK_POLL_SECONDS = 0.02
+
+# Sentence ends, and clause boundaries used to shorten long sentences
+SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+CLAUSE_END = re.compile(r"(?<=,)\s+")
+
+
+def split_sentences(text: str, max_chars: int = 80) -> List[str]:
+    """
+    Splits text into sentences, and sentences longer than max_chars into clauses, so
+    that each chunk can be synthesized and played on its own.
+    """
+    chunks = []
+    for sentence in SENTENCE_END.split(text.strip()):
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            chunks.append(sentence)
+            continue
+        current = ""
+        for clause in CLAUSE_END.split(sentence):
+            if current and len(current) + len(clause) + 1 > max_chars:
+                chunks.append(current)
+                current = clause
+            else:
+                current = f"{current} {clause}" if current else clause
+        if current:
+            chunks.append(current)
+    return chunks or [text]
+
+
+class Utterance:
+    __slots__ = ("text", "priority", "future")
+
+    def __init__(self, text: str, priority: int):
+        self.text = text
+        self.priority = priority
+        self.future: Future = Future()
+
+
+class SpeechQueue(threading.Thread):
+    """
+    Speaks queued phrases one after another on a background thread.
+
+    Phrases are split into sentences that are synthesized concurrently by a small pool;
+    the first sentence plays as soon as it is ready while the following ones are still
+    being synthesized, and they are played in their original order. The audio device is
+    opened once and kept open. Phrases are ordered by priority and then by submission;
+    say() returns a future that resolves to True once the phrase was played completely,
+    to False if it was dropped or interrupted, or to the synthesis error. Callers decide
+    whether to wait for it.
+    """
+
+    def __init__(
+        self,
+        synthesize: Callable[[str], bytes],
+        max_pending: int = 16,
+        workers: int = 3,
+        max_chunk_chars: int = 80,
+    ):
+        """
+        :param synthesize: Returns the MP3 audio of a phrase; called from several
+                           threads at once.
+        :param max_pending: Maximum number of waiting phrases; when exceeded, the least
+                            important, most recent one is dropped.
+        :param workers: Number of sentences synthesized concurrently.
+        :param max_chunk_chars: Sentences longer than this are split at commas.
+        """
+        super().__init__(name="SpeechQueue", daemon=True)
+        self.synthesize = synthesize
+        self.max_pending = max_pending
+        self.max_chunk_chars = max_chunk_chars
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="SpeechSynthesis")
+        self._heap: List[Tuple[int, int, Utterance]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._interrupt = threading.Event()
+        self._stop_event = threading.Event()
+        self.current: Optional[Utterance] = None
+        self.audio_error: Optional[Exception] = None
+
+    def say(self, text: str, priority: int = NORMAL, policy: str = QUEUE) -> Future:
+        """
+        Queues a phrase and returns immediately.
+
+        :param text: Phrase to speak.
+        :param priority: HIGH, NORMAL or LOW.
+        :param policy: QUEUE, INTERRUPT (stop the current phrase and speak this one
+                       next) or DROP_IF_BUSY (resolve to False unless the queue is
+                       idle).
+        """
+        utterance = Utterance(text, priority)
+        with self._condition:
+            if policy == DROP_IF_BUSY and (self.current is not None or self._heap):
+                utterance.future.set_result(False)
+                return utterance.future
+            if policy == INTERRUPT:
+                # Ahead of everything else that is waiting
+                priority = min([priority] + [entry[0] for entry in self._heap]) - 1
+                if self.current is not None:
+                    self._interrupt.set()
+            heapq.heappush(self._heap, (priority, next(self._counter), utterance))
+            if len(self._heap) > self.max_pending:
+                dropped = max(self._heap)
+                self._heap.remove(dropped)
+                heapq.heapify(self._heap)
+                dropped[2].future.set_result(False)
+                logger.debug(f"Speech queue full, dropped: {dropped[2].text}")
+            self._condition.notify()
+        return utterance.future
+
+    def clear(self, priority: Optional[int] = None):
+        """Drops the waiting phrases (with at least the given priority value)."""
+        with self._condition:
+            keep = []
+            for entry in self._heap:
+                if priority is None or entry[2].priority >= priority:
+                    entry[2].future.set_result(False)
+                else:
+                    keep.append(entry)
+            heapq.heapify(keep)
+            self._heap = keep
+            self._condition.notify_all()
+
+    def interrupt(self):
+        """Stops the phrase that is currently playing."""
+        self._interrupt.set()
+
+    @property
+    def busy(self) -> bool:
+        with self._condition:
+            return self.current is not None or bool(self._heap)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every queued phrase was spoken; False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self.current is None and not self._heap, timeout
+            )
+
+    def run(self):
+        try:
+            pygame.mixer.init()
+        except pygame.error as e:
+            # Phrases resolve to this error instead of waiting forever
+            logger.error(f"Could not open the audio device: {e}")
+            self.audio_error = e
+        try:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(
+                        lambda: self._heap or self._stop_event.is_set()
+                    )
+                    if self._stop_event.is_set():
+                        break
+                    _, _, utterance = heapq.heappop(self._heap)
+                    if not utterance.future.set_running_or_notify_cancel():
+                        continue
+                    self.current = utterance
+                    self._interrupt.clear()
+                try:
+                    completed = self._play(utterance.text)
+                    utterance.future.set_result(completed)
+                except Exception as e:
+                    logger.error(f"Failed to speak '{utterance.text}': {e}")
+                    utterance.future.set_exception(e)
+                finally:
+                    with self._condition:
+                        self.current = None
+                        self._condition.notify_all()
+        finally:
+            pygame.mixer.quit()
+            self._pool.shutdown(wait=False)
+            self.clear()
+
+    def _play(self, text: str) -> bool:
+        if self.audio_error is not None:
+            raise self.audio_error
+        chunks = split_sentences(text, self.max_chunk_chars)
+        pending = [self._pool.submit(self.synthesize, chunk) for chunk in chunks]
+        try:
+            for chunk, future in zip(chunks, pending):
+                # Usually already done for every sentence but the first
+                while not wait([future], PLAYBACK_POLL_SECONDS).done:
+                    if self._interrupt.is_set():
+                        return False
+                if self._interrupt.is_set():
+                    return False
+                if not self._play_chunk(future.result()):
+                    logger.debug(f"Interrupted: {chunk}")
+                    return False
+            return True
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _play_chunk(self, audio: bytes) -> bool:
+        pygame.mixer.music.load(io.BytesIO(audio), "mp3")
+        pygame.mixer.music.play()
+        # Returns as soon as playback ends instead of sleeping in whole seconds
+        while pygame.mixer.music.get_busy():
+            if self._interrupt.wait(PLAYBACK_POLL_SECONDS):
+                pygame.mixer.music.stop()
+                return False
+        return True
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops the worker; waiting phrases resolve to False."""
+        self._stop_event.set()
+        self._interrupt.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self.is_alive():
+            self.join(timeout)
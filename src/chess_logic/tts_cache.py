@@ -0,0 +1,146 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from gtts import gTTS
+from loguru import logger
+
+
+class TTSCache:
+    """
+    Content-addressed on-disk cache of synthesized speech.
+
+    Entries are MP3 files named by the SHA-256 of (text, lang, tld, slow), so the same
+    phrase is synthesized only once across runs. When the directory grows beyond
+    max_bytes, the least recently used entries (by file modification time, refreshed on
+    every hit) are deleted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 100 * 2**20):
+        """
+        :param directory: Cache directory, created if missing.
+        :param max_bytes: Maximum total size of the cached audio.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # path -> (last use, size)
+        self._entries: Dict[str, Tuple[float, int]] = {}
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(".mp3"):
+                stat = entry.stat()
+                self._entries[entry.path] = (stat.st_mtime, stat.st_size)
+                self._total_bytes += stat.st_size
+
+    @staticmethod
+    def key(text: str, lang: str, tld: str, slow: bool) -> str:
+        payload = json.dumps([text, lang, tld, slow], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, text: str, lang: str, tld: str, slow: bool) -> str:
+        return os.path.join(self.directory, self.key(text, lang, tld, slow) + ".mp3")
+
+    def contains(self, text: str, lang: str, tld: str, slow: bool) -> bool:
+        with self._lock:
+            return self.path(text, lang, tld, slow) in self._entries
+
+    def get(self, text: str, lang: str, tld: str, slow: bool) -> Optional[bytes]:
+        """Returns the cached MP3 audio of a phrase, or None."""
+        path = self.path(text, lang, tld, slow)
+        try:
+            with open(path, "rb") as file:
+                audio = file.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+            used = os.stat(path).st_mtime
+        except OSError:
+            return audio
+        with self._lock:
+            self._entries[path] = (used, len(audio))
+        return audio
+
+    def put(self, text: str, lang: str, tld: str, slow: bool, audio: bytes):
+        """Stores the MP3 audio of a phrase and evicts old entries if needed."""
+        path = self.path(text, lang, tld, slow)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(audio)
+        # Atomic, so concurrent readers never see partial files
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            _, previous_size = self._entries.get(path, (0, 0))
+            self._entries[path] = (os.stat(path).st_mtime, len(audio))
+            self._total_bytes += len(audio) - previous_size
+            self._evict()
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        for path, (_, size) in sorted(self._entries.items(), key=lambda e: e[1][0]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not evict cached speech {path}: {e}")
+                continue
+            del self._entries[path]
+            self._total_bytes -= size
+
+    def synthesize(self, text: str, lang: str, tld: str, slow: bool) -> bytes:
+        """
+        Returns the MP3 audio of a phrase, synthesizing it with gTTS on a cache miss.
+        """
+        audio = self.get(text, lang, tld, slow)
+        if audio is not None:
+            self.hits += 1
+            return audio
+
+        self.misses += 1
+        tts = gTTS(text=text, lang=lang, tld=tld, slow=slow)
+        audio_stream = io.BytesIO()
+        tts.write_to_fp(audio_stream)
+        audio = audio_stream.getvalue()
+        self.put(text, lang, tld, slow, audio)
+        return audio
+
+    def prewarm(
+        self, texts: Iterable[str], lang: str, tld: str, slow: bool
+    ) -> threading.Thread:
+        """
+        Synthesizes all uncached phrases on a background thread and returns the thread.
+        Network errors are logged; the affected phrases are synthesized on first use.
+        """
+        texts = list(dict.fromkeys(texts))
+
+        def run():
+            synthesized = 0
+            for text in texts:
+                if self.contains(text, lang, tld, slow):
+                    continue
+                try:
+                    self.synthesize(text, lang, tld, slow)
+                    synthesized += 1
+                except Exception as e:
+                    logger.warning(f"Pre-warming speech failed for '{text}': {e}")
+            logger.info(
+                f"Speech cache pre-warmed: {synthesized} synthesized, "
+                f"{len(texts) - synthesized} already cached or failed"
+            )
+
+        thread = threading.Thread(target=run, name="TTSPrewarm", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,473 @@
+import copy
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import yaml
+
+from computer_vision.chessboard_detection import RegionMask, order_points
+from computer_vision.cube_detection import DEFAULT_LUT_BITS, ColorClassifier
+from computer_vision.square_detection import build_warp_maps
+
+DEFAULT_SETTINGS_PATH = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), "..", "resources", "config", "settings.yaml"
+    )
+)
+
+DETECTION_MODES = ("contours", "blocks")
+
+NoneType = type(None)
+TYPE_NAMES = {
+    bool: "true or false",
+    int: "an integer",
+    float: "a number",
+    str: "a string",
+}
+
+# Type and inclusive (minimum, maximum) of every value read from a settings section;
+# missing keys fall back to the defaults of the code that reads them
+SECTION_SCHEMAS: Dict[str, Dict[str, Tuple[Any, Optional[float], Optional[float]]]] = {
+    "camera_warmup": {
+        "min_seconds": (float, 0, None),
+        "max_seconds": (float, 0, None),
+        "window": (int, 1, None),
+        "luma_tolerance": (float, 0, None),
+        "color_tolerance": (float, 0, None),
+    },
+    "occupancy": {
+        "margin": (float, 0, 0.49),
+        "min_fraction": ((float, NoneType), 0, 1),
+    },
+    "temporal_filter": {
+        "window": (int, 1, None),
+        "min_agreement": (float, 0, 1),
+        "max_frames": (int, 1, None),
+    },
+    "incremental": {
+        "enabled": (bool, None, None),
+        "pixel_threshold": (int, 0, 255),
+        "min_changed_fraction": (float, 0, 1),
+        "scale": (float, 0, 1),
+        "full_refresh_frames": (int, 1, None),
+    },
+    "debug_output": {
+        "directory": (str, None, None),
+        "queue_size": (int, 1, None),
+        "max_files": ((int, NoneType), 1, None),
+        "max_megabytes": ((float, NoneType), 0, None),
+        "jpeg_quality": (int, 0, 100),
+    },
+    "settings_reload": {
+        "enabled": (bool, None, None),
+        "interval": (float, 0, None),
+    },
+    "profiling": {
+        "enabled": (bool, None, None),
+        "window": (int, 1, None),
+        "log_records": (bool, None, None),
+    },
+    "obstacle_detection": {
+        "rate_hz": (float, 0, None),
+        "pyramid_levels": (int, 0, None),
+        "reference_update_seconds": (float, 0, None),
+    },
+    "settle": {
+        "stable_checks": (int, 1, None),
+        "motion_threshold": (float, 0, 1),
+        "timeout": (float, 0, None),
+    },
+}
+
+# Values that must be greater than their minimum, not just equal to it
+POSITIVE_KEYS = {
+    "camera_warmup.max_seconds",
+    "temporal_filter.min_agreement",
+    "incremental.scale",
+    "settings_reload.interval",
+    "obstacle_detection.rate_hz",
+    "obstacle_detection.reference_update_seconds",
+    "settle.timeout",
+}
+
+
+class ConfigError(ValueError):
+    """Raised when settings.yaml is missing required values or contains invalid ones."""
+
+
+def resolve_settings_path(config_path: Optional[str] = None) -> str:
+    """
+    Returns the absolute path of a settings file. Relative paths are resolved against
+    the working directory and, if no file exists there, against the chess_logic package
+    (the historical base of relative config paths).
+    """
+    if config_path is None:
+        return DEFAULT_SETTINGS_PATH
+    if os.path.isabs(config_path):
+        return config_path
+    if os.path.exists(config_path):
+        return os.path.abspath(config_path)
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), config_path))
+
+
+def _points(value: Any, name: str, errors: List[str]) -> List[Tuple[int, int]]:
+    try:
+        points = [(int(x), int(y)) for x, y in value]
+    except (TypeError, ValueError):
+        errors.append(f"{name} must be a list of [x, y] points")
+        return []
+    if len(points) != 4:
+        errors.append(f"{name} requires exactly 4 points, got {len(points)}")
+        return points
+    # Three points on a line leave no quadrilateral to warp or mask
+    for i in range(4):
+        (x0, y0), (x1, y1), (x2, y2) = (points[(i + k) % 4] for k in range(3))
+        if (x1 - x0) * (y2 - y0) - (y1 - y0) * (x2 - x0) == 0:
+            errors.append(f"{name} must not contain three collinear points")
+            break
+    return points
+
+
+def _size(value: Any, name: str, errors: List[str]) -> Tuple[int, int]:
+    try:
+        width, height = (int(v) for v in value)
+    except (TypeError, ValueError):
+        errors.append(f"{name} must be a pair of integers")
+        return 0, 0
+    if width <= 0 or height <= 0:
+        errors.append(f"{name} must be positive, got {value}")
+    return width, height
+
+
+def _number(
+    config: Dict[str, Any],
+    key: str,
+    default: Any,
+    kind: type,
+    errors: List[str],
+    section: Optional[str] = None,
+) -> Any:
+    """Converts a value to int or float, recording an error instead of raising."""
+    value = config.get(key, default)
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        name = f"{section}.{key}" if section else key
+        expected = "an integer" if kind is int else "a number"
+        errors.append(f"{name} must be {expected}, got {value!r}")
+        return kind(default)
+
+
+def _section(raw: Dict[str, Any], key: str, errors: List[str]) -> Dict[str, Any]:
+    if key not in raw:
+        return {}
+    if not isinstance(raw[key], dict):
+        errors.append(f"{key} must be a mapping")
+        return {}
+    return raw[key]
+
+
+def _is_kind(value: Any, kind: Any) -> bool:
+    kinds = kind if isinstance(kind, tuple) else (kind,)
+    if isinstance(value, bool):
+        return bool in kinds
+    if float in kinds and isinstance(value, int):
+        return True
+    return isinstance(value, kinds)
+
+
+def _check_section(raw: Dict[str, Any], key: str, errors: List[str]) -> Dict[str, Any]:
+    """
+    Checks the type and range of every value of a section listed in SECTION_SCHEMAS and
+    returns the section (empty if it is missing or not a mapping).
+    """
+    section = _section(raw, key, errors)
+    for name, (kind, minimum, maximum) in SECTION_SCHEMAS[key].items():
+        if name not in section:
+            continue
+        value = section[name]
+        full_name = f"{key}.{name}"
+        if not _is_kind(value, kind):
+            kinds = kind if isinstance(kind, tuple) else (kind,)
+            expected = " or ".join(
+                "null" if k is NoneType else TYPE_NAMES[k] for k in kinds
+            )
+            errors.append(f"{full_name} must be {expected}, got {value!r}")
+        elif value is None or isinstance(value, (bool, str)):
+            continue
+        elif minimum is not None and (
+            value <= minimum if full_name in POSITIVE_KEYS else value < minimum
+        ):
+            relation = "greater than" if full_name in POSITIVE_KEYS else "at least"
+            errors.append(f"{full_name} must be {relation} {minimum}, got {value}")
+        elif maximum is not None and value > maximum:
+            errors.append(f"{full_name} must be at most {maximum}, got {value}")
+    return section
+
+
+class VisionSettings:
+    """
+    Validated vision settings with the artifacts derived from them.
+
+    Besides the typed values, the color lookup classifier, the chessboard and obstacle
+    region masks and the warp remap tables are built once here, so the per-frame code
+    never parses raw config. Instances are not modified after construction; a reload
+    creates a new instance that replaces the old one in a single assignment.
+
+    Dict-style access (settings["thresholds"], settings.get(...)) reads the raw YAML
+    values, so code written against the plain config dict keeps working.
+    """
+
+    def __init__(self, raw: Dict[str, Any], path: Optional[str] = None):
+        """
+        :param raw: Parsed settings.yaml content.
+        :param path: File the settings were loaded from, if any.
+        :raises ConfigError: If any value is missing or invalid.
+        """
+        if not isinstance(raw, dict):
+            raise ConfigError(f"Settings in {path} must be a mapping.")
+        self.raw = raw
+        self.path = path
+        errors: List[str] = []
+
+        # Camera
+        self.camera_id = raw.get("camera_id")
+        self.camera_width = _number(raw, "camera_width", 1920, int, errors)
+        self.camera_height = _number(raw, "camera_height", 1080, int, errors)
+        self.frame_buffer_size = _number(raw, "frame_buffer_size", 4, int, errors)
+
+        # Geometry
+        self.chessboard_points = _points(
+            raw.get("chessboard_points", []), "chessboard_points", errors
+        )
+        self.obstacle_detection_points = _points(
+            raw.get("obstacle_detection_points", []),
+            "obstacle_detection_points",
+            errors,
+        )
+        self.chessboard_size = _size(
+            raw.get("chessboard_size", [8, 8]), "chessboard_size", errors
+        )
+        self.warped_size = _size(
+            raw.get("warped_size", [800, 800]), "warped_size", errors
+        )
+        self.rotation_angle = raw.get("rotation_angle", -90)
+        if not isinstance(self.rotation_angle, (int, float)):
+            errors.append(f"rotation_angle must be a number, got {self.rotation_angle}")
+
+        # Cube detection
+        self.detection_mode = raw.get("detection_mode", "contours")
+        if self.detection_mode not in DETECTION_MODES:
+            errors.append(
+                f"detection_mode must be one of {DETECTION_MODES}, "
+                f"got {self.detection_mode}"
+            )
+        thresholds = raw.get("thresholds")
+        if not isinstance(thresholds, dict):
+            errors.append("thresholds is missing")
+        else:
+            for key in ("cube_area_min", "cube_width_min", "cube_height_min"):
+                value = thresholds.get(key)
+                if not isinstance(value, (int, float)) or value < 0:
+                    errors.append(f"thresholds.{key} must be a non-negative number")
+        self._validate_colors(raw.get("cube_detection"), errors)
+
+        # Obstacle detection
+        self.line_deviation_threshold = _number(
+            raw, "line_deviation_threshold", 20, int, errors
+        )
+        if not 0 <= self.line_deviation_threshold <= 255:
+            errors.append("line_deviation_threshold must be between 0 and 255")
+        self.initialization_frames = _number(
+            raw, "initialization_frames", 30, int, errors
+        )
+        if self.initialization_frames < 1:
+            errors.append("initialization_frames must be at least 1")
+        self.color_lut_bits = _number(
+            raw, "color_lut_bits", DEFAULT_LUT_BITS, int, errors
+        )
+        if not 1 <= self.color_lut_bits <= 8:
+            errors.append("color_lut_bits must be between 1 and 8")
+
+        # Sections read by the analyzer, the processor and their helpers
+        sections = {key: _check_section(raw, key, errors) for key in SECTION_SCHEMAS}
+
+        if errors:
+            raise ConfigError(
+                f"Invalid settings in {path or '<dict>'}: " + "; ".join(errors)
+            )
+
+        obstacle_config = sections["obstacle_detection"]
+        self.obstacle_rate_hz = float(obstacle_config.get("rate_hz", 15.0))
+        self.obstacle_pyramid_levels = obstacle_config.get("pyramid_levels", 0)
+        warmup_config = sections["camera_warmup"]
+        if warmup_config.get("min_seconds", 0.5) > warmup_config.get(
+            "max_seconds", 5.0
+        ):
+            raise ConfigError(
+                f"Invalid settings in {path or '<dict>'}: "
+                "camera_warmup.min_seconds must not exceed max_seconds"
+            )
+
+        # Derived artifacts
+        try:
+            self.color_classifier = ColorClassifier.from_config(raw)
+            self.chessboard_region = RegionMask(self.chessboard_points, padding=2)
+            self.obstacle_region = RegionMask(self.obstacle_detection_points)
+            ordered_points = order_points(
+                np.array(self.chessboard_points, dtype="float32")
+            )
+            # Map into the coordinates of the cropped chessboard region
+            ordered_points -= np.array(self.chessboard_region.origin, dtype="float32")
+            self.warp_maps = build_warp_maps(
+                ordered_points,
+                size=self.warped_size,
+                rotation_angle=self.rotation_angle,
+            )
+        except Exception as e:
+            raise ConfigError(
+                f"Invalid settings in {path or '<dict>'}: {type(e).__name__}: {e}"
+            ) from e
+
+    @staticmethod
+    def _validate_colors(colors: Any, errors: List[str]):
+        if not isinstance(colors, dict) or not colors:
+            errors.append("cube_detection must define at least one color")
+            return
+        for name, spec in colors.items():
+            ranges = spec.get("rgb_ranges") if isinstance(spec, dict) else None
+            if not ranges:
+                errors.append(f"cube_detection.{name} has no rgb_ranges")
+                continue
+            for bounds in ranges:
+                for key in ("lower", "upper"):
+                    value = bounds.get(key) if isinstance(bounds, dict) else None
+                    if (
+                        not isinstance(value, list)
+                        or len(value) != 3
+                        or not all(isinstance(v, int) and 0 <= v <= 255 for v in value)
+                    ):
+                        errors.append(
+                            f"cube_detection.{name}.rgb_ranges.{key} must be 3 "
+                            f"integers between 0 and 255"
+                        )
+
+    @classmethod
+    def from_file(cls, config_path: Optional[str] = None) -> "VisionSettings":
+        path = resolve_settings_path(config_path)
+        with open(path, "r") as file:
+            raw = yaml.safe_load(file)
+        settings = cls(raw, path)
+        logging.debug(f"Configuration loaded from {path}.")
+        return settings
+
+    def with_points(
+        self,
+        chessboard_points: Optional[List[Tuple[int, int]]] = None,
+        obstacle_detection_points: Optional[List[Tuple[int, int]]] = None,
+    ) -> "VisionSettings":
+        """
+        Returns settings with other chessboard and/or obstacle points (self if unchanged).
+        """
+        raw = self.raw
+        for key, points, current in (
+            ("chessboard_points", chessboard_points, self.chessboard_points),
+            (
+                "obstacle_detection_points",
+                obstacle_detection_points,
+                self.obstacle_detection_points,
+            ),
+        ):
+            if points is not None and [tuple(p) for p in points] != current:
+                if raw is self.raw:
+                    raw = copy.copy(self.raw)
+                raw[key] = [list(p) for p in points]
+        if raw is self.raw:
+            return self
+        return VisionSettings(raw, self.path)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.raw.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.raw[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.raw
+
+
+_settings_cache: Dict[str, VisionSettings] = {}
+_settings_lock = threading.Lock()
+
+
+def load_settings(config_path: Optional[str] = None) -> VisionSettings:
+    """
+    Returns the settings of a file, loading and validating it only on the first call so
+    that all components share one instance.
+    """
+    path = resolve_settings_path(config_path)
+    with _settings_lock:
+        settings = _settings_cache.get(path)
+        if settings is None:
+            settings = VisionSettings.from_file(path)
+            _settings_cache[path] = settings
+        return settings
+
+
+class SettingsWatcher(threading.Thread):
+    """
+    Polls a settings file and hands a freshly validated VisionSettings to a callback
+    whenever the file changes. Invalid edits are logged and the current settings stay
+    in use.
+    """
+
+    def __init__(
+        self,
+        settings: VisionSettings,
+        on_change: Callable[[VisionSettings], None],
+        interval: float = 1.0,
+    ):
+        super().__init__(daemon=True)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.path = settings.path
+        self.on_change = on_change
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._signature = self._stat()
+
+    def _stat(self) -> Optional[Tuple[float, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                continue
+            self._signature = signature
+            try:
+                settings = VisionSettings.from_file(self.path)
+            except (OSError, yaml.YAMLError, ConfigError) as e:
+                self.logger.error(f"Ignoring settings change in {self.path}: {e}")
+                continue
+            except Exception:
+                # Keep watching: a later edit may fix the file
+                self.logger.exception(f"Ignoring settings change in {self.path}")
+                continue
+            with _settings_lock:
+                _settings_cache[self.path] = settings
+            self.logger.info(f"Settings reloaded from {self.path}.")
+            try:
+                self.on_change(settings)
+            except Exception as e:
+                self.logger.error(f"Failed to apply reloaded settings: {e}")
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
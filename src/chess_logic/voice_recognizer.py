@@ -1,61 +1,68 @@
-import speech_recognition as sr
+from loguru import logger
+
+from chess_logic.keyword_spotting import SpotterFinished, create_spotter
+from chess_logic.speaker import Speaker
 
 
 class VoiceRecognizer:
-    def __init__(self):
-        self.recognizer = sr.Recognizer()
+    GREETING = "Hello, my name is Chessica. We are going to learn the london system."
+    START_PROMPT = "Say 'start' to begin."
+    STARTED = "I understand, game is started"
+    NOT_UNDERSTOOD = "I did not understand you. Please repeat yourself."
+
+    # Fixed phrases, pre-synthesized by the speaker at startup
+    PROMPTS = (GREETING, START_PROMPT, STARTED, NOT_UNDERSTOOD)
+
+    # Command vocabulary of the keyword spotter
+    COMMANDS = ("start", "help")
+
+    # Seconds after which the start prompt is repeated
+    START_PROMPT_INTERVAL = 15.0
+
+    def __init__(self, spotter=None):
+        """
+        :param spotter: KeywordSpotter to use; by default one listening to the microphone
+                        (or the file in KWS_WAV), muted while the speaker talks.
+        """
+        self.spotter = spotter or create_spotter(
+            self.COMMANDS, is_muted=Speaker.is_speaking
+        )
+        # The microphone stays open for the whole game
+        self.spotter.start()
 
     def listen_for_start(self, speaker):
         print("Waiting for the 'start' command. Please say 'start' to begin.")
 
-        speaker.speak(
-            "Hello, my name is Chessica. We are going to learn the london system."
-        )
+        speaker.speak(self.GREETING)
+        speaker.speak(self.START_PROMPT)
 
         while True:
-            with sr.Microphone() as source:
-                speaker.speak("Say 'start' to begin.")
-                try:
-                    audio = self.recognizer.listen(source)
-                    recognized_text = self.recognizer.recognize_google(audio)
-                    speaker.speak(f"I think you said: {recognized_text}")
-
-                    if recognized_text.lower() == "start":
-                        speaker.speak("I understand, game is started")
-                        return True
-                    else:
-                        speaker.speak(
-                            "I did not understand you. Please repeat yourself."
-                        )
-
-                except sr.UnknownValueError:
-                    print(
-                        "Google Speech Recognition could not understand audio. Please try again."
-                    )
-                except sr.RequestError as e:
-                    print(
-                        f"Could not request results from Google Speech Recognition service; {e}"
-                    )
-
-    def listen_for_help(self, speaker):
-        with sr.Microphone() as source:
-            speaker.speak("I am listening")
             try:
-                audio = self.recognizer.listen(source)
-                recognized_text = self.recognizer.recognize_google(audio)
-                speaker.speak(f"I think you said: {recognized_text}")
-
-                if recognized_text.lower() == "help":
-                    print("Command recognized: 'help'")
-                    return True
-                else:
-                    speaker.speak("I did not understand you. Please repeat yourself")
-
-            except sr.UnknownValueError:
-                print(
-                    "Google Speech Recognition could not understand audio. Please try again."
-                )
-            except sr.RequestError as e:
-                print(
-                    f"Could not request results from Google Speech Recognition service; {e}"
+                event = self.spotter.wait_for(
+                    ["start"], timeout=self.START_PROMPT_INTERVAL, unrecognized=True
                 )
+            except SpotterFinished as e:
+                logger.error(f"Audio input ended before the 'start' command: {e}")
+                return False
+            if event is None:
+                speaker.speak(self.START_PROMPT)
+            elif event.keyword == "start":
+                speaker.speak(self.STARTED)
+                return True
+            else:
+                speaker.speak(self.NOT_UNDERSTOOD)
+
+    def listen_for_help(self, speaker, timeout=1.0):
+        """
+        Returns True if 'help' is heard within timeout seconds.
+
+        :raises SpotterFinished: If the audio input has ended.
+        """
+        event = self.spotter.wait_for(["help"], timeout=timeout)
+        if event is None:
+            return False
+        print("Command recognized: 'help'")
+        return True
+
+    def close(self):
+        self.spotter.stop(timeout=1.0)
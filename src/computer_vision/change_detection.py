@@ -0,0 +1,75 @@
+# modules/change_detection.py
+from typing import Any, Optional
+
+import cv2
+import numpy as np
+
+from computer_vision.occupancy import compute_square_fractions
+from computer_vision.square_detection import get_board_grid
+
+
+class SquareChangeDetector:
+    """
+    Detects which squares of the warped board changed since the last processed frame.
+
+    The warped board is compared in color at a reduced resolution; a pixel differs when
+    any of its channels changed by more than pixel_threshold, so cubes of a different
+    color but similar brightness are noticed too. A square counts as changed when the
+    fraction of its differing pixels exceeds min_changed_fraction.
+    """
+
+    def __init__(
+        self,
+        pixel_threshold: int = 25,
+        min_changed_fraction: float = 0.02,
+        scale: float = 0.25,
+        margin: float = 0.05,
+    ):
+        """
+        :param pixel_threshold: Minimum difference of a changed pixel in any channel.
+        :param min_changed_fraction: Fraction of changed pixels that marks a square changed.
+        :param scale: Resolution factor of the comparison images.
+        :param margin: Fraction of the square size ignored along each square border.
+        """
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.scale = scale
+        self.margin = margin
+        self.reference: Optional[Any] = None
+
+    def reset(self):
+        self.reference = None
+
+    def _prepare(self, warped_image: Any) -> Any:
+        if self.scale != 1:
+            return cv2.resize(
+                warped_image,
+                None,
+                fx=self.scale,
+                fy=self.scale,
+                interpolation=cv2.INTER_AREA,
+            )
+        return warped_image.copy()
+
+    def update(self, warped_image: Any, chessboard_size=(8, 8)) -> Optional[Any]:
+        """
+        Compares a warped board with the previous one and makes it the new reference.
+
+        :return: (rows, cols) float32 array of changed pixel fractions per square, or None
+                 if there was no comparable previous frame.
+        """
+        image = self._prepare(warped_image)
+        reference, self.reference = self.reference, image
+        if reference is None or reference.shape != image.shape:
+            return None
+
+        # Largest difference over the color channels of every pixel
+        diff = cv2.absdiff(reference, image).max(axis=2)
+        _, changed = cv2.threshold(diff, self.pixel_threshold, 1, cv2.THRESH_BINARY)
+        height, width = diff.shape
+        grid = get_board_grid((width, height), tuple(chessboard_size))
+        return compute_square_fractions(changed, grid, 2, self.margin)[..., 1]
+
+    def changed(self, change_fractions: Any) -> Any:
+        """Returns the (rows, cols) boolean map of changed squares."""
+        return np.asarray(change_fractions) > self.min_changed_fraction
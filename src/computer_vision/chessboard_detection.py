@@ -43,6 +43,60 @@ def cut_image_corners(image, points, debug=False):
 
     return masked_image
 
+class RegionMask:
+    """
+    Quadrilateral mask compiled once and cropped to its bounding rectangle.
+
+    Instead of masking the full frame on every call, images are cropped to the bounding
+    rectangle (a view, no copy) and only the small precomputed mask is applied.
+    """
+
+    def __init__(self, points, padding=0):
+        """
+        :param points: Four (x, y) points defining the quadrilateral.
+        :param padding: Extra pixels added around the bounding rectangle.
+        """
+        if len(points) != 4:
+            raise ValueError("You must provide exactly 4 points to define the quadrilateral.")
+
+        points = np.array(points, dtype=np.int32)
+        x, y, w, h = cv2.boundingRect(points)
+        x0, y0 = max(x - padding, 0), max(y - padding, 0)
+        x1, y1 = x + w + padding, y + h + padding
+
+        self.x, self.y = x0, y0
+        self.w, self.h = x1 - x0, y1 - y0
+        self.points = points
+
+        mask = np.zeros((self.h, self.w), dtype="uint8")
+        cv2.fillPoly(mask, [points - (x0, y0)], 255)
+        self.mask = mask
+        self.outside = mask == 0
+
+    @property
+    def origin(self):
+        return self.x, self.y
+
+    def crop(self, image):
+        """
+        Returns a view of the bounding rectangle of the region (clipped to the image).
+        """
+        return image[self.y:self.y + self.h, self.x:self.x + self.w]
+
+    def fill_outside(self, roi, value=255):
+        """
+        Sets the pixels of a cropped image outside the quadrilateral to value, in place.
+        """
+        roi[self.outside[:roi.shape[0], :roi.shape[1]]] = value
+        return roi
+
+    def apply(self, image, value=255):
+        """
+        Returns a copy of the cropped region with pixels outside the quadrilateral set to value.
+        """
+        return self.fill_outside(self.crop(image).copy(), value)
+
+
 def order_points(pts):
     """
     Orders points in the following order: top-left, top-right, bottom-right, bottom-left.
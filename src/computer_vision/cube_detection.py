@@ -1,64 +1,168 @@
+from contextlib import nullcontext
+
 import cv2
 import numpy as np
-import os
 
-def detect_cubes(image, config, debug=False):
-    # Increase saturation
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    h, s, v = cv2.split(hsv)
-    s = cv2.add(s, 50)  # Increase saturation by 50, adjust this value as needed
-    saturated_hsv = cv2.merge([h, s, v])
-    saturated_image = cv2.cvtColor(saturated_hsv, cv2.COLOR_HSV2BGR)
+# Saturation boost the configured color ranges were calibrated against. It used to be
+# applied to every frame here; it is now folded into the lookup table at compile time.
+SATURATION_BOOST = 50
 
+# Default bits per channel of the quantized lookup table (6 -> 64^3 entries, 256 KiB)
+DEFAULT_LUT_BITS = 6
 
-    # Save the saturated image if debug is enabled
-    if debug:
-        output_folder = 'debug_images'
-        os.makedirs(output_folder, exist_ok=True)
-        cv2.imwrite(os.path.join(output_folder, "saturated_image2.jpg"), saturated_image)
-
-    # Use saturated image for cube detection
-    bgr = saturated_image  # Use the modified image
-
-    # Initialize masks for blue and brown
-    mask_blue = np.zeros(image.shape[:2], dtype="uint8")
-    mask_brown = np.zeros(image.shape[:2], dtype="uint8")
-
-    # Process blue ranges
-    for range_set in config['cube_detection']['blue']['rgb_ranges']:
-        lower = np.array(range_set['lower'], dtype="uint8")
-        upper = np.array(range_set['upper'], dtype="uint8")
-        current_mask = cv2.inRange(bgr, lower, upper)
-        mask_blue = cv2.bitwise_or(mask_blue, current_mask)
-
-    # Process brown ranges
-    for range_set in config['cube_detection']['brown']['rgb_ranges']:
-        lower = np.array(range_set['lower'], dtype="uint8")
-        upper = np.array(range_set['upper'], dtype="uint8")
-        current_mask = cv2.inRange(bgr, lower, upper)
-        mask_brown = cv2.bitwise_or(mask_brown, current_mask)
-
-    # Apply morphological operations to reduce noise
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5,5))
-    mask_blue = cv2.morphologyEx(mask_blue, cv2.MORPH_OPEN, kernel, iterations=2)
-    mask_brown = cv2.morphologyEx(mask_brown, cv2.MORPH_OPEN, kernel, iterations=2)
+# Structuring element of the mask clean-up, built once instead of per frame
+CUBE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (5,5))
 
-    if debug:
-        # Display the masks for blue and brown
-        cv2.imshow("Blue Mask", mask_blue)
-        cv2.imshow("Brown Mask", mask_brown)
 
-    # Find contours for blue and brown cubes
+class ColorClassifier:
+    """
+    Labels every pixel of a BGR image with its cube class in a single table lookup.
+
+    The configured color ranges are compiled once into a quantized BGR lookup table, so the
+    per-frame cost does not depend on the number of colors or ranges. Label 0 is the
+    background, label i is class_names[i]. If ranges of different colors overlap, the color
+    listed first in the configuration wins.
+    """
+
+    def __init__(self, color_ranges, bits=DEFAULT_LUT_BITS, saturation_boost=0):
+        """
+        :param color_ranges: Dict mapping a color name to a list of (lower, upper) BGR bounds.
+        :param bits: Bits per channel of the lookup table (1-8, 8 is exact).
+        :param saturation_boost: Saturation increase applied to pixels before the ranges are
+                                 checked, evaluated at compile time.
+        """
+        if not 1 <= bits <= 8:
+            raise ValueError("Lookup table bits must be between 1 and 8.")
+        if len(color_ranges) > 254:
+            raise ValueError("At most 254 cube colors are supported.")
+
+        self.bits = bits
+        self.class_names = ["background", *color_ranges.keys()]
+        self.colors = list(color_ranges.keys())
+
+        shift = 8 - bits
+        levels = 1 << bits
+
+        # Per-channel index tables: lut index = b << 2*bits | g << bits | r
+        values = (np.arange(256, dtype=np.int32) >> shift).reshape(1, 256)
+        self._index_b = values << (2 * bits)
+        self._index_g = values << bits
+        self._index_r = values
+
+        # Representative BGR value (bin center) of every table entry
+        centers = (np.arange(levels, dtype=np.int32) << shift) + ((1 << shift) >> 1)
+        b, g, r = np.meshgrid(centers, centers, centers, indexing="ij")
+        samples = np.stack([b.ravel(), g.ravel(), r.ravel()], axis=-1).astype(np.uint8)
+
+        if saturation_boost:
+            hsv = cv2.cvtColor(samples.reshape(1, -1, 3), cv2.COLOR_BGR2HSV)
+            hsv[..., 1] = cv2.add(hsv[..., 1], saturation_boost).reshape(-1)
+            samples = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR).reshape(-1, 3)
+
+        lut = np.zeros(len(samples), dtype=np.uint8)
+        # Assign in reverse so that the first configured color wins on overlaps
+        for label in range(len(self.colors), 0, -1):
+            inside = np.zeros(len(samples), dtype=bool)
+            for lower, upper in color_ranges[self.class_names[label]]:
+                lower = np.asarray(lower, dtype=np.uint8)
+                upper = np.asarray(upper, dtype=np.uint8)
+                inside |= np.all((samples >= lower) & (samples <= upper), axis=1)
+            lut[inside] = label
+        self.lut = lut
+
+    @classmethod
+    def from_config(cls, config, saturation_boost=SATURATION_BOOST):
+        """
+        Compiles a classifier from config['cube_detection'], accepting any number of colors.
+        """
+        color_ranges = {
+            name: [(r['lower'], r['upper']) for r in spec['rgb_ranges']]
+            for name, spec in config['cube_detection'].items()
+        }
+        bits = config.get('color_lut_bits', DEFAULT_LUT_BITS)
+        return cls(color_ranges, bits=bits, saturation_boost=saturation_boost)
+
+    def classify(self, image):
+        """
+        Returns a uint8 label image with the same height and width as the BGR input.
+        """
+        b, g, r = cv2.split(image)
+        index = cv2.add(cv2.LUT(b, self._index_b), cv2.LUT(g, self._index_g))
+        index = cv2.add(index, cv2.LUT(r, self._index_r))
+        return np.take(self.lut, index)
+
+
+_classifier_cache = {}
+
+
+def _no_stage(name):
+    return nullcontext()
+
+
+def get_color_classifier(config):
+    """
+    Returns a classifier for the given config, compiling it only when the color config changes.
+    Settings objects that carry a precompiled classifier return it directly.
+    """
+    classifier = getattr(config, 'color_classifier', None)
+    if classifier is not None:
+        return classifier
+    key = repr((config['cube_detection'], config.get('color_lut_bits', DEFAULT_LUT_BITS)))
+    classifier = _classifier_cache.get(key)
+    if classifier is None:
+        classifier = ColorClassifier.from_config(config)
+        _classifier_cache.clear()
+        _classifier_cache[key] = classifier
+    return classifier
+
+
+def detect_cubes(image, config, debug=False, classifier=None, profiler=None, sink=None,
+                 image_name="cubes.jpg"):
+    """
+    Detects cubes in an already preprocessed (saturation boosted) BGR image.
+
+    :param image: Preprocessed BGR image.
+    :param config: Configuration with 'cube_detection' and 'thresholds'.
+    :param debug: If True, shows the masks and detections.
+    :param classifier: Precompiled ColorClassifier, compiled from config if omitted.
+    :param profiler: Optional StageProfiler timing the classify, morphology and contour steps.
+    :param sink: DebugSink receiving the debug images; without one, debug mode shows windows.
+    :param image_name: File name suffix of the debug images.
+    :return: List of cube dicts with 'color', 'x', 'y', 'w', 'h'.
+    """
+    if classifier is None:
+        classifier = get_color_classifier(config)
+    stage = profiler.stage if profiler is not None else _no_stage
+
+    # Label every pixel with its cube class in a single pass
+    with stage("classify"):
+        labels = classifier.classify(image)
+
+    # Apply one morphological opening to all classes at once to reduce noise
+    with stage("morphology"):
+        foreground = cv2.morphologyEx((labels > 0).view(np.uint8), cv2.MORPH_OPEN, CUBE_KERNEL, iterations=2)
+        labels = labels * foreground
+
+    thresholds = config['thresholds']
+
+    # Find contours for every cube color
     cubes = []
-    for mask, color in zip([mask_blue, mask_brown], ['blue', 'brown']):
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for label, color in enumerate(classifier.colors, start=1):
+        mask = (labels == label).view(np.uint8)
+        if debug:
+            if sink is not None:
+                sink.submit("debug_images", f"{color}_mask_{image_name}", mask * 255)
+            else:
+                cv2.imshow(f"{color.capitalize()} Mask", mask * 255)
+        with stage("contours"):
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         for cnt in contours:
             area = cv2.contourArea(cnt)
-            if area > config['thresholds']['cube_area_min']:  # Check if the area is large enough
+            if area > thresholds['cube_area_min']:  # Check if the area is large enough
                 x, y, w, h = cv2.boundingRect(cnt)
 
                 # Now, instead of checking if the aspect ratio is square-like, we only check the size
-                if w >= config['thresholds']['cube_width_min'] and h >= config['thresholds']['cube_height_min']:
+                if w >= thresholds['cube_width_min'] and h >= thresholds['cube_height_min']:
                     cube = {'color': color, 'x': x, 'y': y, 'w': w, 'h': h}
                     cubes.append(cube)
                     if debug:
@@ -67,7 +171,10 @@ def detect_cubes(image, config, debug=False):
                         cv2.rectangle(image, (x, y), (x + w, y + h), color_bgr, 2)
 
     if debug:
-        cv2.imshow("Cubes Detection", image)
-        cv2.waitKey(0)
+        if sink is not None:
+            sink.submit("debug_images", f"cubes_{image_name}", image)
+        else:
+            cv2.imshow("Cubes Detection", image)
+            cv2.waitKey(0)
 
     return cubes
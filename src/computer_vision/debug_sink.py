@@ -0,0 +1,208 @@
+# modules/debug_sink.py
+import logging
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import cv2
+
+
+class DebugSink:
+    """
+    Writes debug images from a background thread so that debug output never blocks the
+    vision pipeline.
+
+    Images are queued in a bounded buffer; when the writer falls behind, the oldest
+    pending image is dropped. JPEG encoding and file writes happen on the writer thread,
+    and every output directory is pruned to at most max_files files and max_bytes bytes,
+    oldest first.
+    """
+
+    def __init__(
+        self,
+        root: str = ".",
+        queue_size: int = 16,
+        max_files: Optional[int] = 500,
+        max_bytes: Optional[int] = 200 * 2**20,
+        jpeg_quality: int = 90,
+    ):
+        """
+        :param root: Directory the category directories are created in.
+        :param queue_size: Maximum number of images waiting to be written.
+        :param max_files: Maximum number of files kept per directory (None: unlimited).
+        :param max_bytes: Maximum total size per directory in bytes (None: unlimited).
+        :param jpeg_quality: JPEG quality from 0 to 100.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.root = root
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)]
+
+        self._queue: Deque[Tuple[str, str, Any]] = deque(maxlen=queue_size)
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._busy = False
+        # Per directory: file path -> size, oldest first
+        self._files: Dict[str, "OrderedDict[str, int]"] = {}
+        self._bytes: Dict[str, int] = {}
+
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.deleted = 0
+        self.failed = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "DebugSink":
+        """
+        Creates a sink from the 'debug_output' settings block.
+        """
+        sink_config = config.get("debug_output", {})
+        max_megabytes = sink_config.get("max_megabytes", 200)
+        return cls(
+            root=sink_config.get("directory", "."),
+            queue_size=sink_config.get("queue_size", 16),
+            max_files=sink_config.get("max_files", 500),
+            max_bytes=int(max_megabytes * 2**20) if max_megabytes else None,
+            jpeg_quality=sink_config.get("jpeg_quality", 90),
+        )
+
+    def submit(self, category: str, name: str, image: Any) -> bool:
+        """
+        Queues an image to be written to <root>/<category>/<name> and returns immediately.
+        The image must not be modified afterwards. Returns False if an older pending image
+        had to be dropped to make room.
+        """
+        if image is None:
+            return True
+        self._ensure_started()
+        with self._condition:
+            dropped = len(self._queue) == self._queue.maxlen
+            if dropped:
+                self.dropped += 1
+            self._queue.append((category, name, image))
+            self.submitted += 1
+            self._condition.notify()
+        return not dropped
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until all queued images are written. Returns False on timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._queue and not self._busy, timeout
+            )
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """
+        Writes the pending images and stops the writer thread.
+        """
+        if self._thread is None:
+            return
+        self.flush(timeout)
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        self._thread = None
+        self._stop_event.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                "submitted": self.submitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "deleted": self.deleted,
+                "failed": self.failed,
+                "pending": len(self._queue),
+            }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="DebugSink", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._queue or self._stop_event.is_set()
+                )
+                if not self._queue:
+                    break
+                category, name, image = self._queue.popleft()
+                self._busy = True
+            try:
+                self._write(category, name, image)
+            except Exception as e:
+                self.failed += 1
+                self.logger.error(f"Failed to write debug image {name}: {e}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _write(self, category: str, name: str, image: Any):
+        directory = os.path.join(self.root, category)
+        if not name.lower().endswith((".jpg", ".jpeg")):
+            name = os.path.splitext(name)[0] + ".jpg"
+        path = os.path.join(directory, name)
+
+        ret, buffer = cv2.imencode(".jpg", image, self.encode_params)
+        if not ret:
+            raise ValueError("JPEG encoding failed")
+
+        files = self._directory_files(directory)
+        with open(path, "wb") as file:
+            file.write(buffer)
+        self.written += 1
+        self.logger.debug(f"Debug image saved as {path}")
+
+        # Rewritten files move to the end of the retention order
+        self._bytes[directory] += buffer.size - files.pop(path, 0)
+        files[path] = buffer.size
+        self._prune(directory)
+
+    def _directory_files(self, directory: str) -> "OrderedDict[str, int]":
+        files = self._files.get(directory)
+        if files is not None:
+            return files
+
+        # Adopt the files left over from earlier runs, oldest first
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        files = OrderedDict((path, size) for _, path, size in sorted(entries))
+        self._files[directory] = files
+        self._bytes[directory] = sum(files.values())
+        self._prune(directory)
+        return files
+
+    def _prune(self, directory: str):
+        files = self._files[directory]
+        while files and (
+            (self.max_files is not None and len(files) > self.max_files)
+            or (self.max_bytes is not None and self._bytes[directory] > self.max_bytes)
+        ):
+            path, size = files.popitem(last=False)
+            self._bytes[directory] -= size
+            try:
+                os.remove(path)
+                self.deleted += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.logger.warning(f"Could not delete old debug image {path}: {e}")
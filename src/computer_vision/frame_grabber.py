@@ -0,0 +1,130 @@
+# modules/frame_grabber.py
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+
+class Frame:
+    """
+    A captured frame with its sequence number and capture timestamp (time.time()).
+    The image is read-only and shared between all consumers.
+    """
+
+    __slots__ = ("seq", "timestamp", "image")
+
+    def __init__(self, seq: int, timestamp: float, image: Any):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.image = image
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Continuously drains a capture device and publishes the newest frames to a small ring
+    buffer, so that several consumers never compete for the device or read stale buffered
+    frames.
+
+    Sources without a pace of their own (on_demand, e.g. a replay as fast as possible)
+    are read one frame at a time, only once a consumer waits for a frame newer than the
+    newest one, so frames are not skipped faster than they are processed.
+    """
+
+    def __init__(self, cap: Any, buffer_size: int = 4):
+        """
+        :param cap: Object with a cv2.VideoCapture compatible read() method.
+        :param buffer_size: Number of most recent frames kept.
+        """
+        super().__init__(daemon=True)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.cap = cap
+        self._frames = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._seq = 0
+        self._stop_event = threading.Event()
+        self._on_demand = getattr(cap, "on_demand", False)
+        # Highest sequence number a consumer waits for (on-demand sources only)
+        self._requested = 0
+        self.failed_reads = 0
+
+    @property
+    def finished(self) -> bool:
+        """True once a finite frame source is exhausted."""
+        return getattr(self.cap, "finished", False)
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of the newest frame (0 before the first frame)."""
+        return self._seq
+
+    def run(self):
+        self.logger.info("Frame grabber started.")
+        while not self._stop_event.is_set():
+            if self._on_demand:
+                with self._condition:
+                    self._condition.wait_for(
+                        lambda: self._requested > self._seq
+                        or self._stop_event.is_set()
+                    )
+                if self._stop_event.is_set():
+                    break
+            ret, image = self.cap.read()
+            if getattr(self.cap, "finished", False):
+                self.logger.info("Frame source finished.")
+                break
+            if not ret or image is None:
+                self.failed_reads += 1
+                self.logger.error("Error: Failed to capture image from webcam.")
+                self._stop_event.wait(0.05)
+                continue
+
+            # cap.read() allocates a new array per frame; freeze it so it can be shared
+            image.flags.writeable = False
+            with self._condition:
+                self._seq += 1
+                self._frames.append(Frame(self._seq, time.time(), image))
+                self._condition.notify_all()
+
+        with self._condition:
+            # Also set when the source is exhausted, so waiting consumers return
+            self._stop_event.set()
+            self._condition.notify_all()
+        self.logger.info("Frame grabber stopped.")
+
+    def latest(self) -> Optional[Frame]:
+        """Returns the newest frame without waiting, or None if none was captured yet."""
+        with self._condition:
+            return self._frames[-1] if self._frames else None
+
+    def wait_for_frame(
+        self, after_seq: int = 0, timeout: Optional[float] = None
+    ) -> Optional[Frame]:
+        """
+        Returns the newest frame with a sequence number greater than after_seq, waiting
+        for it if necessary. Returns None on timeout, when the grabber is stopped or when
+        its source is exhausted.
+        """
+        with self._condition:
+            if self._on_demand and self._requested <= after_seq:
+                self._requested = after_seq + 1
+                self._condition.notify_all()
+            self._condition.wait_for(
+                lambda: (self._frames and self._frames[-1].seq > after_seq)
+                or self._stop_event.is_set(),
+                timeout,
+            )
+            if self._frames and self._frames[-1].seq > after_seq:
+                return self._frames[-1]
+            return None
+
+    def next_frame(self, timeout: Optional[float] = None) -> Optional[Frame]:
+        """Returns the first frame captured after this call."""
+        return self.wait_for_frame(self.sequence, timeout)
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self.is_alive():
+            self.join(timeout)
@@ -0,0 +1,191 @@
+# modules/frame_source.py
+import glob
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, List, Optional, Tuple
+
+import cv2
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+
+
+class FrameSource(ABC):
+    """
+    Source of camera frames with the cv2.VideoCapture read interface.
+
+    needs_warmup tells whether the source has to settle exposure and white balance before
+    its frames can be used; finished becomes True once a finite source is exhausted.
+    on_demand tells whether the source has no pace of its own, so frames should only be
+    read when a consumer waits for one.
+    """
+
+    needs_warmup = False
+    finished = False
+    on_demand = False
+
+    @abstractmethod
+    def isOpened(self) -> bool:
+        pass
+
+    @abstractmethod
+    def read(self) -> Tuple[bool, Optional[Any]]:
+        pass
+
+    def release(self):  # noqa: B027
+        pass
+
+
+class CameraSource(FrameSource):
+    """
+    Live webcam source.
+    """
+
+    needs_warmup = True
+
+    def __init__(self, camera_index: int, width: int = 1920, height: int = 1080):
+        self.camera_index = camera_index
+        self.cap = cv2.VideoCapture(camera_index)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+    def isOpened(self) -> bool:
+        return self.cap.isOpened()
+
+    def read(self) -> Tuple[bool, Optional[Any]]:
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+    def __str__(self):
+        return f"webcam with index {self.camera_index}"
+
+
+class ReplaySource(FrameSource):
+    """
+    Plays back a video file or an image sequence, either in real time or as fast as the
+    consumer reads.
+
+    Image sequences are played in file name order. If file names are Unix timestamps in
+    seconds or milliseconds (for example "1733912345.250.jpg") they define the capture
+    times, otherwise frames are spaced by 1 / fps.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        realtime: bool = True,
+        fps: float = 30.0,
+        loop: bool = False,
+        speed: float = 1.0,
+        max_frames: Optional[int] = None,
+    ):
+        """
+        :param path: Video file or directory of images.
+        :param realtime: If True, frames are returned at their recorded pace.
+        :param fps: Frame rate of image sequences without timestamps.
+        :param loop: If True, playback restarts at the end instead of finishing.
+        :param speed: Playback speed factor in real-time mode.
+        :param max_frames: If set, playback finishes after this many frames.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.speed = speed
+        self.max_frames = max_frames
+        self.frames_read = 0
+        self.fps = fps
+
+        self._video = None
+        self._images: List[str] = []
+        self._timestamps: List[float] = []
+        if os.path.isdir(path):
+            self._images = sorted(
+                p
+                for pattern in IMAGE_PATTERNS
+                for p in glob.glob(os.path.join(path, pattern))
+            )
+            self._timestamps = self._parse_timestamps(self._images, fps)
+        else:
+            self._video = cv2.VideoCapture(path)
+            video_fps = self._video.get(cv2.CAP_PROP_FPS)
+            if video_fps and video_fps > 0:
+                self.fps = video_fps
+
+        self._index = 0
+        self._start_time = None
+
+    @staticmethod
+    def _parse_timestamps(paths: List[str], fps: float) -> List[float]:
+        try:
+            stamps = [float(os.path.splitext(os.path.basename(p))[0]) for p in paths]
+        except ValueError:
+            stamps = []
+        # Plain frame counters ("0001.jpg") are not timestamps
+        if not stamps or stamps[0] < 1e9:
+            return [i / fps for i in range(len(paths))]
+        if stamps[0] >= 1e12:
+            stamps = [stamp / 1000 for stamp in stamps]
+        return [stamp - stamps[0] for stamp in stamps]
+
+    @property
+    def on_demand(self) -> bool:
+        return not self.realtime
+
+    def isOpened(self) -> bool:
+        if self._video is not None:
+            return self._video.isOpened()
+        return bool(self._images)
+
+    def _restart(self):
+        self._index = 0
+        self._start_time = None
+        if self._video is not None:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def _next(self) -> Tuple[bool, Optional[Any], float]:
+        if self._video is not None:
+            ret, frame = self._video.read()
+            return ret, frame, self._index / self.fps
+        if self._index >= len(self._images):
+            return False, None, 0.0
+        frame = cv2.imread(self._images[self._index])
+        return frame is not None, frame, self._timestamps[self._index]
+
+    def read(self) -> Tuple[bool, Optional[Any]]:
+        if self.finished:
+            return False, None
+
+        ret, frame, offset = self._next()
+        if not ret and self.loop and self._index > 0:
+            self._restart()
+            ret, frame, offset = self._next()
+        if self.max_frames is not None and self.frames_read >= self.max_frames:
+            ret = False
+        if not ret:
+            self.finished = True
+            self.logger.info(
+                f"Replay of {self.path} finished after {self.frames_read} frames."
+            )
+            return False, None
+
+        if self.realtime:
+            if self._start_time is None:
+                self._start_time = time.monotonic()
+            delay = self._start_time + offset / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        self._index += 1
+        self.frames_read += 1
+        return True, frame
+
+    def release(self):
+        if self._video is not None:
+            self._video.release()
+
+    def __str__(self):
+        return f"replay of {self.path}"
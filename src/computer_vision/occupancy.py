@@ -0,0 +1,73 @@
+# modules/occupancy.py
+from typing import Dict, List
+
+import numpy as np
+
+
+def compute_square_fractions(labels, grid, n_classes, margin=0.0):
+    """
+    Computes the fraction of every class within every square of a warped label image.
+
+    Uses a single bincount over a cached per-pixel square index, so the cost is one pass
+    over the image regardless of the number of classes.
+
+    :param labels: (height, width) uint8 label image, 0 is background.
+    :param grid: BoardGrid of the warped image.
+    :param n_classes: Number of labels including the background.
+    :param margin: Fraction of the square size ignored along each square border.
+    :return: (rows, cols, n_classes) float32 array of class fractions per square.
+    """
+    index = grid.square_index(margin)
+    n_squares = len(grid)
+    counts = np.bincount(
+        (index * n_classes + labels).ravel(), minlength=(n_squares + 1) * n_classes
+    )
+    counts = counts[: n_squares * n_classes].reshape(grid.rows, grid.cols, n_classes)
+    totals = counts.sum(axis=2, keepdims=True)
+    return (counts / np.maximum(totals, 1)).astype(np.float32)
+
+
+class BoardOccupancy:
+    """
+    Occupancy/color tensor of the board.
+
+    fractions[row, col, k] is the fraction of pixels of class k in a square, classes[row, col]
+    is the detected cube class (0 for an empty square) and confidence[row, col] in [0, 1]
+    tells how clearly the square was decided.
+    """
+
+    def __init__(self, fractions, class_names: List[str], min_fraction: float):
+        self.fractions = fractions
+        self.class_names = class_names
+        self.min_fraction = min_fraction
+
+        cube_fractions = fractions[..., 1:]
+        dominant = cube_fractions.argmax(axis=2)
+        dominant_fraction = np.take_along_axis(
+            cube_fractions, dominant[..., None], axis=2
+        )[..., 0]
+        occupied = dominant_fraction >= min_fraction
+        self.classes = np.where(occupied, dominant + 1, 0).astype(np.uint8)
+
+        # Distance from the decision threshold relative to the threshold: empty squares are
+        # fully confident without cube pixels, occupied ones at twice the threshold, scaled
+        # by how pure the cube color is
+        distance = np.abs(dominant_fraction - min_fraction) / max(min_fraction, 1e-6)
+        purity = dominant_fraction / np.maximum(cube_fractions.sum(axis=2), 1e-6)
+        self.confidence = np.clip(
+            np.where(occupied, distance * purity, distance), 0, 1
+        ).astype(np.float32)
+
+    @property
+    def occupied(self):
+        return self.classes > 0
+
+    def to_positions(self, grid) -> Dict[str, str]:
+        """
+        Returns the {square label: color} dict used by the rest of the game.
+        """
+        rows, cols = np.nonzero(self.classes)
+        return {
+            str(grid.labels[row, col]): self.class_names[self.classes[row, col]]
+            for row, col in zip(rows, cols)
+        }
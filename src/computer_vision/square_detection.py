@@ -1,4 +1,6 @@
 # modules/square_detection.py
+from functools import lru_cache
+
 import cv2
 import numpy as np
 
@@ -14,40 +16,185 @@ def warp_perspective(image, pts, size=(800, 800)):
     warped = cv2.warpPerspective(image, M, size)
     return warped, M
 
-def detect_squares(image, debug=False, chessboard_size=(8, 8)):
-    squares = []
-    img_height, img_width = image.shape[:2]
-    square_size_w = img_width / chessboard_size[0]
-    square_size_h = img_height / chessboard_size[1]
-
-    for row in range(chessboard_size[1]):
-        for col in range(chessboard_size[0]):
-            x = int(round(col * square_size_w))
-            y = int(round(row * square_size_h))
-            x_end = int(round((col + 1) * square_size_w))
-            y_end = int(round((row + 1) * square_size_h))
-            w = x_end - x
-            h = y_end - y
-
-            square = {
-                'row': row,
-                'col': col,
-                'x': x,
-                'y': y,
-                'w': w,
-                'h': h
-            }
-            squares.append(square)
-            if debug:
-                cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 1)
-                cv2.putText(image, f"{col},{row}", (x + 5, y + 20),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
 
-    if debug:
-        cv2.imshow("Detected Squares", image)
-        cv2.waitKey(0)
-        cv2.destroyAllWindows()
+def rotation_matrix(angle, size):
+    """
+    Returns the 3x3 matrix and output size that reproduce ChessCubeProcessor.rotate_image.
+
+    :param angle: Rotation angle in degrees (90, -90 and 180 are exact, others rotate around the center).
+    :param size: (width, height) of the image to rotate.
+    :return: Tuple of (3x3 float64 matrix, (width, height) of the rotated image).
+    """
+    w, h = size
+    if angle == 0:
+        return np.eye(3), (w, h)
+    if angle == 90:
+        R = np.array([[0, -1, h - 1], [1, 0, 0], [0, 0, 1]], dtype=np.float64)
+        return R, (h, w)
+    if angle == -90:
+        R = np.array([[0, 1, 0], [-1, 0, w - 1], [0, 0, 1]], dtype=np.float64)
+        return R, (h, w)
+    if angle == 180:
+        R = np.array([[-1, 0, w - 1], [0, -1, h - 1], [0, 0, 1]], dtype=np.float64)
+        return R, (w, h)
+    R = np.vstack([cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0), [0, 0, 1]])
+    return R, (w, h)
+
+
+def build_warp_maps(pts, size=(800, 800), rotation_angle=0):
+    """
+    Folds the perspective warp and the rotation into a single cv2.remap lookup table.
+
+    :param pts: Ordered source points (top-left, top-right, bottom-right, bottom-left).
+    :param size: (width, height) of the warped board before rotation.
+    :param rotation_angle: Rotation applied after the warp, in degrees.
+    :return: Tuple of (map1, map2, output_size) ready for cv2.remap.
+    """
+    destination = np.array([
+        [0, 0],
+        [size[0] - 1, 0],
+        [size[0] - 1, size[1] - 1],
+        [0, size[1] - 1]
+    ], dtype="float32")
+    M = cv2.getPerspectiveTransform(np.asarray(pts, dtype="float32"), destination)
+    R, out_size = rotation_matrix(rotation_angle, size)
+
+    # Map every output pixel back to its source pixel in the camera frame
+    inverse = np.linalg.inv(R @ M)
+    xs, ys = np.meshgrid(
+        np.arange(out_size[0], dtype=np.float64),
+        np.arange(out_size[1], dtype=np.float64),
+    )
+    src_x = inverse[0, 0] * xs + inverse[0, 1] * ys + inverse[0, 2]
+    src_y = inverse[1, 0] * xs + inverse[1, 1] * ys + inverse[1, 2]
+    src_w = inverse[2, 0] * xs + inverse[2, 1] * ys + inverse[2, 2]
+    map_x = (src_x / src_w).astype(np.float32)
+    map_y = (src_y / src_w).astype(np.float32)
+
+    # Fixed-point maps are considerably faster to apply than float maps
+    map1, map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+    return map1, map2, out_size
+
+
+class BoardGrid:
+    """
+    Array-backed chessboard grid for a warped image.
+
+    Square edges, sizes and labels are stored as NumPy arrays so that points can be mapped
+    to squares with arithmetic indexing instead of scanning all squares.
+    Row 0 is the top row of the warped image (rank 8), column 0 is file A.
+    """
 
-    return squares
+    COLUMNS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
+    def __init__(self, image_size, chessboard_size=(8, 8)):
+        self.width, self.height = int(image_size[0]), int(image_size[1])
+        self.cols, self.rows = int(chessboard_size[0]), int(chessboard_size[1])
+        self.square_w = self.width / self.cols
+        self.square_h = self.height / self.rows
+
+        # Pixel edges, identical to the rounding previously used by detect_squares
+        self.x_edges = np.round(np.arange(self.cols + 1) * self.square_w).astype(np.int32)
+        self.y_edges = np.round(np.arange(self.rows + 1) * self.square_h).astype(np.int32)
+
+        # labels[row, col] -> "A8" ... "H1"
+        self.labels = np.array([
+            [f"{self.COLUMNS[col]}{self.rows - row}" for col in range(self.cols)]
+            for row in range(self.rows)
+        ])
+
+        self._square_index_cache = {}
+
+    def __len__(self):
+        return self.rows * self.cols
+
+    def square_index(self, margin=0.0):
+        """
+        Returns an (height, width) int32 map of the flat square index (row * cols + col) of
+        every pixel. Pixels within `margin` (fraction of the square size) of a square border
+        map to len(self), so grid lines and neighbouring cubes can be ignored.
+        The map is computed once per margin.
+        """
+        index = self._square_index_cache.get(margin)
+        if index is None:
+            xs = np.arange(self.width) / self.square_w
+            ys = np.arange(self.height) / self.square_h
+            cols = np.minimum(np.floor(xs).astype(np.int32), self.cols - 1)
+            rows = np.minimum(np.floor(ys).astype(np.int32), self.rows - 1)
+            inside_x = (xs - cols >= margin) & (xs - cols < 1 - margin)
+            inside_y = (ys - rows >= margin) & (ys - rows < 1 - margin)
+            index = rows[:, None] * self.cols + cols[None, :]
+            index[~(inside_y[:, None] & inside_x[None, :])] = len(self)
+            index = index.astype(np.int32)
+            self._square_index_cache[margin] = index
+        return index
+
+    def rect(self, row, col):
+        """Returns the (x, y, w, h) rectangle of a square."""
+        x, y = self.x_edges[col], self.y_edges[row]
+        return (
+            int(x),
+            int(y),
+            int(self.x_edges[col + 1] - x),
+            int(self.y_edges[row + 1] - y),
+        )
+
+    def rects(self):
+        """Yields (row, col, label, (x, y, w, h)) for every square in row-major order."""
+        for row in range(self.rows):
+            for col in range(self.cols):
+                yield row, col, str(self.labels[row, col]), self.rect(row, col)
+
+    def locate(self, points):
+        """
+        Maps points to squares.
+
+        :param points: Array-like of shape (N, 2) with (x, y) coordinates in the warped image.
+        :return: Tuple of (rows, cols, valid) arrays; rows/cols are -1 where valid is False.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        cols = np.floor(points[:, 0] / self.square_w).astype(np.int32)
+        rows = np.floor(points[:, 1] / self.square_h).astype(np.int32)
+        valid = (cols >= 0) & (cols < self.cols) & (rows >= 0) & (rows < self.rows)
+        rows[~valid] = -1
+        cols[~valid] = -1
+        return rows, cols, valid
+
+    def locate_boxes(self, boxes):
+        """
+        Maps bounding boxes to squares by their centers.
+
+        :param boxes: Array-like of shape (N, 4) with (x, y, w, h) rows.
+        :return: Tuple of (rows, cols, valid) arrays, see locate.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        centers = boxes[:, :2] + boxes[:, 2:] / 2
+        return self.locate(centers)
+
+
+@lru_cache(maxsize=8)
+def get_board_grid(image_size, chessboard_size=(8, 8)):
+    """
+    Returns a cached BoardGrid; the grid only depends on the image and chessboard sizes.
+    """
+    return BoardGrid(tuple(image_size), tuple(chessboard_size))
+
+
+def detect_squares(image, debug=False, chessboard_size=(8, 8), sink=None,
+                   image_name="squares.jpg"):
+    img_height, img_width = image.shape[:2]
+    grid = get_board_grid((img_width, img_height), tuple(chessboard_size))
+
+    if debug:
+        for row, col, _, (x, y, w, h) in grid.rects():
+            cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 1)
+            cv2.putText(image, f"{col},{row}", (x + 5, y + 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        if sink is not None:
+            sink.submit("debug_images", f"squares_{image_name}", image)
+        else:
+            cv2.imshow("Detected Squares", image)
+            cv2.waitKey(0)
+            cv2.destroyAllWindows()
 
+    return grid
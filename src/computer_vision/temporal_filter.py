@@ -0,0 +1,81 @@
+# modules/temporal_filter.py
+from collections import Counter, deque
+from typing import Deque, Dict, Optional
+
+
+class BoardStateFilter:
+    """
+    Per-square majority vote over the last `window` board states.
+
+    Each update only touches the squares occupied in the added and the evicted state, so
+    the cost per frame is independent of the window size. A square without a cube in a
+    state counts as a vote for "empty".
+    """
+
+    def __init__(self, window: int = 3, min_agreement: float = 0.66):
+        """
+        :param window: Number of most recent states that vote.
+        :param min_agreement: Fraction of the window that must agree on every square.
+        """
+        if window < 1:
+            raise ValueError("The window must contain at least one state.")
+        self.window = window
+        self.min_agreement = min_agreement
+        self._history: Deque[Dict[str, str]] = deque()
+        self._votes: Dict[str, Counter] = {}
+
+    def __len__(self):
+        return len(self._history)
+
+    def reset(self):
+        self._history.clear()
+        self._votes.clear()
+
+    def update(self, positions: Optional[Dict[str, str]]):
+        """
+        Adds a board state ({square: color}); None is treated as an empty board.
+        """
+        positions = dict(positions or {})
+        self._history.append(positions)
+        for square, color in positions.items():
+            self._votes.setdefault(square, Counter())[color] += 1
+
+        if len(self._history) > self.window:
+            for square, color in self._history.popleft().items():
+                votes = self._votes[square]
+                votes[color] -= 1
+                if votes[color] <= 0:
+                    del votes[color]
+                if not votes:
+                    del self._votes[square]
+
+    def estimate(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns {square: {"color": winner or None, "agreement": fraction}} for every square
+        that had a cube in any state of the window.
+        """
+        n = len(self._history)
+        result = {}
+        for square, votes in self._votes.items():
+            color, count = votes.most_common(1)[0]
+            empty = n - sum(votes.values())
+            if empty >= count:
+                color, count = None, empty
+            result[square] = {"color": color, "agreement": count / n}
+        return result
+
+    def stable_state(self) -> Optional[Dict[str, str]]:
+        """
+        Returns the voted board state once the window is full and every square reaches
+        min_agreement, otherwise None.
+        """
+        if len(self._history) < self.window:
+            return None
+        estimate = self.estimate()
+        if any(e["agreement"] < self.min_agreement for e in estimate.values()):
+            return None
+        return {
+            square: e["color"]
+            for square, e in estimate.items()
+            if e["color"] is not None
+        }
@@ -1,8 +1,7 @@
 # modules/utils.py
 import cv2
-import numpy as np
 
-def draw_annotations(image, squares, cubes, cube_positions):
+def draw_annotations(image, grid, cubes, cube_positions):
     # Font settings
     font = cv2.FONT_HERSHEY_SIMPLEX
     font_scale = 0.5
@@ -10,20 +9,11 @@ def draw_annotations(image, squares, cubes, cube_positions):
     text_color = (255, 255, 255)  # White
     text_outline = (0, 0, 0)      # Black for outline
 
-    # Define chess columns
-    columns = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
-
     # Draw squares and labels
-    for square in squares:
-        x, y, w, h = square['x'], square['y'], square['w'], square['h']
-        row, col = square['row'], square['col']
-
+    for _, _, square_label, (x, y, w, h) in grid.rects():
         # Draw square rectangle
         cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 1)
 
-        # Determine square label
-        square_label = f"{columns[col]}{8 - row}"  # e.g., 'A1', 'B2'
-
         # Calculate text size to center the label
         (text_width, text_height), _ = cv2.getTextSize(square_label, font, font_scale, font_thickness)
         text_x = x + (w - text_width) // 2
@@ -52,14 +42,9 @@ def draw_annotations(image, squares, cubes, cube_positions):
 
     return image
 
-def map_cube_to_square(cube, squares):
-    # Find the center of the cube
-    center_x = cube['x'] + cube['w'] / 2
-    center_y = cube['y'] + cube['h'] / 2
-
-    # Determine which square this point falls into
-    for square in squares:
-        x, y, w, h = square['x'], square['y'], square['w'], square['h']
-        if x <= center_x < x + w and y <= center_y < y + h:
-            return square['row'], square['col']
-    return None, None
+def map_cube_to_square(cube, grid):
+    # Find the square containing the center of the cube
+    rows, cols, valid = grid.locate_boxes([(cube['x'], cube['y'], cube['w'], cube['h'])])
+    if not valid[0]:
+        return None, None
+    return int(rows[0]), int(cols[0])
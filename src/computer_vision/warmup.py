@@ -0,0 +1,79 @@
+# modules/warmup.py
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+import cv2
+import numpy as np
+
+
+class WarmupMonitor:
+    """
+    Decides when a camera has finished adjusting exposure and white balance.
+
+    Every frame is reduced to its mean luminance (exposure) and the blue/green and
+    red/green ratios of its channel means (white balance). The camera counts as settled
+    once each statistic varied by less than its tolerance over the last `window` frames.
+    """
+
+    def __init__(
+        self,
+        window: int = 10,
+        luma_tolerance: float = 2.0,
+        color_tolerance: float = 0.01,
+        sample_size: Tuple[int, int] = (64, 36),
+    ):
+        """
+        :param window: Number of consecutive frames that must agree.
+        :param luma_tolerance: Maximum spread of the mean luminance (0-255).
+        :param color_tolerance: Maximum spread of the blue/green and red/green ratios.
+        :param sample_size: Frames are downscaled to this size before measuring.
+        """
+        self.window = window
+        self.luma_tolerance = luma_tolerance
+        self.color_tolerance = color_tolerance
+        self.sample_size = sample_size
+        self._stats: Deque[Tuple[float, float, float]] = deque(maxlen=window)
+
+    @classmethod
+    def from_config(cls, config) -> "WarmupMonitor":
+        warmup_config = config.get("camera_warmup", {})
+        return cls(
+            window=warmup_config.get("window", 10),
+            luma_tolerance=warmup_config.get("luma_tolerance", 2.0),
+            color_tolerance=warmup_config.get("color_tolerance", 0.01),
+        )
+
+    def reset(self):
+        self._stats.clear()
+
+    def measure(self, image: Any) -> Tuple[float, float, float]:
+        """Returns (mean luminance, blue/green ratio, red/green ratio) of a BGR frame."""
+        small = cv2.resize(image, self.sample_size, interpolation=cv2.INTER_AREA)
+        b, g, r = cv2.mean(small)[:3]
+        luma = 0.114 * b + 0.587 * g + 0.299 * r
+        g = max(g, 1.0)
+        return luma, b / g, r / g
+
+    def update(self, image: Any) -> bool:
+        """Adds a frame and returns True once the camera has settled."""
+        self._stats.append(self.measure(image))
+        return self.converged
+
+    @property
+    def converged(self) -> bool:
+        if len(self._stats) < self.window:
+            return False
+        stats = np.array(self._stats)
+        spread = stats.max(axis=0) - stats.min(axis=0)
+        return bool(
+            spread[0] <= self.luma_tolerance
+            and spread[1] <= self.color_tolerance
+            and spread[2] <= self.color_tolerance
+        )
+
+    def summary(self) -> Dict[str, float]:
+        """Returns the latest statistics, for logging."""
+        if not self._stats:
+            return {}
+        luma, blue_ratio, red_ratio = self._stats[-1]
+        return {"luma": luma, "blue_green": blue_ratio, "red_green": red_ratio}
@@ -0,0 +1,146 @@
+"""
+Replays recorded frames through the ChessCubeProcessor pipeline and reports per-stage and
+end-to-end latency percentiles, throughput and peak memory as JSON.
+
+Usage (from the repository root):
+
+    poetry run python src/debug/benchmark_vision.py <frames_dir> [--config settings.yaml]
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from chess_logic.chess_cube_processor import ChessCubeProcessor  # noqa: E402
+
+DEFAULT_CONFIG = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "resources",
+    "config",
+    "settings.yaml",
+)
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+
+
+def load_frames(frames_dir, limit=None):
+    paths = sorted(
+        path
+        for pattern in IMAGE_PATTERNS
+        for path in glob.glob(os.path.join(frames_dir, pattern))
+    )
+    if limit:
+        paths = paths[:limit]
+    frames = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            print(f"Skipping unreadable frame {path}", file=sys.stderr)
+            continue
+        frames.append((os.path.basename(path), image))
+    return frames
+
+
+def summarize(samples):
+    values = np.array(samples) * 1000
+    return {
+        "count": len(values),
+        "mean_ms": float(values.mean()),
+        "min_ms": float(values.min()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p90_ms": float(np.percentile(values, 90)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+def benchmark(frames, config_path, iterations=1, warmup=1):
+    processor = ChessCubeProcessor(config_path=config_path, debug=False)
+    processor.profiler.enabled = True
+    processor.profiler.window = iterations * len(frames)
+
+    for name, image in frames[:warmup]:
+        processor.process_image(image, name)
+    processor.profiler.reset()
+
+    end_to_end = []
+    detections = 0
+
+    total_start = time.perf_counter()
+    for _ in range(iterations):
+        for name, image in frames:
+            start = time.perf_counter()
+            _, positions = processor.process_image(image, name)
+            end_to_end.append(time.perf_counter() - start)
+            detections += positions is not None
+    total_time = time.perf_counter() - total_start
+    stages = processor.profiler.stats()
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+    )
+
+    # tracemalloc slows every allocation down, so peak memory gets its own untimed pass
+    processor.profiler.enabled = False
+    tracemalloc.start()
+    for name, image in frames:
+        processor.process_image(image, name)
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "frames": len(frames),
+        "iterations": iterations,
+        "detection_mode": processor.detection_mode,
+        "frames_with_detections": detections,
+        "stages": stages,
+        "end_to_end": summarize(end_to_end),
+        "throughput_fps": len(end_to_end) / sum(end_to_end),
+        "wall_time_s": total_time,
+        "peak_traced_memory_mb": peak_traced / 2**20,
+        "peak_rss_mb": peak_rss,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("frames_dir", help="Directory with recorded frames")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="Settings YAML")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=None, help="Max frames to load")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames_dir, args.limit)
+    if not frames:
+        sys.exit(f"No frames found in {args.frames_dir}")
+
+    report = benchmark(
+        frames,
+        os.path.abspath(args.config),
+        iterations=args.iterations,
+        warmup=args.warmup,
+    )
+    report["config"] = os.path.abspath(args.config)
+    report["frames_dir"] = os.path.abspath(args.frames_dir)
+
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    print(text)
@@ -0,0 +1,50 @@
+"""
+Records template utterances of a command for the offline keyword detector. Each
+utterance detected by the voice activity detection is saved as
+<templates>/<keyword>/<n>.wav.
+
+Usage (from the repository root):
+
+    poetry run python src/debug/record_keyword.py help --count 5
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from chess_logic.keyword_spotting import (  # noqa: E402
+    DEFAULT_TEMPLATES_DIR,
+    SAMPLE_RATE,
+    EnergyVAD,
+    MicrophoneSource,
+    write_wav,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("keyword", help="Command to record, e.g. 'help'")
+    parser.add_argument("--count", type=int, default=5, help="Number of utterances")
+    parser.add_argument("--templates", default=DEFAULT_TEMPLATES_DIR)
+    parser.add_argument("--device-index", type=int, default=None)
+    args = parser.parse_args()
+
+    directory = os.path.join(args.templates, args.keyword)
+    os.makedirs(directory, exist_ok=True)
+    existing = len([name for name in os.listdir(directory) if name.endswith(".wav")])
+
+    source = MicrophoneSource(device_index=args.device_index)
+    vad = EnergyVAD()
+    source.open()
+    try:
+        for n in range(existing, existing + args.count):
+            print(f"Say '{args.keyword}' ({n - existing + 1}/{args.count})")
+            segment = None
+            while segment is None:
+                segment = vad.process(source.read())
+            path = os.path.join(directory, f"{n}.wav")
+            write_wav(path, segment, SAMPLE_RATE)
+            print(f"Saved {path} ({len(segment) / SAMPLE_RATE:.2f} s)")
+    finally:
+        source.close()
@@ -0,0 +1,73 @@
+"""
+Runs the keyword spotter on a recorded WAV file instead of the microphone, reporting the
+detected utterances, recognized commands and detection latency as JSON.
+
+Usage (from the repository root):
+
+    poetry run python src/debug/replay_keywords.py <recording.wav> [--realtime]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from chess_logic.keyword_spotting import (  # noqa: E402
+    DEFAULT_TEMPLATES_DIR,
+    KeywordSpotter,
+    SphinxKeywordDetector,
+    TemplateKeywordDetector,
+    WavSource,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recording", help="16-bit PCM WAV file")
+    parser.add_argument(
+        "--detector", choices=["template", "sphinx"], default="template"
+    )
+    parser.add_argument("--templates", default=DEFAULT_TEMPLATES_DIR)
+    parser.add_argument("--threshold", type=float, default=12.0)
+    parser.add_argument("--keywords", nargs="+", default=["start", "help"])
+    parser.add_argument(
+        "--realtime", action="store_true", help="Replay at the recording's pace"
+    )
+    args = parser.parse_args()
+
+    if args.detector == "template":
+        detector = TemplateKeywordDetector.from_directory(
+            args.templates, args.keywords, threshold=args.threshold
+        )
+    else:
+        detector = SphinxKeywordDetector(args.keywords)
+
+    source = WavSource(args.recording, realtime=args.realtime)
+    spotter = KeywordSpotter(source, detector)
+    events = []
+    spotter.subscribe(events.append)
+
+    start = time.perf_counter()
+    spotter.start()
+    spotter.join()
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "recording": os.path.abspath(args.recording),
+        "utterances": spotter.segments,
+        "detection_errors": spotter.errors,
+        "commands": [
+            {
+                "keyword": event.keyword,
+                "confidence": event.confidence,
+                "duration_s": event.duration,
+                "latency_ms": event.latency * 1000,
+            }
+            for event in events
+        ],
+        "wall_time_s": elapsed,
+        "error": str(spotter.error) if spotter.error else None,
+    }
+    print(json.dumps(report, indent=4))
@@ -0,0 +1,79 @@
+"""
+Runs ChessCubeAnalyzer headless on a recorded video or image sequence: obstacle thread,
+captures and move comparison, reporting detected moves and vision throughput as JSON.
+
+Usage (from the repository root):
+
+    poetry run python src/debug/replay_vision.py <video_or_frames_dir> [--fast]
+        [--loop] [--max-frames N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from chess_logic.chessboardAnalyzer import ChessCubeAnalyzer  # noqa: E402
+from computer_vision.frame_source import ReplaySource  # noqa: E402
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recording", help="Video file or directory of frames")
+    parser.add_argument("--config", default=None, help="Settings YAML")
+    parser.add_argument(
+        "--fast", action="store_true", help="Replay as fast as possible"
+    )
+    parser.add_argument("--fps", type=float, default=30.0, help="Image sequence fps")
+    parser.add_argument("--loop", action="store_true", help="Restart at the end")
+    parser.add_argument(
+        "--max-frames", type=int, default=None, help="Stop after this many frames"
+    )
+    parser.add_argument("--timeout", type=float, default=5.0, help="Move timeout (s)")
+    args = parser.parse_args()
+    if args.loop and args.max_frames is None:
+        print("Replaying in a loop, press Ctrl+C to stop", file=sys.stderr)
+
+    source = ReplaySource(
+        args.recording,
+        realtime=not args.fast,
+        fps=args.fps,
+        loop=args.loop,
+        max_frames=args.max_frames,
+    )
+    config_path = os.path.abspath(args.config) if args.config else None
+    analyzer = ChessCubeAnalyzer(config_path=config_path, frame_source=source)
+
+    start = time.perf_counter()
+    moves = []
+    status = None
+    try:
+        status = analyzer.initial()
+        while not analyzer.frame_grabber.finished:
+            movement = analyzer.wait_for_move(timeout=args.timeout)
+            if movement and movement not in (
+                "obstacle detected",
+                "initial positions not set",
+                "updated positions not set",
+            ):
+                moves.append({"time_s": time.perf_counter() - start, "move": movement})
+            elif movement == "initial positions not set":
+                analyzer.initial()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        elapsed = time.perf_counter() - start
+        analyzer.cleanup()
+
+    report = {
+        "recording": os.path.abspath(args.recording),
+        "initial_status": status,
+        "moves": moves,
+        "frames": source.frames_read,
+        "wall_time_s": elapsed,
+        "frames_per_second": source.frames_read / elapsed if elapsed else 0.0,
+        "obstacle_detection": analyzer.get_obstacle_stats(),
+    }
+    print(json.dumps(report, indent=4))
@@ -1,5 +1,4 @@
 import asyncio
-from time import sleep
 
 from dotenv import load_dotenv
 from loguru import logger
@@ -16,20 +15,22 @@ async def main():
     configure_logger.configure("main")
     logger.info("Starting main")
 
-    robot = RobotController()
+    robot = await RobotController.create()
 
     # game = Game()
     # game.listen_for_start()
 
     # # speaking demo
-    robot.assume_emotion(Emotions.WATCH_PLAYER)
-    sleep(3)
-    robot.start_speak()
-    await asyncio.sleep(10)
-    robot.stop_speak()
-    sleep(1)
-    robot.assume_emotion(Emotions.WATCH_BOARD)
-    # sleep(3)
+    try:
+        await robot.assume_emotion_async(Emotions.WATCH_PLAYER)
+        await robot.speak_for_duration_async(10)
+        # The mouth keeps moving while the robot turns to the board
+        await asyncio.gather(
+            robot.speak_for_duration_async(2),
+            robot.assume_emotion_async(Emotions.WATCH_BOARD),
+        )
+    finally:
+        robot.close()
 
     logger.info("Exiting main")
 
@@ -0,0 +1,319 @@
+import queue
+import select
+import socket
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+
+from utils.profiling import StageProfiler
+
+# Keepalive probes after 5 s of silence, every 2 s, 3 unanswered ones drop the link
+KEEPALIVE_OPTIONS = (("TCP_KEEPIDLE", 5), ("TCP_KEEPINTVL", 2), ("TCP_KEEPCNT", 3))
+
+# Labels of commands that move the arm; these are never sent again after a reconnect
+MOTION_LABELS = ("move", "program", "speedj")
+
+
+class ChannelClosed(ConnectionError):
+    pass
+
+
+class CommandDropped(ConnectionError):
+    pass
+
+
+class _Command:
+    __slots__ = ("data", "label", "future", "queued")
+
+    def __init__(self, data: bytes, label: str):
+        self.data = data
+        self.label = label
+        self.future: Future = Future()
+        self.queued = time.perf_counter()
+
+    @property
+    def is_motion(self) -> bool:
+        return self.label.startswith(MOTION_LABELS)
+
+    def fail(self, error: Exception):
+        try:
+            self.future.set_exception(error)
+        except InvalidStateError:
+            # Already failed by another thread
+            pass
+
+
+class CommandChannel(threading.Thread):
+    """
+    TCP connection to a robot service with a queued background writer.
+
+    send() only enqueues the bytes; the writer thread sends them in order with
+    sendall() and resolves the returned future once they are written. Between writes
+    the thread reads and hands on whatever the peer sends (the UR secondary interface
+    streams state messages, the gripper answers every command), which also detects
+    closed connections. A lost connection is re-established with exponential backoff.
+    Gripper and activation writes that were not sent yet are sent after reconnecting;
+    motion commands (see MOTION_LABELS) queued before or during the outage fail with
+    CommandDropped instead, so the arm never runs a stale move.
+
+    Latency from send() until the bytes were written is recorded per command label.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        host: str,
+        port: int,
+        on_receive: Optional[Callable[[bytes], None]] = None,
+        on_connect: Optional[Callable[["CommandChannel"], None]] = None,
+        connect_timeout: float = 2.0,
+        initial_backoff: float = 0.1,
+        max_backoff: float = 5.0,
+        queue_size: int = 256,
+    ):
+        """
+        :param name: Used in logs and the thread name.
+        :param on_receive: Called on the channel thread with every chunk received.
+        :param on_connect: Called on the channel thread after every (re)connect, e.g.
+                           to activate the gripper; may use send_now().
+        """
+        super().__init__(name=f"CommandChannel-{name}", daemon=True)
+        self.channel_name = name
+        self.host = host
+        self.port = port
+        self.on_receive = on_receive
+        self.on_connect = on_connect
+        self.connect_timeout = connect_timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self._queue: "queue.Queue[Optional[_Command]]" = queue.Queue(queue_size)
+        self._socket: Optional[socket.socket] = None
+        self._inflight: Optional[_Command] = None
+        # Wakes the thread from select() when a command is queued
+        self._wakeup_receive, self._wakeup_send = socket.socketpair()
+        self._wakeup_send.setblocking(False)
+        self._closed = threading.Event()
+        self.connected = threading.Event()
+        self.latency = StageProfiler(enabled=True, window=256)
+        self.last_received: Optional[float] = None
+        self.last_error: Optional[Exception] = None
+        self.sent = 0
+        self.failed = 0
+        self.reconnects = 0
+
+    def send(self, data: bytes, label: str = "command") -> Future:
+        """
+        Queues bytes for sending and returns a future resolving to the number of bytes
+        once they were written.
+
+        :raises ChannelClosed: If the channel was closed.
+        """
+        if self._closed.is_set():
+            raise ChannelClosed(f"{self.channel_name} channel is closed")
+        command = _Command(data, label)
+        self._queue.put(command)
+        if command.is_motion and self.reconnects and not self.connected.is_set():
+            # Checked after queueing, so the command is either dropped here or by
+            # _drop_motion_commands()
+            command.fail(CommandDropped(f"{self.channel_name} is reconnecting"))
+        self._wake()
+        return command.future
+
+    def send_line(self, text: str, label: str = "command") -> Future:
+        return self.send(f"{text}\n".encode(), label)
+
+    def send_now(self, data: bytes):
+        """Writes bytes directly; only for use from on_connect."""
+        self._socket.sendall(data)
+
+    def _wake(self):
+        try:
+            self._wakeup_send.send(b"\0")
+        except OSError:
+            # Buffer full: the thread is awake anyway
+            pass
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def healthy(self, max_silence: Optional[float] = None) -> bool:
+        """
+        True while connected and, with max_silence, if the peer sent something within
+        the last max_silence seconds.
+        """
+        if not self.connected.is_set():
+            return False
+        if max_silence is None:
+            return True
+        return (
+            self.last_received is not None
+            and time.monotonic() - self.last_received < max_silence
+        )
+
+    def wait_connected(self, timeout: Optional[float] = None) -> bool:
+        return self.connected.wait(timeout)
+
+    def run(self):
+        backoff = self.initial_backoff
+        while not self._closed.is_set():
+            try:
+                self._connect()
+                backoff = self.initial_backoff
+                self._serve()
+            except OSError as e:
+                self.last_error = e
+                if self._closed.is_set():
+                    break
+                logger.warning(
+                    f"{self.channel_name} connection to {self.host}:{self.port} "
+                    f"failed: {e}; retrying in {backoff:.1f} s"
+                )
+                self._disconnect()
+                self.reconnects += 1
+                self._drop_motion_commands(e)
+                self._closed.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+        self._disconnect()
+        self._fail_pending()
+
+    def _connect(self):
+        if self._socket is not None:
+            return
+        connection = socket.create_connection(
+            (self.host, self.port), timeout=self.connect_timeout
+        )
+        # Commands are small and must leave immediately
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Detect a dead link even while no commands are sent
+        connection.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option, value in KEEPALIVE_OPTIONS:
+            if hasattr(socket, option):
+                connection.setsockopt(
+                    socket.IPPROTO_TCP, getattr(socket, option), value
+                )
+        self._socket = connection
+        logger.debug(f"{self.channel_name} connected to {self.host}:{self.port}")
+        if self.on_connect is not None:
+            self.on_connect(self)
+        self.connected.set()
+
+    def _disconnect(self):
+        self.connected.clear()
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+            self._socket = None
+
+    def _serve(self):
+        while not self._closed.is_set():
+            if self._inflight is None:
+                try:
+                    self._inflight = self._queue.get_nowait()
+                except queue.Empty:
+                    self._wait_for_activity()
+                    continue
+                if self._inflight is None:
+                    # close() was called and everything before it has been sent
+                    self._closed.set()
+                    return
+                if self._inflight.future.done():
+                    # Dropped motion command
+                    self._inflight = None
+                    continue
+            try:
+                self._socket.sendall(self._inflight.data)
+            except OSError as e:
+                # Other commands are sent again after reconnecting
+                self.failed += 1
+                if self._inflight.is_motion:
+                    self._inflight.fail(
+                        CommandDropped(f"{self.channel_name} connection lost: {e}")
+                    )
+                    self._inflight = None
+                raise
+            command, self._inflight = self._inflight, None
+            self.sent += 1
+            self.latency.record(command.label, time.perf_counter() - command.queued)
+            command.future.set_result(len(command.data))
+
+    def _wait_for_activity(self):
+        readable, _, _ = select.select(
+            [self._socket, self._wakeup_receive], [], [], 1.0
+        )
+        if self._wakeup_receive in readable:
+            self._wakeup_receive.recv(4096)
+        if self._socket in readable:
+            data = self._socket.recv(65536)
+            if not data:
+                raise ConnectionResetError("connection closed by peer")
+            self.last_received = time.monotonic()
+            if self.on_receive is not None:
+                self.on_receive(data)
+
+    def _drop_motion_commands(self, error: Exception):
+        """Fails the queued motion commands; they stay queued and are skipped."""
+        with self._queue.mutex:
+            commands = [
+                command
+                for command in self._queue.queue
+                if command is not None and command.is_motion
+            ]
+        if commands:
+            logger.warning(
+                f"{self.channel_name} dropped {len(commands)} motion command(s) "
+                "queued before the connection was lost"
+            )
+        for command in commands:
+            command.fail(
+                CommandDropped(f"{self.channel_name} connection lost: {error}")
+            )
+
+    def _fail_pending(self):
+        if self._inflight is not None:
+            self._inflight.fail(ChannelClosed(self.channel_name))
+            self._inflight = None
+        while True:
+            try:
+                command = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if command is not None:
+                command.fail(ChannelClosed(self.channel_name))
+
+    def stats(self) -> Dict:
+        """Returns counters and the per-label write latency statistics."""
+        return {
+            "host": f"{self.host}:{self.port}",
+            "connected": self.connected.is_set(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "reconnects": self.reconnects,
+            "pending": self.pending,
+            "latency": self.latency.stats(),
+        }
+
+    def close(self, timeout: Optional[float] = 1.0):
+        """Sends the queued commands (for at most timeout seconds) and disconnects."""
+        if self._closed.is_set():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+            self._wake()
+        except queue.Full:
+            pass
+        if self.is_alive():
+            self.join(timeout)
+        self._closed.set()
+        self._wake()
+        if self.is_alive():
+            self.join(timeout)
+        if not self.is_alive():
+            self._fail_pending()
+            self._wakeup_receive.close()
+            self._wakeup_send.close()
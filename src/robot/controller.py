@@ -1,127 +1,326 @@
 import asyncio
 import json
-from time import sleep  # TODO: replace with asyncio.sleep()?
+import threading
 
 from loguru import logger
 
 from robot.emotions import Emotions
 from robot.robot_arm_controller import RobotArm
+from robot.urscript import URScriptProgram
 
 with open("board_positions.json", "r") as file:
     BOARD_POSITIONS = json.load(file)
 
 
 class RobotController:
+    """
+    Every operation is a coroutine (the *_async methods), so robot motions, the mouth
+    animation, speech and vision polling can overlap on one event loop. Cancelling an
+    operation stops the arm. The blocking methods of the same name run the coroutines
+    on a private event loop thread and can be called from any thread but that one.
+    """
+
     speak = False
+    speak_task = None
+
+    # TCP speed in m/s when approaching or leaving a piece
+    DESCENT_SPEED = 0.1
+
+    # Height in m the carried piece is lifted above the hover points halfway through a
+    # transit, to clear the pieces in between
+    TRANSIT_LIFT = 0.05
 
-    def __init__(self):
+    def __init__(self, assume_start_pose=True):
         logger.info("Initializing RobotController")
         self.robot = RobotArm()
 
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever, name="RobotController", daemon=True
+        )
+        self._loop_thread.start()
+
+        if assume_start_pose:
+            self.assume_start_pose()
+
+    @classmethod
+    async def create(cls) -> "RobotController":
+        """Connects without blocking the event loop and awaits the start pose."""
+        controller = await asyncio.to_thread(cls, assume_start_pose=False)
+        await controller.assume_start_pose_async()
+        return controller
+
+    def _run(self, coroutine):
+        """Runs a coroutine on the controller's event loop and blocks until it is done."""
+        if threading.current_thread() is self._loop_thread:
+            coroutine.close()
+            raise RuntimeError("Blocking RobotController call on its own event loop")
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        try:
+            return future.result()
+        except KeyboardInterrupt:
+            future.cancel()
+            raise
+
+    def assume_start_pose(self):
+        self._run(self.assume_start_pose_async())
+
+    async def assume_start_pose_async(self):
         logger.debug("Moving upright")
-        self.assume_emotion(Emotions.UPRIGHT, mode="j")
-        sleep(4)
+        await self.assume_emotion_async(Emotions.UPRIGHT, mode="j")
 
         logger.debug("Moving init")
-        self.assume_emotion(Emotions.INIT, mode="j")
+        # Opens while the arm moves
         self.robot.open_gripper()
-        sleep(3.1)
+        await self.assume_emotion_async(Emotions.INIT, mode="j")
 
         logger.debug("Moving watch player")
-        self.assume_emotion(Emotions.WATCH_PLAYER)
-        sleep(3.1)
+        await self.assume_emotion_async(Emotions.WATCH_PLAYER)
         logger.info("RobotController ready")
 
-    def move(self, board_path: list, mode="l", time=2):
+    def get_position(self, board_path: list):
         pos_base = BOARD_POSITIONS
         for path in board_path:
             try:
                 pos_base = pos_base[path]
             except KeyError:
                 print(f"Key Not Found {path}")
-                return
-        pos_values = pos_base["values"]
-        pos_is_pose = pos_base["pose"]
-        self.robot.send_move_command(pos_values, mode=mode, pose=pos_is_pose, t=time)
+                return None
+        return pos_base
+
+    def move(self, board_path: list, mode="l", time=2, wait=False):
+        """
+        Moves to a position of board_positions.json. With wait, blocks until the robot
+        has arrived, as reported by the robot's state stream.
+        """
+        if wait:
+            self._run(self.move_async(board_path, mode, time))
+            return
+        position = self.get_position(board_path)
+        if position is None:
+            return
+        self.robot.send_move_command(
+            position["values"], mode=mode, pose=position["pose"], t=time
+        )
+
+    async def move_async(self, board_path: list, mode="l", time=2):
+        """Moves to a position of board_positions.json and awaits the arrival."""
+        position = self.get_position(board_path)
+        if position is None:
+            return
+        self.robot.send_move_command(
+            position["values"], mode=mode, pose=position["pose"], t=time
+        )
+        try:
+            await self.robot.wait_for_move_async(
+                position["values"], pose=position["pose"], t=time
+            )
+        except asyncio.CancelledError:
+            self.robot.stop_motion()
+            raise
+
+    def wait_for_move(self, board_path: list, time=2):
+        """Blocks until the robot has arrived at a position sent with move()."""
+        self._run(self.wait_for_move_async(board_path, time))
+
+    async def wait_for_move_async(self, board_path: list, time=2):
+        position = self.get_position(board_path)
+        if position is None:
+            return
+        await self.robot.wait_for_move_async(
+            position["values"], pose=position["pose"], t=time
+        )
+
+    def add_move(self, program: URScriptProgram, board_path: list, **kwargs):
+        """Appends a linear move to a position of board_positions.json to a program."""
+        position = self.get_position(board_path)
+        if position is None:
+            raise ValueError(f"Invalid position: {board_path}")
+        program.movel(position["values"], pose=position["pose"], **kwargs)
+
+    def add_transit(
+        self, program: URScriptProgram, from_path: list, to_path: list, **kwargs
+    ):
+        """
+        Appends a move from one hover point to another over a raised via point. The via
+        point is blended, so the TCP passes above it in an arc without stopping.
+        """
+        start = self.get_position(from_path)
+        end = self.get_position(to_path)
+        if start is None or end is None or not (start["pose"] and end["pose"]):
+            raise ValueError(f"Invalid transit: {from_path} to {to_path}")
+        via = [(a + b) / 2 for a, b in zip(start["values"][:3], end["values"][:3])]
+        via[2] = max(start["values"][2], end["values"][2]) + self.TRANSIT_LIFT
+        program.movel(via + list(end["values"][3:]), pose=True, **kwargs)
+        program.movel(end["values"], pose=True, stop=True, **kwargs)
+
+    def assume_emotion(self, emotion: Emotions, mode="l", wait=False):
+        if not isinstance(emotion, Emotions):
+            raise ValueError("Invalid emotion")
+
+        logger.info(f"Robot is assuming the emotion: {emotion.value}")
+        self.move([emotion.value], mode, wait=wait)
 
-    def assume_emotion(self, emotion: Emotions, mode="l"):
+    async def assume_emotion_async(self, emotion: Emotions, mode="l"):
         if not isinstance(emotion, Emotions):
             raise ValueError("Invalid emotion")
 
         logger.info(f"Robot is assuming the emotion: {emotion.value}")
-        self.move([emotion.value], mode)
+        await self.move_async([emotion.value], mode)
 
     async def speaking_task(self):
         logger.info("Starting speak")
         while True:
             self.robot.send_gripper_command(180)
             await asyncio.sleep(0.25)
-            # sleep(0.25)
             self.robot.send_gripper_command(255)
-            # sleep(0.25)
             await asyncio.sleep(0.25)
 
     def start_speak(self):
-        self.speak_task = asyncio.create_task(self.speaking_task())
+        """
+        Starts the mouth animation on the running event loop, or on the controller's
+        own loop when called outside of one.
+        """
+        self.stop_speak()
+        try:
+            self.speak_task = asyncio.get_running_loop().create_task(
+                self.speaking_task()
+            )
+        except RuntimeError:
+            self.speak_task = asyncio.run_coroutine_threadsafe(
+                self.speaking_task(), self._loop
+            )
 
     def stop_speak(self):
-        logger.info("Stopping speak")
         if self.speak_task:
+            logger.info("Stopping speak")
             self.speak_task.cancel()
             self.speak_task = None
 
     def speak_for_duration(self, duration):
+        self._run(self.speak_for_duration_async(duration))
+
+    async def speak_for_duration_async(self, duration):
         self.start_speak()
-        sleep(duration)
-        self.stop_speak()
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            self.stop_speak()
+
+    def move_piece(self, pos_A, pos_B) -> bool:
+        return self._run(self.move_piece_async(pos_A, pos_B))
+
+    async def move_piece_async(self, pos_A, pos_B) -> bool:
+        """
+        Moves the piece on pos_A to pos_B.
 
-    def move_piece(self, pos_A, pos_B):
+        :return: False if the gripper reported that it closed without a piece (it then
+                 returns to watching the player) or lost it on the way.
+        :raises MotionTimeout: If the arm did not finish a motion; it is stopped.
+        :raises ValueError: If a square is not on the board.
+        """
         logger.info(f"Moving {pos_A} to {pos_B}")
         # Verify key exists, A1-H8
         if pos_A not in BOARD_POSITIONS or pos_B not in BOARD_POSITIONS:
-            logger.error(f"Invalid position: {pos_A} or {pos_B}")
-            return
+            raise ValueError(f"Invalid position: {pos_A} or {pos_B}")
+
+        # Each program runs as a whole and continues as soon as the gripper has
+        # confirmed the grasp or release. It stops at the hover points, so pieces and
+        # fingers only move sideways once they are clear of the board; the transit
+        # between two hover points is blended over a raised via point.
+        program = self.robot.new_program("approach_piece")
+        self.add_move(program, [pos_A, "hover"], stop=True)
+        self.add_move(program, [pos_A, "pickup"], velocity=self.DESCENT_SPEED)
+        await self.robot.run_program_async(program)
+        if not await self.pick_up_async(pos_A):
+            return False
 
-        self.move([pos_A, "hover"], time=2)
-        sleep(2.1)
-        self.move([pos_A, "pickup"], time=1)
-        sleep(1.1)
-        self.robot.close_gripper()
-        sleep(0.5)
-        self.move([pos_A, "hover"], time=1)
-        sleep(1.1)
-        self.move([pos_B, "hover"], time=2)
-        sleep(2.1)
-        self.move([pos_B, "place"], time=1)
-        sleep(1.1)
-        self.robot.half_open_gripper()
-        sleep(0.5)
-        self.move([pos_B, "hover"], time=1)
+        program = self.robot.new_program("carry_piece")
+        self.add_move(program, [pos_A, "hover"], velocity=self.DESCENT_SPEED, stop=True)
+        self.add_transit(program, [pos_A, "hover"], [pos_B, "hover"])
+        self.add_move(program, [pos_B, "place"], velocity=self.DESCENT_SPEED)
+        await self.robot.run_program_async(program)
+        holding = await self.robot.is_holding_async()
+        await self.put_down_async(pos_B)
+
+        program = self.robot.new_program("leave_piece")
+        self.add_move(program, [pos_B, "hover"], velocity=self.DESCENT_SPEED, stop=True)
+        # self.add_move(program, ["hover"])
+        self.add_move(program, [Emotions.WATCH_PLAYER.value])
+        await self.robot.run_program_async(program)
+
+        if holding is False:
+            logger.error(f"Lost the piece from {pos_A} before placing it on {pos_B}")
+            return False
+        return True
+
+    def pick_up(self, position) -> bool:
+        return self._run(self.pick_up_async(position))
+
+    async def pick_up_async(self, position) -> bool:
+        """
+        Closes the gripper at a pickup position. On a missed pickup, the gripper is
+        opened, the robot returns to watching the player and False is returned.
+        """
+        grasped = await self.robot.grasp_async()
+        if grasped is None:
+            logger.warning("Gripper did not report, assuming the piece was picked up")
+        elif not grasped:
+            logger.error(f"Missed the piece on {position}")
+            self.robot.open_gripper()
+            program = self.robot.new_program("missed_pickup")
+            self.add_move(
+                program, [position, "hover"], velocity=self.DESCENT_SPEED, stop=True
+            )
+            self.add_move(program, [Emotions.WATCH_PLAYER.value])
+            await self.robot.run_program_async(program)
+            return False
+        return True
+
+    def put_down(self, position):
+        self._run(self.put_down_async(position))
+
+    async def put_down_async(self, position):
+        released = await self.robot.release_async()
+        if released is False:
+            logger.warning(f"Gripper blocked while releasing on {position}")
+        # Fully opened while the robot moves up
         self.robot.open_gripper()
-        sleep(1.1)
-        # self.move(["hover"], time=2)
-        self.assume_emotion(Emotions.WATCH_PLAYER)
-        sleep(2.1)
 
     # ! Pieces start to stack an overflow eventually, TODO: multiple discard positions?
-    def discard_piece(self, from_pos):
-        logger.info(f"Discarding {from_pos}")
-        self.move([from_pos, "hover"])
-        sleep(2)
+    def discard_piece(self, from_pos) -> bool:
+        return self._run(self.discard_piece_async(from_pos))
 
-        self.move([from_pos, "pickup"])
-        sleep(0.5)
-        self.robot.close_gripper()
-        sleep(0.5)
+    async def discard_piece_async(self, from_pos) -> bool:
+        logger.info(f"Discarding {from_pos}")
+        program = self.robot.new_program("approach_piece")
+        self.add_move(program, [from_pos, "hover"], stop=True)
+        self.add_move(program, [from_pos, "pickup"], velocity=self.DESCENT_SPEED)
+        await self.robot.run_program_async(program)
+        if not await self.pick_up_async(from_pos):
+            return False
 
-        self.move([from_pos, "hover"])
-        sleep(0.5)
+        program = self.robot.new_program("carry_piece")
+        self.add_move(
+            program, [from_pos, "hover"], velocity=self.DESCENT_SPEED, stop=True
+        )
+        self.add_transit(program, [from_pos, "hover"], [Emotions.DISCARD.value])
+        await self.robot.run_program_async(program)
+        await self.put_down_async(Emotions.DISCARD.value)
 
-        self.assume_emotion(Emotions.DISCARD)
-        sleep(2)
-        self.robot.half_open_gripper()
-        sleep(0.5)
+        program = self.robot.new_program("leave_piece")
+        self.add_move(program, [Emotions.HOVER.value])
+        await self.robot.run_program_async(program)
+        return True
 
-        self.assume_emotion(Emotions.HOVER)
-        self.robot.open_gripper()
-        sleep(2)
+    def close(self):
+        """Stops the mouth animation, the event loop thread and the connections."""
+        self.stop_speak()
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(timeout=1.0)
+            if self._loop_thread.is_alive():
+                logger.warning("RobotController event loop did not stop")
+            else:
+                self._loop.close()
+        self.robot.close_connection()
@@ -0,0 +1,253 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Deque, Dict, Optional, Tuple
+
+from loguru import logger
+
+from robot.command_channel import CommandChannel
+
+# Values of GET OBJ
+OBJ_MOVING = 0  # moving towards the requested position, no object detected
+OBJ_DETECTED_OPENING = 1  # stopped by an object while opening
+OBJ_DETECTED_CLOSING = 2  # stopped by an object while closing: holding it
+OBJ_AT_POSITION = 3  # requested position reached, no object detected
+
+# Value of GET STA once activation has completed
+STA_ACTIVE = 3
+
+
+class GripperClient:
+    """
+    Client for the Robotiq gripper socket protocol (port 63352 on the UR controller).
+
+    Every command is answered by one line: "ack" for SET commands and "<VAR> <value>"
+    for GET commands, e.g. "OBJ 2". Replies are matched to the oldest waiting request
+    of the same kind, so queries can be issued from any thread. A grasp or release is
+    confirmed by polling OBJ until the fingers have stopped.
+    """
+
+    def __init__(self, host: str, port: int = 63352, on_connect_activate: bool = True):
+        # (reply kind, its future, the future returned for the whole request)
+        self._pending: Deque[Tuple[str, Future, Future]] = deque()
+        self._lock = threading.Lock()
+        self._buffer = b""
+        self.on_connect_activate = on_connect_activate
+        self.channel = CommandChannel(
+            "gripper",
+            host,
+            port,
+            on_receive=self._on_receive,
+            on_connect=self._on_connect,
+        )
+
+    def start(self):
+        self.channel.start()
+
+    def _on_connect(self, channel: CommandChannel):
+        # Replies to requests sent over the previous connection will never arrive
+        with self._lock:
+            pending, self._pending = self._pending, deque()
+            if self.on_connect_activate:
+                # Also after a reconnect, the gripper may have been reset
+                future = Future()
+                self._pending.append(("ack", future, future))
+        for _, future, _ in pending:
+            if not future.done():
+                future.set_exception(ConnectionError("gripper connection was reset"))
+        if self.on_connect_activate:
+            channel.send_now(b"SET ACT 1\n")
+
+    def _on_receive(self, data: bytes):
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            self._handle_reply(line.decode(errors="replace").strip())
+
+    def _handle_reply(self, reply: str):
+        if not reply:
+            return
+        if reply == "ack":
+            kind, value = "ack", True
+        else:
+            kind, _, text = reply.partition(" ")
+            try:
+                value = int(text)
+            except ValueError:
+                logger.warning(f"Unexpected gripper reply: {reply}")
+                return
+        with self._lock:
+            for entry in self._pending:
+                if entry[0] == kind:
+                    self._pending.remove(entry)
+                    break
+            else:
+                logger.debug(f"Unrequested gripper reply: {reply}")
+                return
+        if not entry[1].done():
+            entry[1].set_result(value)
+
+    def _request(self, lines, kinds) -> Future:
+        """Sends lines in one write and returns the future of the last reply."""
+        futures = [Future() for _ in kinds]
+        with self._lock:
+            entries = [
+                (kind, future, futures[-1]) for kind, future in zip(kinds, futures)
+            ]
+            self._pending.extend(entries)
+            try:
+                # Inside the lock, so requests are written in the order they wait
+                self.channel.send(
+                    "".join(f"{line}\n" for line in lines).encode(), "gripper"
+                )
+            except ConnectionError:
+                for entry in entries:
+                    self._pending.remove(entry)
+                raise
+        return futures[-1]
+
+    def _discard(self, future: Future):
+        """Stops waiting for every reply of the request that returned future."""
+        with self._lock:
+            for entry in [entry for entry in self._pending if entry[2] is future]:
+                self._pending.remove(entry)
+
+    def command(self, text: str) -> Future:
+        """Sends a SET command; the future resolves once it was acknowledged."""
+        return self._request([text], ["ack"])
+
+    def move(self, position: int) -> Future:
+        """Requests a position (0 open to 255 closed) and starts the motion."""
+        if not 0 <= position <= 255:
+            raise ValueError(f"Invalid gripper position: {position}")
+        return self._request([f"SET POS {position}", "SET GTO 1"], ["ack", "ack"])
+
+    def get(self, variable: str) -> Future:
+        """Requests a status variable, e.g. "OBJ"; the future resolves to its value."""
+        variable = variable.upper()
+        return self._request([f"GET {variable}"], [variable])
+
+    def query(self, variable: str, timeout: float = 0.5) -> Optional[int]:
+        """Returns a status variable, or None if the gripper did not answer in time."""
+        future = self.get(variable)
+        try:
+            return future.result(timeout)
+        except (FutureTimeout, ConnectionError):
+            self._discard(future)
+            return None
+
+    def position(self) -> Optional[int]:
+        return self.query("POS")
+
+    def object_status(self) -> Optional[int]:
+        return self.query("OBJ")
+
+    def is_active(self) -> Optional[bool]:
+        status = self.query("STA")
+        return None if status is None else status == STA_ACTIVE
+
+    def is_holding(self) -> Optional[bool]:
+        """True if the fingers are closed on an object, None if unknown."""
+        status = self.object_status()
+        return None if status is None else status == OBJ_DETECTED_CLOSING
+
+    def status(self) -> Dict[str, Optional[int]]:
+        return {
+            variable: self.query(variable) for variable in ("STA", "POS", "OBJ", "FLT")
+        }
+
+    async def query_async(self, variable: str, timeout: float = 0.5) -> Optional[int]:
+        future = self.get(variable)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            self._discard(future)
+            return None
+
+    async def is_holding_async(self) -> Optional[bool]:
+        status = await self.query_async("OBJ")
+        return None if status is None else status == OBJ_DETECTED_CLOSING
+
+    async def wait_for_motion_async(
+        self,
+        position: Optional[int] = None,
+        timeout: float = 2.0,
+        poll_interval: float = 0.01,
+    ) -> Optional[int]:
+        """
+        Polls until the fingers have stopped and returns the OBJ value, or None on
+        timeout or if the gripper does not answer.
+
+        :param position: Requested position; until the gripper reports it as its
+                         request (PRE), OBJ still describes the previous motion.
+        """
+        deadline = time.monotonic() + timeout
+        if position is not None:
+            while await self.query_async("PRE") != position:
+                if time.monotonic() > deadline:
+                    return None
+                await asyncio.sleep(poll_interval)
+        while time.monotonic() <= deadline:
+            status = await self.query_async("OBJ")
+            if status is None:
+                return None
+            if status != OBJ_MOVING:
+                return status
+            await asyncio.sleep(poll_interval)
+        return None
+
+    async def move_async(self, position: int, timeout: float = 2.0) -> bool:
+        """
+        Requests a position and waits until the gripper acknowledged it; False if the
+        command could not be sent or was not acknowledged in time.
+        """
+        try:
+            future = self.move(position)
+        except ConnectionError as e:
+            logger.warning(f"Gripper move to {position} not sent: {e}")
+            return False
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            self._discard(future)
+            logger.warning(f"Gripper move to {position} not acknowledged: {e!r}")
+            return False
+        return True
+
+    async def grasp_async(self, position: int, timeout: float = 2.0) -> Optional[bool]:
+        """
+        Closes to position and returns True as soon as an object stopped the fingers,
+        False if they closed without one or the gripper did not take the command, None
+        if the result is unknown.
+
+        :param position: Should be past the object's width, e.g. fully closed (255):
+                         if the fingers reach it while touching the object, OBJ reports
+                         the position as reached and the grasp counts as a miss.
+        """
+        if not await self.move_async(position, timeout):
+            return False
+        status = await self.wait_for_motion_async(position, timeout)
+        if status is None:
+            return None
+        return status == OBJ_DETECTED_CLOSING
+
+    async def release_async(
+        self, position: int, timeout: float = 2.0
+    ) -> Optional[bool]:
+        """
+        Opens to position and returns True once it was reached, False if the fingers
+        were blocked while opening or the gripper did not take the command, None if
+        the result is unknown.
+        """
+        if not await self.move_async(position, timeout):
+            return False
+        status = await self.wait_for_motion_async(position, timeout)
+        if status is None:
+            return None
+        return status == OBJ_AT_POSITION
+
+    def close(self):
+        self.channel.close()
@@ -1,77 +1,234 @@
 #! /usr/bin/env python3
 
-import socket
+import asyncio
+import functools
+import os
+from typing import Optional
 
 from loguru import logger
 
+from robot.command_channel import CommandChannel
+from robot.gripper import GripperClient
+from robot.robot_state import MotionTimeout, RobotStateReader
+from robot.urscript import URScriptProgram
 from utils.ip import get_ip
 
 
 class RobotArm:
-    def __init__(self):
-
-        # TODO: import from env
-        self.host = "192.168.1.11"
-        self.port_ur = 30002
-        self.port_gripper = 63352
-        self.ip = get_ip()
-
-        # Create the TCP/IP socket and set SO_REUSEADDR to reuse the port
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(
-            socket.SOL_SOCKET, socket.SO_REUSEADDR, 1
-        )  # Allow port reuse
-
-        # Bind the socket to the IP address and port of the Python client
-        self.server_socket.bind((self.ip, 30003))
-        self.server_socket.listen(1)
-
-        # Create socket connection to robot arm and gripper
-        self.socket_ur = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket_ur.connect((self.host, self.port_ur))
-        self.socket_gripper = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket_gripper.connect((self.host, self.port_gripper))
-        # activate the gripper
-        self.socket_gripper.sendall(b"SET ACT 1\n")
+    # Gripper positions, 0 (open) to 255 (closed)
+    GRIPPER_OPEN = 153
+    GRIPPER_HALF_OPEN = 180
+    GRIPPER_CLOSED = 185
+    # A grasp closes fully: only an object can stop the fingers before the end stop
+    GRIPPER_GRASP = 255
+
+    # Seconds to wait for the fingers to stop
+    GRIPPER_TIMEOUT = 2.0
+
+    # TCP speed (m/s) and acceleration (m/s^2) of programs
+    LINEAR_SPEED = 0.25
+    LINEAR_ACCELERATION = 0.5
+
+    def __init__(self, connect_timeout=5.0):
+        self.host = os.getenv("UR_HOST", "192.168.1.11")
+        self.port_ur = int(os.getenv("UR_PORT", "30002"))
+        self.port_gripper = int(os.getenv("UR_GRIPPER_PORT", "63352"))
+        self.port_state = int(os.getenv("UR_STATE_PORT", "30003"))
+        self.ip = get_ip(self.host)
+        logger.debug(f"Local address towards the robot: {self.ip}")
+
+        # Joint positions and speeds streamed by the real-time interface
+        self.state_reader = RobotStateReader(self.host, self.port_state)
+        self.state_reader.start()
+
+        # Command connections to robot arm and gripper, re-established if they drop
+        self.ur_channel = CommandChannel("ur", self.host, self.port_ur)
+        self.gripper = GripperClient(self.host, self.port_gripper)
+        self.gripper_channel = self.gripper.channel
+        self.ur_channel.start()
+        self.gripper.start()
+        for channel in (self.ur_channel, self.gripper_channel):
+            if not channel.wait_connected(connect_timeout):
+                self.close_connection()
+                raise ConnectionError(
+                    f"Could not connect to {channel.host}:{channel.port}: "
+                    f"{channel.last_error}"
+                )
 
     # def assume_start_pos(self):
     #     joint_angles = [0, -1.57, 0, 0, 0, 0]  # upright position
     #     self.send_move_command(joint_angles, "j")
 
     def open_gripper(self):
-        self.send_gripper_command(153)
+        self.send_gripper_command(self.GRIPPER_OPEN)
 
     def half_open_gripper(self):
-        self.send_gripper_command(180)
+        self.send_gripper_command(self.GRIPPER_HALF_OPEN)
 
     def close_gripper(self):
-        self.send_gripper_command(185)
+        self.send_gripper_command(self.GRIPPER_CLOSED)
+
+    async def grasp_async(self, position=None) -> Optional[bool]:
+        """
+        Closes the gripper and returns as soon as it has stopped: True if it holds an
+        object, False if it closed on nothing, None if the gripper did not report.
+        """
+        return await self.gripper.grasp_async(
+            self.GRIPPER_GRASP if position is None else position, self.GRIPPER_TIMEOUT
+        )
 
-    def send_move_command(self, values, mode="j", pose=False, t=2, a=0.25):
-        values = ", ".join(
-            ["{:.4f}".format(i) if type(i) is float else str(i) for i in values]
+    async def release_async(self, position=None) -> Optional[bool]:
+        """
+        Opens the gripper and returns as soon as it has stopped: True once the position
+        was reached, False if the fingers were blocked, None if the gripper did not
+        report.
+        """
+        return await self.gripper.release_async(
+            self.GRIPPER_HALF_OPEN if position is None else position,
+            self.GRIPPER_TIMEOUT,
         )
-        prefix = "p" if pose else ""
-        cmd = str.encode(f"move{mode}({prefix}[{values}],a={a},t={t})\n")
-        self.socket_ur.send(cmd)
+
+    async def is_holding_async(self) -> Optional[bool]:
+        return await self.gripper.is_holding_async()
+
+    def stop_motion(self, deceleration=2.0):
+        """Decelerates the arm to a stop, ending a running program."""
+        self.ur_channel.send(str.encode(f"stopj({deceleration})\n"), label="stopj")
+        logger.debug("sent stop command")
+
+    def send_move_command(self, values, mode="j", pose=False, t=2, a=0.25):
+        cmd = encode_move_command(tuple(values), mode, pose, t, a)
+        self.ur_channel.send(cmd, label=f"move{mode}")
         logger.debug(f"sent command: {cmd}")
 
+    async def wait_for_move_async(self, values, pose=False, t=2) -> bool:
+        """
+        Waits until the robot stands still at the target of a move command. Without
+        the state stream, waits for the nominal duration t instead.
+
+        :return: False if the target was not confirmed.
+        """
+        if not await self.state_reader.wait_until_connected_async(timeout=1.0):
+            logger.warning("No robot state, waiting for the nominal move duration")
+            await asyncio.sleep(t + 0.1)
+            return False
+        try:
+            await self.state_reader.wait_until_reached_async(
+                values, pose, timeout=2 * t + 2
+            )
+            return True
+        except MotionTimeout as e:
+            logger.warning(f"Move to {values} not confirmed: {e}")
+            return False
+
+    def new_program(self, name="hri_program") -> URScriptProgram:
+        return URScriptProgram(
+            name,
+            velocity=self.LINEAR_SPEED,
+            acceleration=self.LINEAR_ACCELERATION,
+        )
+
+    def send_program(self, program: URScriptProgram):
+        """
+        Sends a program as a whole; returns its estimated duration, with the current
+        TCP pose used for blending and the estimate if the state stream is up.
+        """
+        start_pose = (
+            self.state_reader.state.tcp_pose if self.state_reader.healthy else None
+        )
+        script = program.build(start_pose)
+        duration = program.estimate_duration(start_pose)
+        self.ur_channel.send(str.encode(script), label="program")
+        logger.debug(f"sent program ({duration:.1f} s):\n{script}")
+        return duration
+
+    async def run_program_async(self, program: URScriptProgram) -> Optional[bool]:
+        """
+        Sends a program as a whole and waits until the robot stands still at its final
+        target. If the awaiting task is cancelled, the robot is stopped.
+
+        :return: True once the final target was reached, None if that cannot be
+                 confirmed without the state stream (the estimated duration is waited
+                 instead).
+        :raises MotionTimeout: If the robot did not come to rest at the final target
+                               in time; the robot is stopped.
+        """
+        connected = await self.state_reader.wait_until_connected_async(timeout=1.0)
+        duration = self.send_program(program)
+        final_move = program.final_move
+        try:
+            if not connected or final_move is None:
+                logger.warning(
+                    f"Program {program.name} cannot be confirmed, waiting for its "
+                    f"estimated duration ({duration:.1f} s)"
+                )
+                await asyncio.sleep(duration + 0.5)
+                return None
+            try:
+                # The final target may be where the robot started from
+                await self.state_reader.wait_for_async(
+                    lambda state: not state.is_stopped(), 1.0
+                )
+            except MotionTimeout:
+                # A slow program start, or the first target is the current pose
+                logger.debug(f"Program {program.name} start not seen")
+            try:
+                await self.state_reader.wait_until_reached_async(
+                    final_move.values, final_move.pose, timeout=2 * duration + 2
+                )
+            except MotionTimeout as e:
+                logger.error(f"Program {program.name} did not finish: {e}")
+                self.stop_motion()
+                raise
+            return True
+        except asyncio.CancelledError:
+            self.stop_motion()
+            raise
+
     def send_gripper_command(self, value):
         if value >= 0 and value <= 255:
-            command = "SET POS " + str(value) + "\n"
-            self.socket_gripper.send(str.encode(command))
-            # make the gripper move
-            self.socket_gripper.send(b"SET GTO 1\n")
+            try:
+                self.gripper.move(value)
+            except ConnectionError as e:
+                logger.warning(f"Gripper command {value} not sent: {e}")
 
     def rotate_gripper_90deg(self):
-        cmd = str.encode("speedj([0,0,0,0,0,3.14],3,1)\n")
-        self.socket_ur.send(cmd)
+        cmd = b"speedj([0,0,0,0,0,3.14],3,1)\n"
+        self.ur_channel.send(cmd, label="speedj")
         logger.debug(f"sent command: {cmd}")
 
     def set_gripper_speed(self):
         pass
 
+    def healthy(self) -> bool:
+        """
+        True if both command connections are up and the robot is streaming its state
+        (the secondary interface sends state messages at 10 Hz).
+        """
+        return (
+            self.ur_channel.healthy(max_silence=1.0)
+            and self.gripper_channel.healthy()
+            and self.state_reader.healthy
+        )
+
+    def stats(self):
+        """Returns the counters and per-command latencies of the connections."""
+        return {
+            "ur": self.ur_channel.stats(),
+            "gripper": self.gripper_channel.stats(),
+            "state_packets": self.state_reader.packets,
+        }
+
     def close_connection(self):
-        self.socket_ur.close()
-        self.socket_gripper.close()
-        self.server_socket.close()
+        self.ur_channel.close()
+        self.gripper.close()
+        self.state_reader.stop(timeout=1.0)
+
+
+@functools.lru_cache(maxsize=512)
+def encode_move_command(values, mode, pose, t, a) -> bytes:
+    values = ", ".join(
+        ["{:.4f}".format(i) if type(i) is float else str(i) for i in values]
+    )
+    prefix = "p" if pose else ""
+    return str.encode(f"move{mode}({prefix}[{values}],a={a},t={t})\n")
@@ -0,0 +1,312 @@
+import asyncio
+import socket
+import struct
+import threading
+import time
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+# Byte offsets in a real-time interface (port 30003) packet, including the leading
+# 4-byte message size. The layout is the same for all controller versions since 3.0.
+OFFSET_TIME = 4
+OFFSET_Q_ACTUAL = 252
+OFFSET_QD_ACTUAL = 300
+OFFSET_TOOL_VECTOR_ACTUAL = 444
+OFFSET_TCP_SPEED_ACTUAL = 492
+OFFSET_ROBOT_MODE = 756
+MIN_PACKET_SIZE = 764
+MAX_PACKET_SIZE = 4096
+
+
+class MotionTimeout(TimeoutError):
+    pass
+
+
+class RobotState:
+    """One packet of the real-time interface."""
+
+    __slots__ = (
+        "controller_time",
+        "received",
+        "q",
+        "qd",
+        "tcp_pose",
+        "tcp_speed",
+        "robot_mode",
+    )
+
+    def __init__(self, packet: bytes, received: float):
+        """
+        :param packet: Complete packet including the message size.
+        :param received: time.monotonic() when the packet arrived.
+        """
+        self.received = received
+        (self.controller_time,) = struct.unpack_from(">d", packet, OFFSET_TIME)
+        self.q = np.frombuffer(packet, ">f8", 6, OFFSET_Q_ACTUAL).astype(float)
+        self.qd = np.frombuffer(packet, ">f8", 6, OFFSET_QD_ACTUAL).astype(float)
+        self.tcp_pose = np.frombuffer(
+            packet, ">f8", 6, OFFSET_TOOL_VECTOR_ACTUAL
+        ).astype(float)
+        self.tcp_speed = np.frombuffer(
+            packet, ">f8", 6, OFFSET_TCP_SPEED_ACTUAL
+        ).astype(float)
+        (self.robot_mode,) = struct.unpack_from(">d", packet, OFFSET_ROBOT_MODE)
+
+    @property
+    def joint_speed(self) -> float:
+        """Fastest joint speed in rad/s."""
+        return float(np.abs(self.qd).max())
+
+    @property
+    def linear_speed(self) -> float:
+        """TCP speed in m/s."""
+        return float(np.linalg.norm(self.tcp_speed[:3]))
+
+    def is_stopped(self, joint_tolerance: float = 0.005) -> bool:
+        return self.joint_speed < joint_tolerance
+
+    def joint_error(self, target: Sequence[float]) -> float:
+        return float(np.abs(self.q - np.asarray(target, dtype=float)).max())
+
+    def pose_error(self, target: Sequence[float]):
+        """Returns (position error in m, orientation error in rad) to a TCP pose."""
+        target = np.asarray(target, dtype=float)
+        position = float(np.linalg.norm(self.tcp_pose[:3] - target[:3]))
+        # Rotation vectors are ambiguous (rx=-3.14 and rx=3.14 are the same
+        # orientation), so the angle of the relative rotation is compared
+        relative = rotation_matrix(self.tcp_pose[3:]).T @ rotation_matrix(target[3:])
+        cos_angle = np.clip((np.trace(relative) - 1.0) / 2.0, -1.0, 1.0)
+        return position, float(np.arccos(cos_angle))
+
+
+def reached_predicate(
+    target: Sequence[float],
+    pose: bool,
+    position_tolerance: float = 0.002,
+    angle_tolerance: float = 0.02,
+    joint_tolerance: float = 0.01,
+    speed_tolerance: float = 0.005,
+) -> Callable[[RobotState], bool]:
+    """Returns a predicate that is True while the robot is still at a target."""
+
+    def reached(state: RobotState) -> bool:
+        if not state.is_stopped(speed_tolerance):
+            return False
+        if not pose:
+            return state.joint_error(target) <= joint_tolerance
+        position_error, angle_error = state.pose_error(target)
+        return position_error <= position_tolerance and angle_error <= angle_tolerance
+
+    return reached
+
+
+def rotation_matrix(rotation_vector: Sequence[float]) -> np.ndarray:
+    """Rodrigues' formula for a URScript rotation vector."""
+    rotation_vector = np.asarray(rotation_vector, dtype=float)
+    angle = np.linalg.norm(rotation_vector)
+    if angle < 1e-12:
+        return np.eye(3)
+    x, y, z = rotation_vector / angle
+    k = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+    return np.eye(3) + np.sin(angle) * k + (1 - np.cos(angle)) * (k @ k)
+
+
+class RobotStateReader(threading.Thread):
+    """
+    Reads the robot state stream of the real-time interface on a background thread.
+
+    The controller sends a packet with joint positions and speeds and the TCP pose at
+    125 Hz (500 Hz on e-Series). The latest state is kept and the wait_* methods block
+    until a condition on it holds, so motions can be followed as they happen instead of
+    sleeping for their nominal duration. The connection is re-established if it drops.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 30003,
+        connect_timeout: float = 2.0,
+        reconnect_interval: float = 1.0,
+    ):
+        super().__init__(name="RobotStateReader", daemon=True)
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.reconnect_interval = reconnect_interval
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._socket: Optional[socket.socket] = None
+        self.state: Optional[RobotState] = None
+        self.packets = 0
+        # Checked on every packet; return True once their condition is met
+        self._async_waiters: List[Callable[[RobotState], bool]] = []
+
+    @property
+    def healthy(self) -> bool:
+        """True if a state arrived within the last 0.5 s."""
+        state = self.state
+        return state is not None and time.monotonic() - state.received < 0.5
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._socket = socket.create_connection(
+                    (self.host, self.port), timeout=self.connect_timeout
+                )
+                logger.debug(f"Connected to robot state stream {self.host}:{self.port}")
+                self._read_packets(self._socket)
+            except OSError as e:
+                if not self._stop_event.is_set():
+                    logger.warning(f"Robot state stream unavailable: {e}")
+            finally:
+                if self._socket is not None:
+                    self._socket.close()
+                    self._socket = None
+            self._stop_event.wait(self.reconnect_interval)
+
+    def _read_packets(self, connection: socket.socket):
+        header = bytearray(4)
+        buffer = bytearray(MAX_PACKET_SIZE)
+        while not self._stop_event.is_set():
+            _receive_into(connection, memoryview(header))
+            (size,) = struct.unpack(">i", header)
+            if not MIN_PACKET_SIZE <= size <= MAX_PACKET_SIZE:
+                raise OSError(f"unexpected packet size {size}")
+            buffer[:4] = header
+            _receive_into(connection, memoryview(buffer)[4:size])
+            state = RobotState(bytes(buffer[:size]), time.monotonic())
+            with self._condition:
+                self.state = state
+                self.packets += 1
+                self._condition.notify_all()
+                if self._async_waiters:
+                    self._async_waiters = [
+                        check for check in self._async_waiters if not check(state)
+                    ]
+
+    def wait_until_connected(self, timeout: float) -> bool:
+        """Waits for the first state; False if none arrived within timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.healthy, timeout)
+
+    def wait_for(
+        self, predicate: Callable[[RobotState], bool], timeout: float
+    ) -> RobotState:
+        """
+        Blocks until predicate(state) is True for a newly received state.
+
+        :raises MotionTimeout: If that does not happen within timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            seen = self.packets
+            while True:
+                if self.packets != seen:
+                    seen = self.packets
+                    if predicate(self.state):
+                        return self.state
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise MotionTimeout(f"Robot condition not met within {timeout} s")
+                self._condition.wait(remaining)
+
+    async def wait_for_async(
+        self, predicate: Callable[[RobotState], bool], timeout: float
+    ) -> RobotState:
+        """
+        Awaitable counterpart of wait_for(); the predicate is evaluated on the reader
+        thread and the result handed to the event loop.
+
+        :raises MotionTimeout: If that does not happen within timeout seconds.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve(state: RobotState):
+            if not future.done():
+                future.set_result(state)
+
+        def check(state: RobotState) -> bool:
+            if future.done():
+                return True
+            if not predicate(state):
+                return False
+            loop.call_soon_threadsafe(resolve, state)
+            return True
+
+        with self._condition:
+            self._async_waiters.append(check)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise MotionTimeout(f"Robot condition not met within {timeout} s")
+        finally:
+            # Also when cancelled
+            future.cancel()
+
+    async def wait_until_connected_async(self, timeout: float) -> bool:
+        try:
+            await self.wait_for_async(lambda state: True, timeout)
+        except MotionTimeout:
+            return False
+        return True
+
+    def wait_until_reached(
+        self,
+        target: Sequence[float],
+        pose: bool,
+        timeout: float,
+        position_tolerance: float = 0.002,
+        angle_tolerance: float = 0.02,
+        joint_tolerance: float = 0.01,
+        speed_tolerance: float = 0.005,
+    ) -> RobotState:
+        """
+        Waits until the robot is still at a target.
+
+        :param target: TCP pose [x, y, z, rx, ry, rz] if pose, else joint positions.
+        :param position_tolerance: Maximum TCP position error in m.
+        :param angle_tolerance: Maximum TCP orientation error in rad.
+        :param joint_tolerance: Maximum joint position error in rad.
+        :param speed_tolerance: Maximum joint speed in rad/s.
+        """
+        return self.wait_for(
+            reached_predicate(
+                target,
+                pose,
+                position_tolerance,
+                angle_tolerance,
+                joint_tolerance,
+                speed_tolerance,
+            ),
+            timeout,
+        )
+
+    async def wait_until_reached_async(
+        self, target: Sequence[float], pose: bool, timeout: float, **tolerances
+    ) -> RobotState:
+        """Awaitable counterpart of wait_until_reached()."""
+        return await self.wait_for_async(
+            reached_predicate(target, pose, **tolerances), timeout
+        )
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop_event.set()
+        connection = self._socket
+        if connection is not None:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.is_alive():
+            self.join(timeout)
+
+
+def _receive_into(connection: socket.socket, view: memoryview):
+    while len(view):
+        received = connection.recv_into(view)
+        if received == 0:
+            raise OSError("connection closed by the robot")
+        view = view[received:]
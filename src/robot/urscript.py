@@ -0,0 +1,128 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+def format_values(values: Sequence[float], pose: bool) -> str:
+    prefix = "p" if pose else ""
+    return f"{prefix}[{', '.join('{:.4f}'.format(float(v)) for v in values)}]"
+
+
+class Move:
+    __slots__ = ("values", "pose", "velocity", "acceleration", "stop", "blend")
+
+    def __init__(self, values, pose, velocity, acceleration, stop):
+        self.values = [float(v) for v in values]
+        self.pose = pose
+        self.velocity = velocity
+        self.acceleration = acceleration
+        self.stop = stop
+        self.blend = 0.0
+
+
+class URScriptProgram:
+    """
+    Builds a URScript program of linear moves that runs on the controller as a whole.
+
+    Moves pass through their targets without stopping: each target gets the largest
+    blend radius that fits between its neighbours (at most max_blend), unless the move
+    is marked stop=True or is the last one.
+    """
+
+    def __init__(
+        self,
+        name: str = "hri_program",
+        velocity: float = 0.25,
+        acceleration: float = 0.5,
+        max_blend: float = 0.05,
+    ):
+        """
+        :param velocity: Default TCP speed in m/s.
+        :param acceleration: Default TCP acceleration in m/s^2.
+        :param max_blend: Maximum blend radius in m.
+        """
+        self.name = name
+        self.velocity = velocity
+        self.acceleration = acceleration
+        self.max_blend = max_blend
+        self.moves: List[Move] = []
+
+    def movel(
+        self,
+        values: Sequence[float],
+        pose: bool = True,
+        velocity: Optional[float] = None,
+        acceleration: Optional[float] = None,
+        stop: bool = False,
+    ) -> "URScriptProgram":
+        """
+        :param values: TCP pose if pose, else joint positions.
+        :param stop: Come to a full stop at this target.
+        """
+        self.moves.append(
+            Move(
+                values,
+                pose,
+                velocity or self.velocity,
+                acceleration or self.acceleration,
+                stop,
+            )
+        )
+        return self
+
+    @property
+    def final_move(self) -> Optional[Move]:
+        return self.moves[-1] if self.moves else None
+
+    def plan_blends(self, start_pose: Optional[Sequence[float]] = None):
+        """
+        Sets the blend radius of every move. A radius is at most 45% of the shorter
+        adjacent segment, so neighbouring blends never overlap.
+
+        :param start_pose: Current TCP pose; without it the first target is not blended.
+        """
+        previous = None if start_pose is None else np.asarray(start_pose[:3], float)
+        for index, step in enumerate(self.moves):
+            position = np.asarray(step.values[:3]) if step.pose else None
+            following = self.moves[index + 1] if index + 1 < len(self.moves) else None
+            step.blend = 0.0
+            if (
+                not step.stop
+                and following is not None
+                and position is not None
+                and previous is not None
+                and following.pose
+            ):
+                segments = (
+                    np.linalg.norm(position - previous),
+                    np.linalg.norm(np.asarray(following.values[:3]) - position),
+                )
+                step.blend = float(min(self.max_blend, 0.45 * min(segments)))
+            previous = position
+
+    def estimate_duration(self, start_pose: Optional[Sequence[float]] = None) -> float:
+        """Rough duration in s from the trapezoidal speed profile of each segment."""
+        duration = 0.0
+        previous = None if start_pose is None else np.asarray(start_pose[:3], float)
+        for step in self.moves:
+            position = np.asarray(step.values[:3]) if step.pose else None
+            if position is None or previous is None:
+                # Unknown distance, e.g. a joint target
+                duration += 2.0
+            else:
+                distance = float(np.linalg.norm(position - previous))
+                duration += distance / step.velocity + step.velocity / step.acceleration
+            previous = position
+        return duration
+
+    def build(self, start_pose: Optional[Sequence[float]] = None) -> str:
+        self.plan_blends(start_pose)
+        lines = [f"def {self.name}():"]
+        for step in self.moves:
+            lines.append(
+                f"  movel({format_values(step.values, step.pose)}, "
+                f"a={step.acceleration}, v={step.velocity}, r={step.blend:.4f})"
+            )
+        # A program sent to the controller as a def block is run right away
+        lines.append("end")
+        return "\n".join(lines) + "\n"
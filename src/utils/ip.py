@@ -1,9 +1,16 @@
 import socket
 
 
-def get_ip():
+def get_ip(peer="127.0.0.1", port=80):
+    """
+    Returns the local address used to reach peer. Connecting a UDP socket sends no
+    packets, so this also works without internet access; 127.0.0.1 if there is no route.
+    """
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.connect(("8.8.8.8", 80))
-    ip = s.getsockname()[0]
-    s.close()
-    return ip
+    try:
+        s.connect((peer, port))
+        return s.getsockname()[0]
+    except OSError:
+        return "127.0.0.1"
+    finally:
+        s.close()
@@ -0,0 +1,113 @@
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Deque, Dict, List
+
+from loguru import logger
+
+# Upper bucket edges (ms) of the latency histograms; the last bucket is open-ended
+HISTOGRAM_EDGES_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_DISABLED = nullcontext()
+
+
+class _StageTimer:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: "StageProfiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class StageProfiler:
+    """
+    Times named pipeline stages and keeps the most recent durations per stage.
+
+    When disabled, stage() returns a shared no-op context manager, so instrumented code
+    pays only for one method call per stage.
+    """
+
+    def __init__(self, enabled: bool = False, window: int = 512, log_records=False):
+        """
+        :param enabled: Whether stages are timed.
+        :param window: Number of most recent durations kept per stage.
+        :param log_records: If True, every duration is also emitted as a structured
+                            loguru TRACE record (extra fields: stage, duration_ms).
+        """
+        self.enabled = enabled
+        self.window = window
+        self.log_records = log_records
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def stage(self, name: str):
+        """
+        Context manager timing the enclosed block as stage `name`.
+        """
+        if not self.enabled:
+            return _DISABLED
+        return _StageTimer(self, name)
+
+    def record(self, name: str, seconds: float):
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples.setdefault(name, deque(maxlen=self.window))
+        samples.append(seconds)
+        if self.log_records:
+            duration_ms = seconds * 1000
+            logger.bind(stage=name, duration_ms=duration_ms).trace(
+                f"vision stage {name} took {duration_ms:.2f} ms"
+            )
+
+    def reset(self):
+        self._samples.clear()
+
+    def samples(self, name: str) -> List[float]:
+        """Returns the recorded durations of a stage in seconds."""
+        return list(self._samples.get(name, ()))
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Returns per-stage count, mean, percentiles and max in milliseconds together with a
+        histogram over HISTOGRAM_EDGES_MS of the rolling window.
+        """
+        result = {}
+        for name in list(self._samples):
+            values = sorted(seconds * 1000 for seconds in self.samples(name))
+            if not values:
+                continue
+            n = len(values)
+
+            def percentile(p: float) -> float:
+                return values[min(n - 1, int(p * n))]
+
+            histogram = [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+            bucket = 0
+            for value in values:
+                while (
+                    bucket < len(HISTOGRAM_EDGES_MS)
+                    and value > HISTOGRAM_EDGES_MS[bucket]
+                ):
+                    bucket += 1
+                histogram[bucket] += 1
+
+            result[name] = {
+                "count": n,
+                "mean_ms": sum(values) / n,
+                "p50_ms": percentile(0.5),
+                "p90_ms": percentile(0.9),
+                "p99_ms": percentile(0.99),
+                "max_ms": values[-1],
+                "histogram": {
+                    "edges_ms": list(HISTOGRAM_EDGES_MS),
+                    "counts": histogram,
+                },
+            }
+        return result
@@ -0,0 +1,124 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+
+class ParallelStartup:
+    """
+    Initializes independent subsystems concurrently and acts as a readiness barrier.
+
+    Each subsystem is created by a factory running on its own thread; wait() blocks
+    until all of them are ready and returns them by name. If one fails, the others are
+    still awaited and cleaned up, then the first error is raised.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._cleanups: Dict[str, Callable[[Any], None]] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self.start_time = time.monotonic()
+        self.ready_time: Optional[float] = None
+
+    def add(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        cleanup: Optional[Callable[[Any], None]] = None,
+    ) -> Future:
+        """
+        Starts creating a subsystem.
+
+        :param name: Name used in wait() results and the timing report.
+        :param factory: Callable creating the subsystem.
+        :param cleanup: Called with the subsystem if another subsystem fails.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(thread_name_prefix="startup")
+        if cleanup is not None:
+            self._cleanups[name] = cleanup
+        self._futures[name] = self._executor.submit(self._create, name, factory)
+        return self._futures[name]
+
+    def _create(self, name: str, factory: Callable[[], Any]) -> Any:
+        started = time.monotonic()
+        logger.debug(f"Starting {name}")
+        ok = False
+        try:
+            result = factory()
+            ok = True
+            return result
+        finally:
+            finished = time.monotonic()
+            with self._lock:
+                self._timings[name] = {
+                    "start_s": started - self.start_time,
+                    "duration_s": finished - started,
+                    "ok": ok,
+                }
+            logger.debug(f"{name} {'ready' if ok else 'failed'}")
+
+    def wait(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Blocks until every subsystem is ready and returns {name: subsystem}.
+
+        :raises TimeoutError: If not all subsystems are ready within timeout.
+        :raises Exception: The first error raised by a factory.
+        """
+        done, pending = wait(self._futures.values(), timeout=timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.ready_time = time.monotonic()
+
+        failed = [
+            name
+            for name, future in self._futures.items()
+            if future in done and future.exception() is not None
+        ]
+        if not failed and not pending:
+            return {name: future.result() for name, future in self._futures.items()}
+
+        for name, future in self._futures.items():
+            if future in done and future.exception() is None and name in self._cleanups:
+                try:
+                    self._cleanups[name](future.result())
+                except Exception as e:
+                    logger.warning(f"Cleanup of {name} failed: {e}")
+        if failed:
+            raise self._futures[failed[0]].exception()
+        names = [name for name, future in self._futures.items() if future in pending]
+        raise TimeoutError(f"Startup timed out waiting for {', '.join(names)}")
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns the per-subsystem start offsets and durations, the wall time until all
+        were ready and the time a sequential startup would have taken.
+        """
+        with self._lock:
+            timings = {name: dict(timing) for name, timing in self._timings.items()}
+        end = self.ready_time if self.ready_time is not None else time.monotonic()
+        return {
+            "subsystems": timings,
+            "total_s": end - self.start_time,
+            "sequential_s": sum(t["duration_s"] for t in timings.values()),
+        }
+
+    def format_report(self) -> str:
+        report = self.report()
+        lines = [
+            f"Startup finished in {report['total_s']:.2f} s "
+            f"(sequential: {report['sequential_s']:.2f} s)"
+        ]
+        for name, timing in sorted(
+            report["subsystems"].items(), key=lambda item: -item[1]["duration_s"]
+        ):
+            status = "" if timing["ok"] else " (failed)"
+            lines.append(
+                f"  {name:<20} {timing['duration_s']:6.2f} s "
+                f"(started at {timing['start_s']:.2f} s){status}"
+            )
+        return "\n".join(lines)